@@ -0,0 +1,160 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from fastapi.responses import Response, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Optional
+from datetime import datetime
+from models import BulkReportExportRequest, CareTeamLink
+from routes import get_current_admin
+from database import get_db
+import io
+import export_service
+import import_service
+import bulk_report_export
+import cohort_service
+
+admin_router = APIRouter(tags=["Admin"])
+
+
+@admin_router.get("/admin/export/assessments")
+async def export_assessments(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    language: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    include_speech: bool = False,
+    batch_size: int = Query(5000, ge=100, le=50000),
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Stream a pseudonymised research export of assessments as CSV or Parquet."""
+    if format == "parquet" and not export_service.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    query = await export_service.build_export_query(db, start, end, language, risk_level)
+    batches = export_service.iter_export_batches(db, query, include_speech, batch_size)
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "text/csv"
+    filename = f"assessments_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+
+    return StreamingResponse(
+        export_service.stream_export(batches, format, include_speech),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@admin_router.post("/admin/import/assessments")
+async def import_assessments(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(2000, ge=100, le=20000),
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Import historical assessments from an NDJSON or CSV upload.
+
+    Rows are validated and scored like live submissions; invalid rows are
+    reported (first 100) rather than failing the whole upload, and rows whose
+    id already exists are counted as duplicates.
+    """
+    import_format = format or import_service.format_for(file.filename or "")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    stats = await import_service.import_assessments(
+        db, stream, import_format, source=file.filename or "upload", batch_size=batch_size
+    )
+    return stats.as_dict()
+
+
+@admin_router.post("/admin/export/reports")
+async def export_reports(
+    export_request: BulkReportExportRequest,
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Render many assessment PDFs in parallel and stream them as a ZIP.
+
+    The `X-Export-Id` response header identifies the export for progress
+    polling and cancellation.
+    """
+    total = await bulk_report_export.count_selection(db, export_request)
+    if total == 0:
+        raise HTTPException(status_code=404, detail="No assessments match the export")
+
+    export = await bulk_report_export.start_export(db, admin["id"], total)
+    filename = f"assessment_reports_{datetime.utcnow():%Y%m%d_%H%M%S}.zip"
+
+    return StreamingResponse(
+        bulk_report_export.stream_report_zip(db, export_request, export),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Export-Id": export["id"],
+        }
+    )
+
+
+@admin_router.get("/admin/export/reports/{export_id}")
+async def get_report_export(
+    export_id: str,
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Progress of a bulk report export."""
+    export = await bulk_report_export.get_export(db, export_id)
+    if not export:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return export
+
+
+@admin_router.delete("/admin/export/reports/{export_id}", status_code=202)
+async def cancel_report_export(
+    export_id: str,
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Ask a running bulk report export to stop; the ZIP is closed early."""
+    if not await bulk_report_export.cancel_export(db, export_id):
+        raise HTTPException(status_code=404, detail="No running export with this id")
+    return {"id": export_id, "cancel_requested": True}
+
+
+@admin_router.post("/admin/care-team")
+async def link_care_team(
+    link: CareTeamLink,
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Let a clinician follow patients (already linked patients are skipped)."""
+    clinician = await db.users.find_one({"id": link.clinician_id}, projection={"_id": 0, "role": 1})
+    if not clinician or clinician.get("role") != "clinician":
+        raise HTTPException(status_code=404, detail="Clinician not found")
+
+    if not link.patient_ids:
+        return {"clinician_id": link.clinician_id, "linked": 0}
+    now = datetime.utcnow()
+    result = await db[cohort_service.CARE_TEAM_COLLECTION].bulk_write([
+        UpdateOne(
+            {"clinician_id": link.clinician_id, "patient_id": patient_id},
+            {"$setOnInsert": {"created_at": now, "created_by": admin["id"]}},
+            upsert=True
+        )
+        for patient_id in set(link.patient_ids)
+    ], ordered=False)
+    return {"clinician_id": link.clinician_id, "linked": result.upserted_count}
+
+
+@admin_router.delete("/admin/care-team/{clinician_id}/{patient_id}", status_code=204)
+async def unlink_care_team(
+    clinician_id: str,
+    patient_id: str,
+    admin: dict = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Stop a clinician following a patient."""
+    result = await db[cohort_service.CARE_TEAM_COLLECTION].delete_one(
+        {"clinician_id": clinician_id, "patient_id": patient_id}
+    )
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Link not found")
+    return Response(status_code=204)
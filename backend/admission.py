@@ -0,0 +1,182 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Pattern, Set, Tuple
+import asyncio
+import json
+import math
+import os
+import re
+
+from metrics import registry
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Default "<concurrent>/<queued>/<max wait seconds>" per request class.
+# Heavy classes get short queues and waits so a spike is shed with 503
+# within seconds instead of piling up behind the workers; anything not
+# classified is a light read and is not limited. Override with
+# ADMISSION_<CLASS>, e.g. ADMISSION_PDF=8/16/5; "off" disables a class.
+DEFAULT_CLASSES = {
+    "pdf": "4/8/5",
+    "auth": "8/32/5",
+    "bulk": "2/2/1",
+}
+
+# (class, methods, path pattern); the first match wins
+ROUTE_CLASSES: List[Tuple[str, Set[str], Pattern]] = [
+    ("pdf", {"GET", "HEAD"}, re.compile(r"^/api/(assessments|reports/shared)/[^/]+/pdf$")),
+    ("auth", {"POST"}, re.compile(r"^/api/auth/(login|register)$")),
+    ("bulk", {"GET", "POST"}, re.compile(r"^/api/admin/(import|export)/assessments$")),
+    # Streams a clinic-wide ZIP of PDFs rendered in a process pool
+    ("bulk", {"POST"}, re.compile(r"^/api/admin/export/reports$")),
+]
+
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClassLimiter:
+    """At most `concurrency` requests of one class at a time, `max_queue` waiting.
+
+    A request that finds the queue full, or waits longer than
+    `max_wait_seconds`, is shed. Freed slots go to waiters first come, first
+    served. Retry-After is estimated from the queue and the recent service
+    time.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_wait_seconds: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long a request holds its slot
+        self._service_seconds = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        return max(1.0, (self.queued + 1) * self._service_seconds / self.concurrency)
+
+    def _shed(self, reason: str):
+        registry.counter("admission_shed_total", request_class=self.name, reason=reason).inc()
+        return Shed(reason, self.retry_after())
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._report()
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._report()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self._report()
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            raise self._shed("timeout")
+        registry.summary("admission_wait_seconds", request_class=self.name).observe(loop.time() - started)
+
+    def release(self, held_seconds: Optional[float] = None):
+        if held_seconds is not None:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * held_seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot goes straight to the waiter; `active` stays the same
+                waiter.set_result(None)
+                self._report()
+                return
+        self.active -= 1
+        self._report()
+
+    def _report(self):
+        registry.gauge("admission_active", request_class=self.name).set(self.active)
+        registry.gauge("admission_queued", request_class=self.name).set(len(self._waiters))
+
+
+def _parse_class(name: str, default: str) -> Optional[ClassLimiter]:
+    spec = os.environ.get(f"ADMISSION_{name.upper()}", default).strip().lower()
+    if spec in ("", "0", "off", "none"):
+        return None
+    concurrency, queued, wait = (spec.split("/") + ["0", "0"])[:3]
+    return ClassLimiter(name, int(concurrency), int(queued or 0), float(wait or 0))
+
+
+def load_limiters() -> Dict[str, Optional[ClassLimiter]]:
+    return {name: _parse_class(name, default) for name, default in DEFAULT_CLASSES.items()}
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    for name, methods, pattern in ROUTE_CLASSES:
+        if method in methods and pattern.match(path):
+            return name
+    return None
+
+
+class AdmissionMiddleware:
+    """Admit heavy requests through their class limiter; shed with 503 when over.
+
+    Limits are per process, like the rate limiter: with several workers
+    each admits its own share. A slot is held until the response has been
+    sent, so streamed exports and file downloads count for their whole
+    duration.
+    """
+
+    def __init__(self, app, limiters: Optional[Dict[str, Optional[ClassLimiter]]] = None):
+        self.app = app
+        self.limiters = load_limiters() if limiters is None else limiters
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        request_class = classify(scope["method"], scope["path"])
+        limiter = self.limiters.get(request_class) if request_class else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Shed as shed:
+            await self._reject(send, shed)
+            return
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(loop.time() - started)
+
+    @staticmethod
+    async def _reject(send, shed: Shed):
+        body = json.dumps({"detail": "Server is busy, please try again shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(shed.retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
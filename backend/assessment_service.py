@@ -0,0 +1,327 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+
+from pymongo import UpdateOne
+
+from models import Assessment, AssessmentResult
+
+
+def score_results(results: AssessmentResult) -> Tuple[float, str]:
+    """Calculate the overall score and risk level for a set of results."""
+    scores = []
+
+    if results.memory_accuracy is not None:
+        scores.append(results.memory_accuracy)
+    if results.attention_accuracy is not None:
+        scores.append(results.attention_accuracy)
+    if results.reaction_score is not None:
+        scores.append(results.reaction_score)
+
+    overall_score = sum(scores) / len(scores) if scores else 0
+
+    # Determine risk level
+    if overall_score >= 75:
+        risk_level = "Low"
+    elif overall_score >= 50:
+        risk_level = "Moderate"
+    else:
+        risk_level = "High"
+
+    return overall_score, risk_level
+
+
+def _default(value, fallback):
+    return value if value is not None else fallback
+
+
+# Statistics only the server computes, from the raw inputs; whatever a
+# client sends for them is discarded
+SERVER_COMPUTED_FIELDS = {"reaction_stats", "attention_sdt"}
+
+
+def extract_raw_data(results: AssessmentResult) -> Tuple[AssessmentResult, dict]:
+    """Move raw per-trial inputs out of `results` and summarise them server-side.
+
+    Returns the results to store and the `raw_data` to keep alongside them.
+    NumPy-backed modules are only imported when raw inputs are present.
+    """
+    raw_data = {}
+    results = results.copy(update=dict.fromkeys(SERVER_COMPUTED_FIELDS))
+
+    # Keep raw reaction trials packed and summarise them server-side
+    if results.reaction_trials:
+        from reaction_stats import pack_trials, compute_reaction_stats
+
+        stats = compute_reaction_stats(results.reaction_trials)
+        raw_data["reaction_trials"] = pack_trials(results.reaction_trials)
+        results = results.copy(update={
+            "reaction_trials": None,
+            "reaction_stats": stats,
+            "reaction_avg_time": _default(results.reaction_avg_time, stats["mean_ms"]),
+            "reaction_best_time": _default(results.reaction_best_time, stats["min_ms"]),
+        })
+
+    # Per-item memory responses feed the population item analysis job
+    if results.memory_items:
+        raw_data["memory_items"] = [item.dict() for item in results.memory_items]
+        results = results.copy(update={
+            "memory_items": None,
+            "memory_correct": _default(results.memory_correct, sum(item.correct for item in results.memory_items)),
+            "memory_total": _default(results.memory_total, len(results.memory_items)),
+        })
+
+    # Same for the attention event stream: keep it packed, derive d'/criterion
+    if results.attention_events:
+        from attention_metrics import pack_events, compute_attention_metrics
+
+        metrics = compute_attention_metrics(results.attention_events)
+        raw_data["attention_events"] = pack_events(results.attention_events)
+        results = results.copy(update={
+            "attention_events": None,
+            "attention_sdt": metrics,
+            "attention_hits": _default(results.attention_hits, metrics["hits"]),
+            "attention_false_alarms": _default(results.attention_false_alarms, metrics["false_alarms"]),
+        })
+
+    # Recordings are decoded, resampled to 16 kHz mono and kept compacted
+    if results.speech_data:
+        from speech_audio import normalize_speech, speech_duration
+
+        audio = normalize_speech(results.speech_data)
+        raw_data["speech_audio"] = audio
+        results = results.copy(update={
+            "speech_data": None,
+            "speech_duration": _default(results.speech_duration, speech_duration(audio)),
+        })
+
+    return results, raw_data
+
+
+def build_assessment(
+    user_id: str,
+    results: AssessmentResult,
+    test_date: Optional[datetime] = None,
+    assessment_id: Optional[str] = None
+) -> Assessment:
+    """Score results and build the assessment document to store."""
+    overall_score, risk_level = score_results(results)
+    results, raw_data = extract_raw_data(results)
+
+    fields = {}
+    if test_date is not None:
+        fields["test_date"] = test_date
+    if assessment_id is not None:
+        fields["id"] = assessment_id
+
+    return Assessment(
+        user_id=user_id,
+        results=results,
+        overall_score=overall_score,
+        risk_level=risk_level,
+        raw_data=raw_data,
+        **fields
+    )
+
+
+# Assessments past the retention age live here, without inline audio
+ARCHIVE_COLLECTION = "assessments_archive"
+
+
+# Only what the longitudinal report draws; speech and raw per-trial data stay
+# on the server, which keeps a decade of history a few kilobytes per patient
+HISTORY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "test_date": 1,
+    "overall_score": 1,
+    "risk_level": 1,
+    "results.memory_accuracy": 1,
+    "results.attention_accuracy": 1,
+    "results.reaction_avg_time": 1,
+}
+
+
+async def fetch_history(
+    db,
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> List[dict]:
+    """A patient's assessments in date order, served by the (user_id, test_date) index.
+
+    Archived assessments (see retention.py) are included.
+    """
+    query = {"user_id": user_id}
+    if start or end:
+        query["test_date"] = {}
+        if start:
+            query["test_date"]["$gte"] = start
+        if end:
+            query["test_date"]["$lt"] = end
+    assessments = []
+    for collection in (ARCHIVE_COLLECTION, "assessments"):
+        cursor = db[collection].find(query, projection=HISTORY_PROJECTION).sort("test_date", 1)
+        assessments += await cursor.to_list(length=None)
+    assessments.sort(key=lambda assessment: assessment["test_date"])
+    return assessments
+
+
+async def find_assessment(db, query: dict) -> Optional[dict]:
+    """Find one assessment in the hot collection, falling back to the archive."""
+    assessment = await db.assessments.find_one(query)
+    if assessment is None:
+        assessment = await db[ARCHIVE_COLLECTION].find_one(query)
+    return assessment
+
+
+async def fetch_history_page(db, user_id: str, skip: int, limit: int) -> List[dict]:
+    """Newest-first page of a patient's assessments across hot and archive.
+
+    Archived assessments are older than every hot one, so the archive is
+    only read once a page runs past the end of the hot collection.
+    """
+    query = {"user_id": user_id}
+    cursor = db.assessments.find(query).sort("test_date", -1).skip(skip).limit(limit)
+    assessments = await cursor.to_list(length=limit)
+    if len(assessments) == limit:
+        return assessments
+
+    hot_count = skip + len(assessments) if assessments else await db.assessments.count_documents(query)
+    archive_skip = max(0, skip - hot_count)
+    remaining = limit - len(assessments)
+    cursor = db[ARCHIVE_COLLECTION].find(query).sort("test_date", -1).skip(archive_skip).limit(remaining)
+    return assessments + await cursor.to_list(length=remaining)
+
+
+# Per-patient summary (count, latest assessment, version) kept next to the
+# assessments; cache validators for the dashboard endpoints come from it, so
+# a revalidation costs one indexed lookup
+SUMMARIES_COLLECTION = "assessment_summaries"
+
+
+def _summary_pipeline(user_ids: List[str]) -> List[dict]:
+    """Count and newest assessment per patient; `$sort` uses the (user_id, test_date) index."""
+    return [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$sort": {"user_id": 1, "test_date": -1}},
+        {"$group": {
+            "_id": "$user_id",
+            "count": {"$sum": 1},
+            "latest_id": {"$first": "$id"},
+            "latest_test_date": {"$first": "$test_date"},
+        }},
+    ]
+
+
+async def rebuild_summaries(db, user_ids: List[str]):
+    """Recompute patients' summaries from the assessments themselves (hot and archived).
+
+    One aggregation per collection and one bulk write, however many
+    patients are rebuilt.
+    """
+    if not user_ids:
+        return
+    summaries = {user_id: {"count": 0, "latest_id": None, "latest_test_date": None} for user_id in user_ids}
+    for collection in ("assessments", ARCHIVE_COLLECTION):
+        async for row in db[collection].aggregate(_summary_pipeline(user_ids)):
+            summary = summaries[row["_id"]]
+            summary["count"] += row["count"]
+            if summary["latest_test_date"] is None or row["latest_test_date"] > summary["latest_test_date"]:
+                summary["latest_id"] = row["latest_id"]
+                summary["latest_test_date"] = row["latest_test_date"]
+    now = datetime.utcnow()
+    await db[SUMMARIES_COLLECTION].bulk_write([
+        UpdateOne(
+            {"user_id": user_id},
+            {"$set": {"user_id": user_id, **summary, "updated_at": now}, "$inc": {"version": 1}},
+            upsert=True
+        )
+        for user_id, summary in summaries.items()
+    ], ordered=False)
+
+
+async def rebuild_summary(db, user_id: str) -> dict:
+    await rebuild_summaries(db, [user_id])
+    return await db[SUMMARIES_COLLECTION].find_one({"user_id": user_id}, projection={"_id": 0})
+
+
+async def get_summary(db, user_id: str) -> dict:
+    summary = await db[SUMMARIES_COLLECTION].find_one({"user_id": user_id}, projection={"_id": 0})
+    return summary or await rebuild_summary(db, user_id)
+
+
+async def record_new_assessments(db, assessments: Iterable[dict]):
+    """Fold newly inserted assessments into their patients' summaries.
+
+    One atomic pipeline update per patient, sent together in one bulk
+    write, so concurrent saves cannot lose a count. Summaries created here
+    (patients saving for the first time since summaries were introduced)
+    are then rebuilt from the assessments in one batch.
+    """
+    per_user: Dict[str, Tuple[int, datetime, str]] = {}
+    for assessment in assessments:
+        count, newest_date, newest_id = per_user.get(assessment["user_id"], (0, datetime.min, None))
+        if assessment["test_date"] >= newest_date:
+            newest_date, newest_id = assessment["test_date"], assessment["id"]
+        per_user[assessment["user_id"]] = (count + 1, newest_date, newest_id)
+    if not per_user:
+        return
+
+    now = datetime.utcnow()
+    user_ids = list(per_user)
+    operations = []
+    for user_id in user_ids:
+        count, newest_date, newest_id = per_user[user_id]
+        is_newest = {"$gte": [newest_date, {"$ifNull": ["$latest_test_date", datetime.min]}]}
+        operations.append(UpdateOne({"user_id": user_id}, [{"$set": {
+            "count": {"$add": [{"$ifNull": ["$count", 0]}, count]},
+            "latest_id": {"$cond": [is_newest, {"$literal": newest_id}, "$latest_id"]},
+            "latest_test_date": {"$cond": [is_newest, newest_date, "$latest_test_date"]},
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+            "updated_at": now,
+        }}], upsert=True))
+    result = await db[SUMMARIES_COLLECTION].bulk_write(operations, ordered=False)
+    await rebuild_summaries(db, [user_ids[index] for index in result.upserted_ids])
+
+
+async def invalidate_summaries(db):
+    """Bump every validator after a backfill rewrote stored results."""
+    await db[SUMMARIES_COLLECTION].update_many({}, {"$inc": {"version": 1}})
+    await db.share_links.update_many({}, {"$inc": {"version": 1}})
+
+
+# Draft assessments: each test step of the flow is saved as it completes
+DRAFT_TTL_HOURS = float(os.environ.get("ASSESSMENT_DRAFT_TTL_HOURS", "24"))
+ASSESSMENT_STEPS = ("memory", "attention", "reaction", "speech")
+
+
+def step_fields(step: str) -> set:
+    """AssessmentResult fields written by one step of the assessment flow."""
+    return {
+        name for name in AssessmentResult.model_fields
+        if name.startswith(f"{step}_") and name not in SERVER_COMPUTED_FIELDS
+    }
+
+
+def draft_step_update(step: str, results: AssessmentResult) -> dict:
+    """`$set`/`$addToSet` update saving one completed step into a draft.
+
+    Only the step's own fields are written, so retrying a step is idempotent
+    and never touches what other steps saved.
+    """
+    fields = step_fields(step)
+    unexpected = results.model_fields_set - fields
+    if unexpected:
+        raise ValueError(f"Fields not part of the {step} step: {', '.join(sorted(unexpected))}")
+
+    now = datetime.utcnow()
+    values = results.dict(include=fields, exclude_unset=True)
+    return {
+        "$set": {
+            **{f"results.{name}": value for name, value in values.items()},
+            "updated_at": now,
+            "expires_at": now + timedelta(hours=DRAFT_TTL_HOURS),
+        },
+        "$addToSet": {"steps_completed": step},
+    }
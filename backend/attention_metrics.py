@@ -0,0 +1,194 @@
+from typing import List, Sequence, Tuple
+import logging
+
+import numpy as np
+from pymongo import UpdateOne
+
+from assessment_service import ARCHIVE_COLLECTION, invalidate_summaries
+from packing import pack_float32, pack_uint8, unpack_float32, unpack_uint8
+
+logger = logging.getLogger(__name__)
+
+# Coefficients of Acklam's rational approximation to the inverse normal CDF
+# (relative error < 1.2e-9), so z-scores need no SciPy
+_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+      1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+      6.680131188771972e+01, -1.328068155288572e+01)
+_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+      -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+      3.754408661907416e+00)
+_P_LOW = 0.02425
+
+
+def norm_ppf(p: np.ndarray) -> np.ndarray:
+    """Vectorized inverse of the standard normal CDF for 0 < p < 1."""
+    p = np.asarray(p, dtype=np.float64)
+    z = np.empty_like(p)
+
+    low = p < _P_LOW
+    high = p > 1 - _P_LOW
+    mid = ~(low | high)
+
+    tail = low | high
+    q = np.sqrt(-2 * np.log(np.where(low, p, 1 - p)[tail]))
+    z_tail = ((((((_C[0] * q + _C[1]) * q + _C[2]) * q + _C[3]) * q + _C[4]) * q + _C[5])
+              / ((((_D[0] * q + _D[1]) * q + _D[2]) * q + _D[3]) * q + 1))
+    z[tail] = np.where(low[tail], z_tail, -z_tail)
+
+    q = p[mid] - 0.5
+    r = q * q
+    z[mid] = ((((((_A[0] * r + _A[1]) * r + _A[2]) * r + _A[3]) * r + _A[4]) * r + _A[5]) * q
+              / (((((_B[0] * r + _B[1]) * r + _B[2]) * r + _B[3]) * r + _B[4]) * r + 1))
+    return z
+
+
+def pack_events(events) -> dict:
+    """Pack attention events column-wise for storage."""
+    return {
+        "onset_ms": pack_float32([event.onset_ms for event in events]),
+        "is_target": pack_uint8([event.is_target for event in events]),
+        "response_time_ms": pack_float32([
+            np.nan if event.response_time_ms is None else event.response_time_ms
+            for event in events
+        ]),
+    }
+
+
+def unpack_events(packed: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (is_target, response_time_ms) columns of packed events."""
+    return (
+        unpack_uint8(packed["is_target"]).astype(bool),
+        unpack_float32(packed["response_time_ms"]),
+    )
+
+
+def _group_median(values: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """Median of `values` within each group, NaN for empty groups."""
+    order = np.lexsort((values, groups))
+    values, groups = values[order], groups[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(group_count, np.nan)
+    present = counts > 0
+    lower = starts + (counts - 1) // 2
+    upper = starts + counts // 2
+    medians[present] = (values[lower[present]] + values[upper[present]]) / 2
+    return medians
+
+
+def compute_attention_metrics_batch(event_columns: Sequence[Tuple[np.ndarray, np.ndarray]]) -> List[dict]:
+    """Signal-detection metrics for many assessments in one vectorized pass.
+
+    Each item is the (is_target, response_time_ms) columns of one assessment's
+    events, with NaN response time meaning no response. Hit and false-alarm
+    rates use the log-linear correction ((count + 0.5) / (trials + 1)) so d'
+    and the criterion c stay finite for perfect or empty response sets.
+    """
+    group_count = len(event_columns)
+    if group_count == 0:
+        return []
+
+    sizes = np.array([len(is_target) for is_target, _ in event_columns])
+    groups = np.repeat(np.arange(group_count), sizes)
+    is_target = np.concatenate([np.asarray(targets, dtype=bool) for targets, _ in event_columns])
+    response_time = np.concatenate([np.asarray(times, dtype=np.float64) for _, times in event_columns])
+    responded = ~np.isnan(response_time)
+
+    def count(mask):
+        return np.bincount(groups[mask], minlength=group_count)
+
+    targets = count(is_target)
+    distractors = count(~is_target)
+    hits = count(is_target & responded)
+    false_alarms = count(~is_target & responded)
+
+    hit_rate = (hits + 0.5) / (targets + 1)
+    false_alarm_rate = (false_alarms + 0.5) / (distractors + 1)
+    z_hit = norm_ppf(hit_rate)
+    z_false_alarm = norm_ppf(false_alarm_rate)
+    d_prime = z_hit - z_false_alarm
+    criterion = -(z_hit + z_false_alarm) / 2
+
+    hit_mask = is_target & responded
+    false_alarm_mask = ~is_target & responded
+    hit_rt_mean = np.divide(
+        np.bincount(groups[hit_mask], weights=response_time[hit_mask], minlength=group_count),
+        hits, out=np.full(group_count, np.nan), where=hits > 0
+    )
+    false_alarm_rt_mean = np.divide(
+        np.bincount(groups[false_alarm_mask], weights=response_time[false_alarm_mask], minlength=group_count),
+        false_alarms, out=np.full(group_count, np.nan), where=false_alarms > 0
+    )
+    hit_rt_median = _group_median(response_time[hit_mask], groups[hit_mask], group_count)
+    accuracy = np.divide(
+        (hits + distractors - false_alarms) * 100.0, sizes,
+        out=np.full(group_count, np.nan), where=sizes > 0
+    )
+
+    columns = {
+        "events": sizes,
+        "targets": targets,
+        "distractors": distractors,
+        "hits": hits,
+        "misses": targets - hits,
+        "false_alarms": false_alarms,
+        "correct_rejections": distractors - false_alarms,
+        "hit_rate": hit_rate,
+        "false_alarm_rate": false_alarm_rate,
+        "d_prime": d_prime,
+        "criterion": criterion,
+        "accuracy": accuracy,
+        "hit_rt_mean_ms": hit_rt_mean,
+        "hit_rt_median_ms": hit_rt_median,
+        "false_alarm_rt_mean_ms": false_alarm_rt_mean,
+    }
+    names = list(columns)
+    rows = zip(*(column.tolist() for column in columns.values()))
+    return [
+        {name: None if value != value else value for name, value in zip(names, row)}
+        for row in rows
+    ]
+
+
+def compute_attention_metrics(events) -> dict:
+    """Signal-detection metrics for one assessment's attention events."""
+    is_target = np.array([event.is_target for event in events], dtype=bool)
+    response_time = np.array([
+        np.nan if event.response_time_ms is None else event.response_time_ms
+        for event in events
+    ], dtype=np.float64)
+    return compute_attention_metrics_batch([(is_target, response_time)])[0]
+
+
+async def backfill_attention_metrics(db, batch_size: int = 5000) -> int:
+    """Recompute `results.attention_sdt` for every assessment with raw events.
+
+    Streams the hot and archived assessments in cursor batches so memory is
+    bounded by `batch_size` regardless of the dataset size.
+    """
+    updated = 0
+    # Archived assessments keep their raw data and are re-analysed too
+    for collection in ("assessments", ARCHIVE_COLLECTION):
+        cursor = db[collection].find(
+            {"raw_data.attention_events": {"$exists": True}},
+            projection={"_id": 1, "raw_data.attention_events": 1},
+            batch_size=batch_size
+        )
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            metrics = compute_attention_metrics_batch(
+                [unpack_events(doc["raw_data"]["attention_events"]) for doc in batch]
+            )
+            await db[collection].bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"results.attention_sdt": doc_metrics}})
+                for doc, doc_metrics in zip(batch, metrics)
+            ], ordered=False)
+            updated += len(batch)
+            logger.info("Backfilled attention metrics for %d assessments", updated)
+    # Cached dashboard responses now show stale results
+    await invalidate_summaries(db)
+    return updated
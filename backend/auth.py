@@ -2,7 +2,9 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
+import math
 import os
+import uuid
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -10,7 +12,22 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT settings
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# Access tokens are checked without a database lookup, so they are kept
+# short; clients renew them with a refresh token, which is checked against
+# the database on every use and rotated
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Token times are naive UTC, like utcnow()
+EPOCH = datetime(1970, 1, 1)
+
+
+def issued_at(now: datetime) -> float:
+    """`iat` claim for `now`: epoch seconds to the millisecond.
+
+    JWT allows a fractional `iat`. With whole seconds, a token issued just
+    after a revocation, in the same second, would be taken as revoked.
+    """
+    return math.floor((now - EPOCH).total_seconds() * 1000) / 1000
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -24,22 +41,43 @@ def get_password_hash(password: str) -> str:
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token."""
+    """Create a JWT access token.
+
+    `data` carries the claims the API authorises with (`sub`, `role`,
+    `sid`); a unique `jti` and the issue time are added.
+    """
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": issued_at(now), "jti": str(uuid.uuid4()), "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[dict]:
-    """Decode a JWT access token."""
+def create_refresh_token(user_id: str, session_id: str) -> dict:
+    """Create a refresh token; returns its claims plus the encoded `token` and `issued` time."""
+    now = datetime.utcnow()
+    claims = {
+        "sub": user_id,
+        "sid": session_id,
+        "jti": str(uuid.uuid4()),
+        "type": "refresh",
+        "iat": issued_at(now),
+        "exp": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    }
+    return {**claims, "issued": now, "token": jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)}
+
+
+def decode_access_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """Decode a JWT, returning None unless it is valid and of `token_type`."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    if payload.get("type") != token_type:
+        return None
+    return payload
@@ -0,0 +1,315 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import uuid
+import zipfile
+
+from assessment_service import ARCHIVE_COLLECTION
+from export_service import ChunkSink
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+EXPORTS_COLLECTION = "bulk_exports"
+
+# Rendering runs in separate processes so a quarter-end export neither blocks
+# the event loop nor competes with request handling for the GIL
+PROCESSES = int(os.environ.get("BULK_EXPORT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# PDFs rendered or waiting to be zipped at any time; bounds memory use
+MAX_IN_FLIGHT = int(os.environ.get("BULK_EXPORT_MAX_IN_FLIGHT", str(PROCESSES * 2)))
+# How often progress is saved and the cancel flag is checked
+PROGRESS_INTERVAL_SECONDS = float(os.environ.get("BULK_EXPORT_PROGRESS_INTERVAL_SECONDS", "1"))
+EXPORT_RETENTION_DAYS = 7
+
+# Everything a report needs, nothing it does not (raw trials, speech audio)
+ASSESSMENT_PROJECTION = {"_id": 0, "raw_data": 0, "results.speech_data": 0}
+# Only what the report shows about the patient
+USER_PROJECTION = {"_id": 0, "id": 1, "name": 1, "email": 1}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Lazily start the render pool.
+
+    Children are spawned rather than forked: API workers run an event loop
+    and driver threads, which must not be duplicated into a child process.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_report(assessment: dict, user: dict) -> bytes:
+    """Render one assessment PDF (runs in a pool process)."""
+    from pdf_service import generate_assessment_pdf
+
+    return generate_assessment_pdf(assessment, user).getvalue()
+
+
+def report_filename(assessment: dict, user: dict) -> str:
+    name = re.sub(r"[^A-Za-z0-9]+", "_", user.get("name") or "patient").strip("_") or "patient"
+    return f"{name}_{assessment['test_date']:%Y%m%d}_{assessment['id'][:8]}.pdf"
+
+
+def _selection_match(request) -> dict:
+    match = {}
+    if request.assessment_ids:
+        match["id"] = {"$in": request.assessment_ids}
+    else:
+        if request.start or request.end:
+            match["test_date"] = {}
+            if request.start:
+                match["test_date"]["$gte"] = request.start
+            if request.end:
+                match["test_date"]["$lt"] = request.end
+        if request.risk_level:
+            match["risk_level"] = request.risk_level
+    return match
+
+
+def _latest_per_patient(request) -> bool:
+    return not request.assessment_ids and request.latest_per_patient
+
+
+def _selection_pipeline(request, extra_match: Optional[dict] = None) -> List[dict]:
+    """Aggregation selecting the assessments of a bulk export from one collection."""
+    pipeline = [{"$match": {**_selection_match(request), **(extra_match or {})}}]
+    if _latest_per_patient(request):
+        # Walks the (user_id, test_date) index newest-first within each patient
+        pipeline += [
+            {"$sort": {"user_id": 1, "test_date": -1}},
+            {"$group": {"_id": "$user_id", "assessment": {"$first": "$$ROOT"}}},
+            {"$replaceRoot": {"newRoot": "$assessment"}},
+        ]
+    pipeline.append({"$project": ASSESSMENT_PROJECTION})
+    return pipeline
+
+
+async def count_selection(db, request) -> int:
+    """Assessments in the export, hot and archived."""
+    match = _selection_match(request)
+    if _latest_per_patient(request):
+        patients = set()
+        for collection in ("assessments", ARCHIVE_COLLECTION):
+            patients.update(await db[collection].distinct("user_id", match))
+        return len(patients)
+    total = 0
+    for collection in ("assessments", ARCHIVE_COLLECTION):
+        total += await db[collection].count_documents(match)
+    return total
+
+
+async def _aggregate_batches(db, collection: str, pipeline: List[dict], batch_size: int) -> AsyncIterator[List[dict]]:
+    cursor = db[collection].aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+    while True:
+        batch = await cursor.to_list(length=batch_size)
+        if not batch:
+            break
+        yield batch
+
+
+async def _iter_assessment_batches(db, request, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Selected assessments from the hot collection, then from the archive.
+
+    With `latest_per_patient`, each hot batch is checked against the
+    archive for a newer assessment of the same patients, and archived
+    assessments are only used for patients with none selected in the hot
+    collection.
+    """
+    if not _latest_per_patient(request):
+        for collection in ("assessments", ARCHIVE_COLLECTION):
+            async for batch in _aggregate_batches(db, collection, _selection_pipeline(request), batch_size):
+                yield batch
+        return
+
+    seen = set()
+    async for batch in _aggregate_batches(db, "assessments", _selection_pipeline(request), batch_size):
+        user_ids = [assessment["user_id"] for assessment in batch]
+        seen.update(user_ids)
+        archived = {
+            assessment["user_id"]: assessment
+            async for assessment in db[ARCHIVE_COLLECTION].aggregate(
+                _selection_pipeline(request, {"user_id": {"$in": user_ids}})
+            )
+        }
+        yield [
+            archived[assessment["user_id"]]
+            if assessment["user_id"] in archived
+            and archived[assessment["user_id"]]["test_date"] > assessment["test_date"]
+            else assessment
+            for assessment in batch
+        ]
+    async for batch in _aggregate_batches(db, ARCHIVE_COLLECTION, _selection_pipeline(request), batch_size):
+        batch = [assessment for assessment in batch if assessment["user_id"] not in seen]
+        if batch:
+            yield batch
+
+
+async def iter_selection(db, request, batch_size: int = 200) -> AsyncIterator[Tuple[dict, dict]]:
+    """Yield (assessment, user) pairs, looking users up one batch at a time."""
+    async for batch in _iter_assessment_batches(db, request, batch_size):
+        user_ids = list({assessment["user_id"] for assessment in batch})
+        users = {
+            user["id"]: user
+            async for user in db.users.find({"id": {"$in": user_ids}}, projection=USER_PROJECTION)
+        }
+        for assessment in batch:
+            yield assessment, users.get(assessment["user_id"]) or {}
+
+
+async def start_export(db, admin_id: str, total: int) -> dict:
+    now = datetime.utcnow()
+    export = {
+        "id": str(uuid.uuid4()),
+        "admin_id": admin_id,
+        "status": "running",
+        "total": total,
+        "rendered": 0,
+        "failed": 0,
+        "cancel_requested": False,
+        "created_at": now,
+        "updated_at": now,
+        "expires_at": now + timedelta(days=EXPORT_RETENTION_DAYS),
+    }
+    await db[EXPORTS_COLLECTION].insert_one(dict(export))
+    return export
+
+
+async def get_export(db, export_id: str) -> Optional[dict]:
+    return await db[EXPORTS_COLLECTION].find_one({"id": export_id}, projection={"_id": 0})
+
+
+async def cancel_export(db, export_id: str) -> bool:
+    result = await db[EXPORTS_COLLECTION].update_one(
+        {"id": export_id, "status": "running"}, {"$set": {"cancel_requested": True}}
+    )
+    return result.matched_count == 1
+
+
+class _Progress:
+    """Throttled progress writes and cancel checks for one export."""
+
+    def __init__(self, db, export: dict):
+        self.db = db
+        self.export = export
+        self.rendered = 0
+        self.failed = 0
+        self.cancelled = False
+        self._last_sync = 0.0
+
+    async def sync(self, force: bool = False):
+        now = asyncio.get_running_loop().time()
+        if not force and now - self._last_sync < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_sync = now
+        export = await self.db[EXPORTS_COLLECTION].find_one_and_update(
+            {"id": self.export["id"]},
+            {"$set": {"rendered": self.rendered, "failed": self.failed, "updated_at": datetime.utcnow()}},
+            projection={"cancel_requested": 1}
+        )
+        self.cancelled = self.cancelled or bool(export and export.get("cancel_requested"))
+
+    async def finish(self, status: str):
+        await self.db[EXPORTS_COLLECTION].update_one({"id": self.export["id"]}, {"$set": {
+            "status": status,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "updated_at": datetime.utcnow(),
+            "finished_at": datetime.utcnow(),
+        }})
+
+
+async def stream_report_zip(db, request, export: dict) -> AsyncIterator[bytes]:
+    """Render the selected reports on the process pool and stream them as a ZIP.
+
+    Entries are written in completion order, so the first bytes go out as
+    soon as the first PDF is ready. At most MAX_IN_FLIGHT PDFs are pending,
+    and each is flushed to the client once zipped. Cancelling stops
+    submitting work and ends the archive early with a manifest of what was
+    included; a client disconnect abandons the export.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    progress = _Progress(db, export)
+    sink = ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+    manifest = io.StringIO()
+    manifest_writer = csv.writer(manifest)
+    manifest_writer.writerow(["assessment_id", "patient", "test_date", "file", "status", "error"])
+
+    pending = {}
+    selection = iter_selection(db, request).__aiter__()
+    exhausted = False
+    status = "failed"
+    started = loop.time()
+    try:
+        while True:
+            while not exhausted and not progress.cancelled and len(pending) < MAX_IN_FLIGHT:
+                try:
+                    assessment, user = await selection.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                future = loop.run_in_executor(pool, render_report, assessment, user)
+                pending[future] = (assessment, user)
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                assessment, user = pending.pop(future)
+                filename = report_filename(assessment, user)
+                row = [assessment["id"], user.get("name", ""), f"{assessment['test_date']:%Y-%m-%d}", filename]
+                try:
+                    archive.writestr(filename, future.result())
+                    progress.rendered += 1
+                    manifest_writer.writerow(row + ["ok", ""])
+                except BrokenProcessPool:
+                    shutdown_pool()
+                    raise
+                except Exception as error:
+                    logger.warning("Bulk export %s: report %s failed: %s", export["id"], assessment["id"], error)
+                    progress.failed += 1
+                    manifest_writer.writerow(row + ["failed", str(error)])
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+            await progress.sync()
+            if progress.cancelled:
+                # Drop renders that have not been zipped yet and close the archive
+                for future in pending:
+                    future.cancel()
+                pending.clear()
+
+        status = "cancelled" if progress.cancelled else "completed"
+        archive.writestr("manifest.csv", manifest.getvalue())
+        archive.close()
+        yield sink.drain()
+    except asyncio.CancelledError:
+        # Client went away: treat like a cancel
+        status = "cancelled"
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+        registry.counter("bulk_export_reports_total", status="rendered").inc(progress.rendered)
+        registry.counter("bulk_export_reports_total", status="failed").inc(progress.failed)
+        registry.summary("bulk_export_seconds").observe(loop.time() - started)
+        await asyncio.shield(progress.finish(status))
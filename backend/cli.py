@@ -0,0 +1,233 @@
+from dotenv import load_dotenv
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import logging
+import os
+
+import typer
+
+ROOT_DIR = Path(__file__).parent
+
+cli = typer.Typer(help="Management commands for the Early Dementia Detection backend.")
+
+
+@cli.callback()
+def main():
+    """Load backend/.env before running a command."""
+    load_dotenv(ROOT_DIR / '.env')
+
+
+@cli.command()
+def serve(
+    host: str = typer.Option("0.0.0.0", help="Interface to bind."),
+    port: int = typer.Option(8001, help="Port to bind."),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Number of worker processes."),
+    warm_up: bool = typer.Option(True, help="Render a dummy PDF, touch bcrypt and prime caches in each worker."),
+    log_level: str = typer.Option("info", help="uvicorn log level."),
+):
+    """Run the API with a preloaded app and forked uvicorn workers."""
+    import launcher
+    from structured_logging import configure_logging
+
+    configure_logging(level=log_level.upper())
+    launcher.run(host=host, port=port, workers=workers, warm_up=warm_up, log_level=log_level)
+
+
+@cli.command("profile-imports")
+def profile_imports(
+    module: str = typer.Option("server", help="Module to import cold."),
+    top: int = typer.Option(25, help="Number of modules to list."),
+    sort: str = typer.Option("cumulative", help="Sort by 'cumulative' or 'self' time."),
+):
+    """Report per-module import time for a cold start of the backend."""
+    import startup_profile
+
+    total = startup_profile.measure_import_seconds(module)
+    timings = startup_profile.profile_imports(module)
+    key = (lambda t: t.self_us) if sort == "self" else (lambda t: t.cumulative_us)
+
+    typer.echo(f"Cold import of {module}: {total * 1000:.0f} ms ({len(timings)} modules)")
+    typer.echo(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for timing in sorted(timings, key=key, reverse=True)[:top]:
+        typer.echo(f"{timing.self_us / 1000:9.1f} {timing.cumulative_us / 1000:9.1f}  {timing.name}")
+
+
+def _run_with_db(job):
+    """Run `job(db)` against the configured database and return its result."""
+    import asyncio
+    from database import open_database
+
+    async def runner():
+        async with open_database() as db:
+            return await job(db)
+
+    logging.basicConfig(level=logging.INFO)
+    return asyncio.run(runner())
+
+
+@cli.command("reanalyse-reactions")
+def reanalyse_reactions(
+    batch_size: int = typer.Option(5000, help="Assessments per cursor batch and bulk write."),
+):
+    """Recompute reaction-time statistics from the stored raw trials."""
+    import reaction_stats
+
+    updated = _run_with_db(lambda db: reaction_stats.reanalyse_reactions(db, batch_size))
+    typer.echo(f"Re-analysed {updated} assessments")
+
+
+@cli.command("backfill-attention")
+def backfill_attention(
+    batch_size: int = typer.Option(5000, help="Assessments per cursor batch and bulk write."),
+):
+    """Recompute signal-detection attention metrics for the whole dataset."""
+    import attention_metrics
+
+    updated = _run_with_db(lambda db: attention_metrics.backfill_attention_metrics(db, batch_size))
+    typer.echo(f"Backfilled {updated} assessments")
+
+
+@cli.command("item-analysis")
+def item_analysis():
+    """Recompute memory item difficulty, discrimination and distractor stats."""
+    import item_analysis as analysis
+
+    items = _run_with_db(analysis.run_item_analysis)
+    typer.echo(f"Analysed {items} memory items into {analysis.STATS_COLLECTION}")
+
+
+@cli.command("export")
+def export(
+    output: Path = typer.Argument(..., help="File to write."),
+    format: str = typer.Option("csv", help="'csv' or 'parquet'."),
+    start: Optional[datetime] = typer.Option(None, help="Only assessments on or after this time."),
+    end: Optional[datetime] = typer.Option(None, help="Only assessments before this time."),
+    language: Optional[str] = typer.Option(None, help="Patient preferred language."),
+    risk_level: Optional[str] = typer.Option(None, help="Low, Moderate or High."),
+    include_speech: bool = typer.Option(False, help="Include base64 speech recordings."),
+    batch_size: int = typer.Option(5000, help="Rows per cursor batch / row group."),
+):
+    """Write a pseudonymised research export of assessments."""
+    import export_service
+
+    if format not in export_service.EXPORT_FORMATS:
+        raise typer.BadParameter(f"format must be one of {', '.join(export_service.EXPORT_FORMATS)}")
+    if format == "parquet" and not export_service.parquet_available():
+        raise typer.BadParameter("Parquet export requires pyarrow")
+
+    async def job(db):
+        query = await export_service.build_export_query(db, start, end, language, risk_level)
+        batches = export_service.iter_export_batches(db, query, include_speech, batch_size)
+        written = 0
+        with open(output, "wb") as handle:
+            async for chunk in export_service.stream_export(batches, format, include_speech):
+                handle.write(chunk)
+                written += len(chunk)
+        return written
+
+    written = _run_with_db(job)
+    typer.echo(f"Wrote {written} bytes to {output}")
+
+
+@cli.command("import")
+def import_assessments(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False, help="NDJSON or CSV file to import."),
+    format: Optional[str] = typer.Option(None, help="'ndjson' or 'csv' (default: from the file extension)."),
+    batch_size: int = typer.Option(2000, help="Rows per validated batch / insert_many."),
+    checkpoint: Optional[Path] = typer.Option(None, help="Checkpoint file (default: <path>.checkpoint.json)."),
+    resume: bool = typer.Option(False, help="Skip lines already imported according to the checkpoint."),
+    errors: Optional[Path] = typer.Option(None, help="NDJSON error report (default: <path>.errors.ndjson)."),
+):
+    """Bulk-import historical assessments from an NDJSON or CSV file."""
+    import import_service
+
+    import_format = format or import_service.format_for(path.name)
+    if import_format not in import_service.IMPORT_FORMATS:
+        raise typer.BadParameter(f"format must be one of {', '.join(import_service.IMPORT_FORMATS)}")
+    checkpoint = checkpoint or path.with_name(path.name + ".checkpoint.json")
+    errors = errors or path.with_name(path.name + ".errors.ndjson")
+
+    async def job(db):
+        with open(path, encoding="utf-8-sig", newline="") as stream, \
+                open(errors, "a" if resume else "w") as error_report:
+            return await import_service.import_assessments(
+                db, stream, import_format, source=str(path.resolve()), batch_size=batch_size,
+                checkpoint_path=checkpoint, resume=resume, error_report=error_report
+            )
+
+    stats = _run_with_db(job)
+    typer.echo(
+        f"Read {stats.read} rows in {stats.seconds:.1f}s: {stats.inserted} inserted, "
+        f"{stats.duplicates} duplicates, {stats.invalid} invalid, {stats.skipped} skipped"
+    )
+    if stats.invalid:
+        typer.echo(f"Errors written to {errors}")
+
+
+@cli.command("archive")
+def archive(
+    older_than_days: Optional[int] = typer.Option(None, help="Archive assessments older than this (default RETENTION_DAYS)."),
+    target: Optional[str] = typer.Option(None, help="'collection' or 'ndjson' (default RETENTION_ARCHIVE_TARGET)."),
+    archive_dir: Optional[Path] = typer.Option(None, help="Directory for NDJSON archives."),
+    batch_size: Optional[int] = typer.Option(None, help="Assessments moved per batch."),
+    pause: Optional[float] = typer.Option(None, help="Seconds to pause between batches."),
+    limit: Optional[int] = typer.Option(None, help="Stop after this many assessments."),
+):
+    """Move assessments past the retention age out of the hot collection."""
+    import retention
+
+    async def job(db):
+        return await retention.archive_assessments(
+            db,
+            older_than_days=retention.RETENTION_DAYS if older_than_days is None else older_than_days,
+            target=target or retention.ARCHIVE_TARGET,
+            archive_dir=archive_dir or retention.ARCHIVE_DIR,
+            batch_size=batch_size or retention.BATCH_SIZE,
+            pause_seconds=retention.BATCH_PAUSE_SECONDS if pause is None else pause,
+            limit=limit
+        )
+
+    stats = _run_with_db(job)
+    typer.echo(
+        f"Archived {stats.archived} assessments to {stats.target} in {stats.batches} batches "
+        f"({stats.audio_stripped} with audio stripped) in {stats.seconds:.1f}s"
+    )
+
+
+@cli.command("set-role")
+def set_role(
+    email: str = typer.Argument(..., help="Account email."),
+    role: str = typer.Argument(..., help="user, clinician or admin."),
+):
+    """Change an account's role; it applies from the user's next token refresh."""
+    if role not in ("user", "clinician", "admin"):
+        raise typer.BadParameter("role must be user, clinician or admin")
+
+    async def job(db):
+        return await db.users.update_one({"email": email}, {"$set": {"role": role}})
+
+    result = _run_with_db(job)
+    if result.matched_count == 0:
+        typer.echo(f"No account with email {email}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"{email} is now {role}")
+
+
+@cli.command("report-worker")
+def report_worker(
+    concurrency: int = typer.Option(2, help="Reports rendered at the same time."),
+):
+    """Render queued report jobs outside the API processes."""
+    import report_jobs
+
+    async def job(db):
+        worker = report_jobs.ReportWorker(db, concurrency)
+        typer.echo(f"Report worker {worker.worker_id} started with {concurrency} slots")
+        await worker.run()
+
+    _run_with_db(job)
+
+
+if __name__ == "__main__":
+    cli()
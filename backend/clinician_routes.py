@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models import CohortRequest, CohortPage
+from routes import get_current_clinician
+from serialization import json_response
+from database import get_db
+import cohort_service
+
+clinician_router = APIRouter(tags=["Clinician"])
+
+
+@clinician_router.post("/clinician/cohort", response_model=CohortPage)
+async def get_cohort_overview(
+    cohort_request: CohortRequest,
+    clinician: dict = Depends(get_current_clinician),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Latest assessment and trend for each patient the clinician follows.
+
+    A page of up to `limit` patients costs one care-team query, one
+    aggregation and one name lookup, whatever the cohort size. Pass
+    `next_cursor` back as `cursor` for the following page.
+    """
+    patient_ids, next_cursor = await cohort_service.cohort_page_ids(
+        db, clinician, cohort_request.patient_ids, cohort_request.cursor, cohort_request.limit
+    )
+    return json_response(CohortPage, {
+        "patients": await cohort_service.cohort_overview(db, patient_ids),
+        "next_cursor": next_cursor
+    })
@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Tuple
+
+from assessment_service import ARCHIVE_COLLECTION
+
+CARE_TEAM_COLLECTION = "care_team"
+
+# Score change (points) between a patient's last two assessments that
+# counts as improving or declining rather than stable
+TREND_THRESHOLD = 5.0
+
+
+def trend_direction(latest: Optional[float], previous: Optional[float]) -> Optional[str]:
+    if latest is None or previous is None:
+        return None
+    change = latest - previous
+    if change > TREND_THRESHOLD:
+        return "improving"
+    if change < -TREND_THRESHOLD:
+        return "declining"
+    return "stable"
+
+
+async def cohort_page_ids(
+    db,
+    clinician: dict,
+    patient_ids: Optional[List[str]],
+    cursor: Optional[str],
+    limit: int
+) -> Tuple[List[str], Optional[str]]:
+    """One page of the clinician's patients in id order, and the next cursor.
+
+    Clinicians only see patients linked to them in the care team; admins
+    may ask for any explicit set of patients.
+    """
+    if clinician.get("role") == "admin" and patient_ids is not None:
+        ids = sorted(set(patient_id for patient_id in patient_ids if cursor is None or patient_id > cursor))
+        page = ids[:limit + 1]
+    else:
+        query = {"clinician_id": clinician["id"]}
+        if patient_ids is not None:
+            query["patient_id"] = {"$in": patient_ids}
+        if cursor is not None:
+            query.setdefault("patient_id", {})["$gt"] = cursor
+        links = db[CARE_TEAM_COLLECTION].find(query, projection={"_id": 0, "patient_id": 1})
+        page = [link["patient_id"] for link in await links.sort("patient_id", 1).limit(limit + 1).to_list(length=None)]
+    if len(page) > limit:
+        return page[:limit], page[limit - 1]
+    return page, None
+
+
+def latest_per_patient_pipeline(patient_ids: List[str]) -> List[dict]:
+    """Latest assessment, two most recent scores and count for each patient.
+
+    `$sort` matches the (user_id, test_date) index, so `$first` picks each
+    patient's newest assessment without an in-memory sort.
+    """
+    return [
+        {"$match": {"user_id": {"$in": patient_ids}}},
+        {"$sort": {"user_id": 1, "test_date": -1}},
+        {"$project": {"_id": 0, "user_id": 1, "id": 1, "test_date": 1, "overall_score": 1, "risk_level": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "latest": {"$first": {
+                "id": "$id",
+                "test_date": "$test_date",
+                "overall_score": "$overall_score",
+                "risk_level": "$risk_level",
+            }},
+            # Newest first; only the first two are kept, for the trend
+            "recent": {"$push": {"test_date": "$test_date", "overall_score": "$overall_score"}},
+            "assessment_count": {"$sum": 1},
+        }},
+        {"$project": {
+            "latest": 1,
+            "assessment_count": 1,
+            "recent": {"$slice": ["$recent", 2]},
+        }},
+    ]
+
+
+def _merge_summaries(first: dict, second: dict) -> dict:
+    """Combine one patient's summaries from the hot and archive collections."""
+    latest = max(first["latest"], second["latest"], key=lambda assessment: assessment["test_date"])
+    recent = sorted(first["recent"] + second["recent"], key=lambda score: score["test_date"], reverse=True)[:2]
+    return {
+        "latest": latest,
+        "recent": recent,
+        "assessment_count": first["assessment_count"] + second["assessment_count"],
+    }
+
+
+async def cohort_overview(db, patient_ids: List[str]) -> List[dict]:
+    """Summaries for a page of patients, in the order of `patient_ids`.
+
+    Hot and archived assessments are summarised separately and merged per
+    patient, so counts and trends cover the whole history.
+    """
+    if not patient_ids:
+        return []
+    summaries: Dict[str, dict] = {}
+    for collection in ("assessments", ARCHIVE_COLLECTION):
+        async for summary in db[collection].aggregate(latest_per_patient_pipeline(patient_ids)):
+            patient_id = summary["_id"]
+            summaries[patient_id] = _merge_summaries(summaries[patient_id], summary) if patient_id in summaries else summary
+    names = {
+        user["id"]: user.get("name")
+        async for user in db.users.find({"id": {"$in": patient_ids}}, projection={"_id": 0, "id": 1, "name": 1})
+    }
+
+    patients = []
+    for patient_id in patient_ids:
+        summary = summaries.get(patient_id, {})
+        latest = summary.get("latest")
+        recent = summary.get("recent", [])
+        previous_score = recent[1]["overall_score"] if len(recent) > 1 else None
+        patients.append({
+            "patient_id": patient_id,
+            "name": names.get(patient_id),
+            "latest": latest,
+            "previous_score": previous_score,
+            "assessment_count": summary.get("assessment_count", 0),
+            "trend": trend_direction(latest["overall_score"] if latest else None, previous_score),
+        })
+    return patients
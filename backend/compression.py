@@ -0,0 +1,232 @@
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import os
+import time
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import registry
+
+# Bodies smaller than this go out as they are: the saving would not pay for
+# the header and the CPU
+MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Larger bodies are compressed on a worker thread instead of the event loop
+THREAD_THRESHOLD = int(os.environ.get("COMPRESSION_THREAD_THRESHOLD", str(64 * 1024)))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", "3"))
+
+# Only text-like payloads are compressed; PDFs, audio, images and ZIP
+# archives are already compressed and would just burn CPU
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def _gzip_compressor():
+    # wbits 31: gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli_compressor():
+    import brotli
+
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd_compressor():
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return (
+        compressor.compress,
+        lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush,
+    )
+
+
+def _available_encodings() -> Dict[str, Callable]:
+    """Encodings this process can produce, in order of preference."""
+    encodings = {}
+    try:
+        import zstandard  # noqa: F401
+        encodings["zstd"] = _zstd_compressor
+    except ImportError:
+        pass
+    try:
+        import brotli  # noqa: F401
+        encodings["br"] = _brotli_compressor
+    except ImportError:
+        pass
+    encodings["gzip"] = _gzip_compressor
+    return encodings
+
+
+ENCODINGS = _available_encodings()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the encoding for an `Accept-Encoding` header.
+
+    The client's q-values decide; ties go to the order of ENCODINGS.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if name:
+            weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> Tuple[bytes, float]:
+    """Compress a whole body; returns the bytes and the CPU seconds spent."""
+    started = time.thread_time()
+    process, _, finish = ENCODINGS[encoding]()
+    compressed = process(body) + finish()
+    return compressed, time.thread_time() - started
+
+
+def _compress_chunk(stream, body: bytes, last: bool) -> Tuple[bytes, float]:
+    started = time.thread_time()
+    process, flush, finish = stream
+    compressed = process(body) + (finish() if last else flush())
+    return compressed, time.thread_time() - started
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compress JSON and other text responses with zstd, brotli or gzip.
+
+    gzip is always available; brotli and zstd are offered when their
+    packages are installed. Whole bodies below MINIMUM_SIZE are sent as
+    they are, streamed bodies are compressed chunk by chunk and flushed so
+    NDJSON lines still arrive promptly. Ratio, bytes and CPU time are
+    recorded per encoding.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE, thread_threshold: int = THREAD_THRESHOLD):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingSend(send, encoding, self.minimum_size, self.thread_threshold)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingSend:
+    """`send` wrapper deciding per response whether and how to compress."""
+
+    def __init__(self, send, encoding: str, minimum_size: int, thread_threshold: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.start_message: Optional[dict] = None
+        self.passthrough = False
+        self.stream = None
+        self.original_size = 0
+        self.compressed_size = 0
+        self.cpu_seconds = 0.0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = message["status"] in (204, 206, 304) or not _compressible(headers)
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Held back until the first body chunk shows how big the body is
+                self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            del headers["content-length"]
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The compressed bytes differ from the identity representation
+                headers["etag"] = f"W/{etag}"
+            if not more_body:
+                compressed = await self._compress(len(body), compress, body, self.encoding)
+                headers["content-length"] = str(len(compressed))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                self._record(len(body), len(compressed))
+                return
+            self.stream = ENCODINGS[self.encoding]()
+            await self.send(start)
+
+        compressed = await self._compress(len(body), _compress_chunk, self.stream, body, not more_body)
+        self.original_size += len(body)
+        self.compressed_size += len(compressed)
+        if compressed or not more_body:
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+        if not more_body:
+            self._record(self.original_size, self.compressed_size)
+
+    async def _compress(self, size: int, function, *args) -> bytes:
+        if size >= self.thread_threshold:
+            compressed, cpu_seconds = await asyncio.to_thread(function, *args)
+        else:
+            compressed, cpu_seconds = function(*args)
+        self.cpu_seconds += cpu_seconds
+        return compressed
+
+    def _record(self, original_size: int, compressed_size: int):
+        registry.counter("compression_responses_total", encoding=self.encoding).inc()
+        registry.counter("compression_bytes_in_total", encoding=self.encoding).inc(original_size)
+        registry.counter("compression_bytes_out_total", encoding=self.encoding).inc(compressed_size)
+        if original_size:
+            registry.summary("compression_ratio", encoding=self.encoding).observe(compressed_size / original_size)
+        registry.summary("compression_cpu_seconds", encoding=self.encoding).observe(self.cpu_seconds)
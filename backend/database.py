@@ -0,0 +1,304 @@
+from fastapi import FastAPI, Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+@dataclass
+class DatabaseSettings:
+    """MongoDB connection and pool settings, read from the environment."""
+    url: str
+    name: str
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    connect_timeout_ms: int = 20000
+    server_selection_timeout_ms: int = 30000
+    socket_timeout_ms: Optional[int] = None
+    compressors: List[str] = field(default_factory=list)
+    zlib_compression_level: Optional[int] = None
+    shutdown_grace_seconds: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        compressors = os.environ.get("MONGO_COMPRESSORS", "")
+        return cls(
+            url=os.environ["MONGO_URL"],
+            name=os.environ["DB_NAME"],
+            max_pool_size=_env_int("MONGO_MAX_POOL_SIZE", 100),
+            min_pool_size=_env_int("MONGO_MIN_POOL_SIZE", 0),
+            max_idle_time_ms=_env_int("MONGO_MAX_IDLE_TIME_MS", None),
+            wait_queue_timeout_ms=_env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", None),
+            connect_timeout_ms=_env_int("MONGO_CONNECT_TIMEOUT_MS", 20000),
+            server_selection_timeout_ms=_env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000),
+            socket_timeout_ms=_env_int("MONGO_SOCKET_TIMEOUT_MS", None),
+            compressors=[c.strip() for c in compressors.split(",") if c.strip()],
+            zlib_compression_level=_env_int("MONGO_ZLIB_COMPRESSION_LEVEL", None),
+            shutdown_grace_seconds=float(os.environ.get("MONGO_SHUTDOWN_GRACE_SECONDS", "10")),
+        )
+
+    def client_options(self) -> dict:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+        }
+        if self.max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.socket_timeout_ms is not None:
+            options["socketTimeoutMS"] = self.socket_timeout_ms
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        if self.zlib_compression_level is not None:
+            options["zlibCompressionLevel"] = self.zlib_compression_level
+        return options
+
+
+class PoolCheckoutListener(monitoring.ConnectionPoolListener):
+    """Record how long operations wait to check a connection out of the pool.
+
+    Check-out started/finished events for one operation fire on the same
+    thread, so the start time is kept in a thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self.wait_seconds = registry.summary("mongo_pool_checkout_wait_seconds")
+        self.checked_out = registry.gauge("mongo_pool_checked_out_connections")
+        self.open_connections = registry.gauge("mongo_pool_open_connections")
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self.wait_seconds.observe(time.perf_counter() - started)
+            self._local.started = None
+        self.checked_out.inc()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        registry.counter("mongo_pool_checkout_failures_total", reason=event.reason).inc()
+
+    def connection_checked_in(self, event):
+        self.checked_out.dec()
+
+    def connection_created(self, event):
+        self.open_connections.inc()
+
+    def connection_closed(self, event):
+        self.open_connections.dec()
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        registry.counter("mongo_pool_cleared_total").inc()
+
+    def pool_closed(self, event):
+        pass
+
+
+def create_client(settings: DatabaseSettings) -> AsyncIOMotorClient:
+    """Create a Motor client with pool settings and checkout monitoring."""
+    return AsyncIOMotorClient(
+        settings.url,
+        event_listeners=[PoolCheckoutListener()],
+        **settings.client_options()
+    )
+
+
+class DatabaseState:
+    """Lifespan-owned client plus a count of requests still using it."""
+
+    def __init__(self, settings: DatabaseSettings):
+        self.settings = settings
+        self.client = create_client(settings)
+        self.db: AsyncIOMotorDatabase = self.client[settings.name]
+        registry.gauge("mongo_pool_max_size").set(settings.max_pool_size)
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def acquire(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def release(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    async def close(self):
+        """Wait (bounded) for in-flight requests to finish, then close the pool."""
+        if self.in_flight:
+            logger.info("Waiting for %d in-flight database requests", self.in_flight)
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.settings.shutdown_grace_seconds)
+            except asyncio.TimeoutError:
+                logger.warning("Closing MongoDB client with %d requests still in flight", self.in_flight)
+        self.client.close()
+
+
+def _status_collection_options() -> dict:
+    """Creation options for `status_checks` from STATUS_CHECKS_STORAGE.
+
+    "timeseries" buckets checks by client and expires them after
+    STATUS_CHECKS_RETENTION_DAYS; "capped" keeps a fixed-size ring buffer;
+    anything else leaves a regular collection.
+    """
+    storage = os.environ.get("STATUS_CHECKS_STORAGE", "standard").lower()
+    if storage == "timeseries":
+        retention_days = float(os.environ.get("STATUS_CHECKS_RETENTION_DAYS", "30"))
+        return {
+            "timeseries": {"timeField": "timestamp", "metaField": "client_name", "granularity": "seconds"},
+            "expireAfterSeconds": int(retention_days * 86400),
+        }
+    if storage == "capped":
+        return {
+            "capped": True,
+            "size": _env_int("STATUS_CHECKS_CAPPED_SIZE_MB", 16) * 1024 * 1024,
+            "max": _env_int("STATUS_CHECKS_CAPPED_MAX", 100000),
+        }
+    return {}
+
+
+async def ensure_collections(db: AsyncIOMotorDatabase):
+    """Create collections with special storage options and the indexes queries rely on."""
+    existing = set(await db.list_collection_names())
+
+    if "status_checks" not in existing:
+        options = _status_collection_options()
+        if options:
+            await db.create_collection("status_checks", **options)
+    await db.status_checks.create_index("timestamp")
+    await db.memory_item_stats.create_index("item_id", unique=True)
+    # Lets bulk imports be re-run safely: duplicate ids are rejected, not doubled
+    await db.assessments.create_index("id", unique=True)
+    # Per-patient history in either date order (history page, longitudinal report)
+    await db.assessments.create_index([("user_id", 1), ("test_date", 1)])
+    # Retention: the archive job walks old assessments by date; archived ones
+    # are read by id and per patient like the hot ones
+    await db.assessments.create_index("test_date")
+    await db.assessments_archive.create_index("id", unique=True)
+    await db.assessments_archive.create_index([("user_id", 1), ("test_date", 1)])
+    # Per-patient summaries behind the dashboard ETags
+    await db.assessment_summaries.create_index("user_id", unique=True)
+    # Abandoned assessment drafts expire
+    await db.assessment_drafts.create_index("id", unique=True)
+    await db.assessment_drafts.create_index("expires_at", expireAfterSeconds=0)
+    # Clinician -> patient links; cohort pages walk a clinician's patients in id order
+    await db.care_team.create_index([("clinician_id", 1), ("patient_id", 1)], unique=True)
+    # Refresh tokens (single use, rotated) and token revocations
+    await db.refresh_tokens.create_index("jti", unique=True)
+    await db.refresh_tokens.create_index("sid")
+    await db.refresh_tokens.create_index("user_id")
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.token_revocations.create_index("key", unique=True)
+    await db.token_revocations.create_index("revoked_at")
+    await db.token_revocations.create_index("expires_at", expireAfterSeconds=0)
+    # Stored responses for Idempotency-Key retries
+    await db.idempotency_keys.create_index("key", unique=True)
+    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+    # One share link per assessment, renewed in place (see create_share_link)
+    await db.share_links.create_index("token", unique=True)
+    try:
+        await db.share_links.create_index("assessment_id", unique=True)
+    except OperationFailure as error:
+        logger.error("share_links has several links for one assessment; remove the stale ones "
+                     "so the unique assessment_id index can be built: %s", error)
+    # Report job queue: claims scan by status/time, finished jobs and files expire
+    await db.report_jobs.create_index("id", unique=True)
+    await db.report_jobs.create_index([("status", 1), ("available_at", 1)])
+    await db.report_jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    await db.report_jobs.create_index([("user_id", 1), ("status", 1)])
+    await db.report_jobs.create_index("expires_at", expireAfterSeconds=0)
+    await db.report_files.create_index("job_id", unique=True)
+    await db.report_files.create_index("expires_at", expireAfterSeconds=0)
+    await db.bulk_exports.create_index("id", unique=True)
+    await db.bulk_exports.create_index("expires_at", expireAfterSeconds=0)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the MongoDB client on startup and drain/close it on shutdown.
+
+    The yielded state is copied onto every request as `request.state.db`.
+    """
+    state = DatabaseState(DatabaseSettings.from_env())
+    app.state.database = state
+    if os.environ.get("MONGO_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes"):
+        await ensure_collections(state.db)
+    try:
+        yield {"db": state.db}
+    finally:
+        await state.close()
+
+
+@asynccontextmanager
+async def open_database():
+    """Database for scripts and CLI commands that run outside the app lifespan."""
+    settings = DatabaseSettings.from_env()
+    client = create_client(settings)
+    try:
+        yield client[settings.name]
+    finally:
+        client.close()
+
+
+async def get_db(request: Request) -> AsyncIOMotorDatabase:
+    """Dependency returning the lifespan-managed database."""
+    return request.app.state.database.db
+
+
+class InFlightMiddleware:
+    """Count each HTTP request as in flight until its response is fully sent.
+
+    Counted here rather than in `get_db`: a yield dependency exits before a
+    StreamingResponse body is sent, so status streams and exports would
+    otherwise escape the shutdown drain.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        state: Optional[DatabaseState] = None
+        if scope["type"] == "http":
+            state = getattr(scope["app"].state, "database", None)
+        if state is None:
+            await self.app(scope, receive, send)
+            return
+        state.acquire()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state.release()
@@ -0,0 +1,217 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Union, get_args, get_origin
+import asyncio
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+
+from assessment_service import ARCHIVE_COLLECTION
+from models import AssessmentResult
+from auth import SECRET_KEY
+
+# Key for pseudonymising identifiers; keep it stable so exports can be joined
+# across runs, and never give it to the research team
+PSEUDONYM_KEY = os.environ.get("EXPORT_PSEUDONYM_KEY", SECRET_KEY).encode()
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+BASE_COLUMNS = [
+    ("patient_id", str),
+    ("assessment_id", str),
+    ("test_date", "date"),
+    ("overall_score", float),
+    ("risk_level", str),
+]
+
+
+def _result_columns(include_speech: bool) -> List[tuple]:
+    """Flattened `results.*` columns with their scalar types.
+
+    Raw list inputs (trials, events, items) never stay in `results`; nested
+    dicts such as reaction_stats are exported as JSON text.
+    """
+    columns = []
+    for name, field in AssessmentResult.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) is Union:
+            annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+        if get_origin(annotation) is list:
+            continue
+        if name == "speech_data" and not include_speech:
+            continue
+        if annotation is dict:
+            annotation = "json"
+        columns.append((f"results.{name}", annotation))
+    return columns
+
+
+def export_columns(include_speech: bool = False) -> List[tuple]:
+    return BASE_COLUMNS + _result_columns(include_speech)
+
+
+def pseudonymise(value: str) -> str:
+    """Keyed hash of a direct identifier (stable, not reversible without the key)."""
+    return hmac.new(PSEUDONYM_KEY, value.encode(), hashlib.sha256).hexdigest()[:24]
+
+
+async def build_export_query(
+    db,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    language: Optional[str] = None,
+    risk_level: Optional[str] = None
+) -> dict:
+    """MongoDB filter for an export; language is a property of the user."""
+    query = {}
+    if start or end:
+        query["test_date"] = {}
+        if start:
+            query["test_date"]["$gte"] = start
+        if end:
+            query["test_date"]["$lt"] = end
+    if risk_level:
+        query["risk_level"] = risk_level
+    if language:
+        user_ids = await db.users.distinct("id", {"preferred_language": language})
+        query["user_id"] = {"$in": user_ids}
+    return query
+
+
+def _speech_data_uri(audio: dict) -> str:
+    """A stored recording as the base64 data URL it would have been uploaded as."""
+    from speech_audio import speech_audio_bytes
+
+    data, mime = speech_audio_bytes(audio)
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+
+def flatten_assessment(document: dict, columns: List[tuple]) -> dict:
+    """One export row: pseudonymised ids, day-precision date, flattened results."""
+    results = document.get("results") or {}
+    row = {
+        "patient_id": pseudonymise(document["user_id"]),
+        "assessment_id": pseudonymise(document["id"]),
+        "test_date": document["test_date"].date(),
+        "overall_score": document.get("overall_score"),
+        "risk_level": document.get("risk_level"),
+    }
+    audio = (document.get("raw_data") or {}).get("speech_audio")
+    if audio and "results.speech_data" in dict(columns):
+        results = {**results, "speech_data": _speech_data_uri(audio)}
+    for column, kind in columns[len(BASE_COLUMNS):]:
+        value = results.get(column[len("results."):])
+        if kind == "json" and value is not None:
+            value = json.dumps(value, default=str, separators=(",", ":"))
+        row[column] = value
+    return row
+
+
+async def iter_export_batches(
+    db,
+    query: dict,
+    include_speech: bool = False,
+    batch_size: int = 5000
+) -> AsyncIterator[List[dict]]:
+    """Yield flattened rows one cursor batch at a time, archived assessments included."""
+    if include_speech:
+        # Recordings are stored compacted under raw_data
+        projection = {"_id": 0, "raw_data.reaction_trials": 0, "raw_data.attention_events": 0, "raw_data.memory_items": 0}
+    else:
+        projection = {"_id": 0, "raw_data": 0, "results.speech_data": 0}
+    columns = export_columns(include_speech)
+    # Archived assessments are older than the retention age, so they come
+    # first; their speech audio was dropped when they were archived
+    for collection in (ARCHIVE_COLLECTION, "assessments"):
+        cursor = db[collection].find(query, projection=projection, batch_size=batch_size).sort("test_date", 1)
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            yield [flatten_assessment(document, columns) for document in batch]
+
+
+async def stream_csv(batches: AsyncIterator[List[dict]], include_speech: bool = False) -> AsyncIterator[bytes]:
+    """Encode row batches as CSV, one chunk per batch."""
+    names = [name for name, _ in export_columns(include_speech)]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names)
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands out whatever has been written so far."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(include_speech: bool):
+    import pyarrow as pa
+
+    types = {str: pa.string(), "json": pa.string(), "date": pa.date32(),
+             float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+    return pa.schema([(name, types[kind]) for name, kind in export_columns(include_speech)])
+
+
+async def stream_parquet(batches: AsyncIterator[List[dict]], include_speech: bool = False) -> AsyncIterator[bytes]:
+    """Encode row batches as Parquet, one row group per batch.
+
+    Each row group is flushed to the client as soon as it is written, so only
+    one batch is ever held in memory. Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(include_speech)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in batches:
+            table = pa.Table.from_pylist(rows, schema=schema)
+            await asyncio.to_thread(writer.write_table, table)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_export(batches: AsyncIterator[List[dict]], export_format: str, include_speech: bool = False):
+    if export_format == "parquet":
+        return stream_parquet(batches, include_speech)
+    return stream_csv(batches, include_speech)
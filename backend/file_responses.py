@@ -0,0 +1,103 @@
+from typing import Mapping, Optional, Tuple
+import os
+
+import anyio
+from starlette.responses import FileResponse
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None when the range cannot be satisfied and raises ValueError when
+    the header is malformed or asks for several ranges, in which case the
+    caller serves the whole file, as RFC 9110 allows.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError("Unsupported range")
+    first, _, last = spec.strip().partition("-")
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if start > end and start < size:
+            raise ValueError("Invalid range")
+    elif last:
+        # Suffix range: the final N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        raise ValueError("Invalid range")
+    if start >= size:
+        return None
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with Content-Length, ETag and single-range (206) support.
+
+    Clients on flaky connections can resume an interrupted download with
+    `Range` plus `If-Range`; if the file changed in between, the validator no
+    longer matches and the whole file is sent again.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        request_headers: Mapping[str, str],
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None,
+        stat_result: Optional[os.stat_result] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        stat_result = stat_result or os.stat(path)
+        super().__init__(path, headers=headers, media_type=media_type, filename=filename, stat_result=stat_result)
+        self.headers["accept-ranges"] = "bytes"
+        self.range: Optional[Tuple[int, int]] = None
+
+        size = stat_result.st_size
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if not range_header or (if_range and if_range not in (self.headers["etag"], self.headers["last-modified"])):
+            return
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return
+        if byte_range is None:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            return
+
+        start, end = byte_range
+        self.range = byte_range
+        self.status_code = 206
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        if self.status_code == 200:
+            await super().__call__(scope, receive, send)
+            return
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.range is None or scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        start, end = self.range
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; end the body rather than hang
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
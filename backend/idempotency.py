@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+import hashlib
+import os
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pymongo.errors import DuplicateKeyError
+
+from metrics import registry
+
+COLLECTION = "idempotency_keys"
+
+# Stored responses are replayed for this long; the TTL index deletes them after
+TTL_HOURS = float(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+# A claim older than this belongs to a request that died mid-way and may be retried
+LOCK_TIMEOUT_SECONDS = float(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", "60"))
+MAX_KEY_LENGTH = 255
+
+
+def _as_response(result) -> Response:
+    if isinstance(result, Response):
+        return result
+    return JSONResponse(jsonable_encoder(result))
+
+
+def _replay(stored: dict) -> Response:
+    registry.counter("idempotent_replays_total", route=stored["route"]).inc()
+    return Response(
+        content=stored["body"],
+        status_code=stored["status_code"],
+        media_type=stored["media_type"],
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def request_fingerprint(path: str, query_string: bytes, body: bytes) -> str:
+    """Hash of everything a retry must repeat exactly.
+
+    The key is scoped to the route template, so the concrete path (with
+    its ids) and the query count as much as the body.
+    """
+    fingerprint = hashlib.sha256()
+    for part in (path.encode(), query_string, body):
+        fingerprint.update(len(part).to_bytes(8, "big") + part)
+    return fingerprint.hexdigest()
+
+
+async def run_idempotent(
+    db,
+    request: Request,
+    user_id: str,
+    idempotency_key: str,
+    handler: Callable[[], Awaitable[object]]
+) -> Response:
+    """Run `handler` at most once per (user, route, Idempotency-Key).
+
+    The first request claims the key and stores its response; retries with
+    the same key, path, query and body get that response back without
+    redoing any work. Reusing a key for a different request is rejected, and a retry that
+    arrives while the first attempt is still running gets 409. Failed
+    attempts release the key so the client can try again.
+    """
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+    route = request.scope["route"].path
+    key = f"{user_id}:{request.method}:{route}:{idempotency_key}"
+    request_hash = request_fingerprint(request.scope["path"], request.scope["query_string"], await request.body())
+    keys = db[COLLECTION]
+
+    now = datetime.utcnow()
+    claim = {
+        "key": key,
+        "route": route,
+        "request_hash": request_hash,
+        "status": "in_progress",
+        "locked_until": now + timedelta(seconds=LOCK_TIMEOUT_SECONDS),
+        "created_at": now,
+        "expires_at": now + timedelta(hours=TTL_HOURS),
+    }
+    try:
+        await keys.insert_one(dict(claim))
+    except DuplicateKeyError:
+        stored = await keys.find_one({"key": key})
+        if stored is None:
+            raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is being retried")
+        if stored["request_hash"] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if stored["status"] == "completed":
+            return _replay(stored)
+        # Take over a claim abandoned by a crashed request, otherwise wait
+        taken = await keys.update_one(
+            {"key": key, "status": "in_progress", "locked_until": {"$lte": now}},
+            {"$set": {"locked_until": claim["locked_until"]}}
+        )
+        if taken.modified_count == 0:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"}
+            )
+
+    try:
+        response = _as_response(await handler())
+    except BaseException:
+        await keys.delete_one({"key": key, "status": "in_progress"})
+        raise
+
+    if response.status_code >= 500:
+        await keys.delete_one({"key": key, "status": "in_progress"})
+        return response
+
+    await keys.update_one({"key": key}, {"$set": {
+        "status": "completed",
+        "status_code": response.status_code,
+        "media_type": response.media_type,
+        "body": response.body,
+    }})
+    return response
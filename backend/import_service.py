@@ -0,0 +1,272 @@
+from dataclasses import dataclass, field, asdict
+from datetime import timezone
+from functools import partial
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+import asyncio
+import csv
+import json
+import logging
+import time
+import uuid
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import AssessmentImportRow, AssessmentResult
+from assessment_service import build_assessment, record_new_assessments
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# Namespace for ids derived from (user, test date) when a row has no id, so
+# re-running an import (or resuming after a crash) never duplicates rows
+IMPORT_NAMESPACE = uuid.UUID("6f1c2a52-3c1e-4b8e-9a57-4d0e2f9b7c11")
+
+RESULT_FIELDS = set(AssessmentResult.model_fields)
+DUPLICATE_KEY = 11000
+MAX_ERRORS_KEPT = 100
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    skipped: int = 0  # lines already imported according to the checkpoint
+    last_line: int = 0
+    seconds: float = 0.0
+    errors: List[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats["rows_per_second"] = self.read / self.seconds if self.seconds else 0.0
+        return stats
+
+
+def format_for(filename: str) -> str:
+    """Guess the import format from a file name."""
+    return "csv" if filename.lower().endswith(".csv") else "ndjson"
+
+
+def _cell(value):
+    """Decode a CSV cell: blanks are missing, JSON lists/objects are parsed."""
+    if value is None or value == "":
+        return None
+    if value[0] in "[{":
+        return json.loads(value)
+    return value
+
+
+def _unflatten(row: dict, from_csv: bool) -> dict:
+    """Nest flat `results.x` (or bare result field) keys under `results`.
+
+    Raises ValueError for a row that is not an object or whose `results` is
+    not one, so it is reported like any other invalid row.
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"Expected a JSON object, got {type(row).__name__}")
+    results = row.get("results")
+    if from_csv:
+        results = _cell(results)
+    if results is not None and not isinstance(results, dict):
+        raise ValueError(f"results must be an object, got {type(results).__name__}")
+    nested = {}
+    results = dict(results or {})
+    for key, value in row.items():
+        if key == "results":
+            continue
+        if from_csv:
+            value = _cell(value)
+        if key.startswith("results."):
+            results[key[len("results."):]] = value
+        elif key in RESULT_FIELDS:
+            results[key] = value
+        elif value is not None:
+            nested[key] = value
+    nested["results"] = results
+    return nested
+
+
+def iter_rows(stream: IO[str], import_format: str) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, row dict or parse error) from an NDJSON or CSV stream."""
+    if import_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            try:
+                yield reader.line_num, _unflatten(row, from_csv=True)
+            except ValueError as error:
+                yield reader.line_num, error
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, _unflatten(json.loads(line), from_csv=False)
+        except ValueError as error:
+            yield line_number, error
+
+
+class Checkpoint:
+    """Last fully inserted line of a source file, persisted as JSON."""
+
+    def __init__(self, path: Optional[Path], source: str):
+        self.path = path
+        self.source = source
+
+    def load(self) -> int:
+        if not self.path or not self.path.exists():
+            return 0
+        state = json.loads(self.path.read_text())
+        if state.get("source") != self.source:
+            raise ValueError(f"Checkpoint {self.path} belongs to {state.get('source')}, not {self.source}")
+        return state["line"]
+
+    def save(self, line: int, stats: ImportStats):
+        if not self.path:
+            return
+        state = {"source": self.source, "line": line, "stats": stats.as_dict()}
+        temporary = self.path.with_suffix(self.path.suffix + ".tmp")
+        temporary.write_text(json.dumps(state, default=str))
+        temporary.replace(self.path)
+
+
+class AssessmentImporter:
+    """Validate, score and insert rows in unordered batches.
+
+    While one batch is being inserted the next one is parsed and scored, so
+    the database and the CPU work overlap.
+    """
+
+    def __init__(self, db, batch_size: int = 2000, error_report: Optional[IO[str]] = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.error_report = error_report
+        self.stats = ImportStats()
+        self._user_ids_by_email = {}
+
+    def _error(self, line: int, message: str):
+        self.stats.invalid += 1
+        error = {"line": line, "error": message}
+        if len(self.stats.errors) < MAX_ERRORS_KEPT:
+            self.stats.errors.append(error)
+        if self.error_report is not None:
+            self.error_report.write(json.dumps(error) + "\n")
+
+    async def _resolve_emails(self, rows: List[Tuple[int, AssessmentImportRow]]):
+        emails = {row.email for _, row in rows if not row.user_id and row.email}
+        missing = [email for email in emails if email not in self._user_ids_by_email]
+        if missing:
+            cursor = self.db.users.find({"email": {"$in": missing}}, projection={"_id": 0, "id": 1, "email": 1})
+            async for user in cursor:
+                self._user_ids_by_email[user["email"]] = user["id"]
+
+    async def _build_documents(self, rows: List[Tuple[int, AssessmentImportRow]]) -> List[Tuple[int, dict]]:
+        await self._resolve_emails(rows)
+        documents = []
+        for line, row in rows:
+            user_id = row.user_id or self._user_ids_by_email.get(row.email)
+            if not user_id:
+                self._error(line, "Unknown patient: provide user_id or the email of a registered user")
+                continue
+            test_date = row.test_date
+            if test_date.tzinfo is not None:
+                test_date = test_date.astimezone(timezone.utc).replace(tzinfo=None)
+            assessment_id = row.id or str(uuid.uuid5(IMPORT_NAMESPACE, f"{user_id}|{test_date.isoformat()}"))
+            try:
+                build = partial(build_assessment, user_id, row.results, test_date=test_date, assessment_id=assessment_id)
+                # Decoding a recording is CPU-bound; keep it off the event loop
+                assessment = await asyncio.to_thread(build) if row.results.speech_data else build()
+            except (ValueError, ValidationError) as error:
+                self._error(line, str(error))
+                continue
+            documents.append((line, assessment.dict()))
+        return documents
+
+    async def _insert(self, documents: List[Tuple[int, dict]]):
+        if not documents:
+            return
+        failed = set()
+        try:
+            result = await self.db.assessments.insert_many([doc for _, doc in documents], ordered=False)
+            self.stats.inserted += len(result.inserted_ids)
+        except BulkWriteError as error:
+            self.stats.inserted += error.details.get("nInserted", 0)
+            for write_error in error.details.get("writeErrors", []):
+                failed.add(write_error["index"])
+                if write_error.get("code") == DUPLICATE_KEY:
+                    self.stats.duplicates += 1
+                else:
+                    self._error(documents[write_error["index"]][0], write_error.get("errmsg", "Write failed"))
+        await record_new_assessments(
+            self.db, (doc for index, (_, doc) in enumerate(documents) if index not in failed)
+        )
+
+    async def run(
+        self,
+        rows: Iterator[Tuple[int, object]],
+        start_after: int = 0,
+        checkpoint: Optional[Checkpoint] = None
+    ) -> ImportStats:
+        started = time.perf_counter()
+        pending: Optional[asyncio.Task] = None
+        pending_last_line = 0
+        batch: List[Tuple[int, AssessmentImportRow]] = []
+
+        async def flush(batch, last_line):
+            nonlocal pending, pending_last_line
+            documents = await self._build_documents(batch)
+            if pending is not None:
+                await pending
+                if checkpoint:
+                    checkpoint.save(pending_last_line, self.stats)
+            pending = asyncio.ensure_future(self._insert(documents))
+            pending_last_line = last_line
+
+        last_line = start_after
+        for line, row in rows:
+            if line <= start_after:
+                self.stats.skipped += 1
+                continue
+            self.stats.read += 1
+            last_line = line
+            if isinstance(row, Exception):
+                self._error(line, f"Unreadable row: {row}")
+                continue
+            try:
+                batch.append((line, AssessmentImportRow.model_validate(row)))
+            except ValidationError as error:
+                self._error(line, str(error).replace("\n", " "))
+                continue
+            if len(batch) >= self.batch_size:
+                await flush(batch, line)
+                batch = []
+                logger.info("Imported %d rows (%d inserted)", self.stats.read, self.stats.inserted)
+
+        await flush(batch, last_line)
+        await pending
+        self.stats.last_line = last_line
+        self.stats.seconds = time.perf_counter() - started
+        if checkpoint:
+            checkpoint.save(last_line, self.stats)
+        return self.stats
+
+
+async def import_assessments(
+    db,
+    stream: IO[str],
+    import_format: str,
+    source: str,
+    batch_size: int = 2000,
+    checkpoint_path: Optional[Path] = None,
+    resume: bool = False,
+    error_report: Optional[IO[str]] = None
+) -> ImportStats:
+    """Import historical assessments from an NDJSON or CSV text stream."""
+    checkpoint = Checkpoint(checkpoint_path, source)
+    start_after = checkpoint.load() if resume else 0
+    importer = AssessmentImporter(db, batch_size=batch_size, error_report=error_report)
+    return await importer.run(iter_rows(stream, import_format), start_after, checkpoint)
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import List
+import logging
+import math
+import os
+import uuid
+
+from pymongo import ReplaceOne
+
+from assessment_service import ARCHIVE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "memory_item_stats"
+
+# Thresholds used to flag items for review
+TOO_EASY_DIFFICULTY = float(os.environ.get("ITEM_TOO_EASY_DIFFICULTY", "0.9"))
+TOO_HARD_DIFFICULTY = float(os.environ.get("ITEM_TOO_HARD_DIFFICULTY", "0.2"))
+MIN_DISCRIMINATION = float(os.environ.get("ITEM_MIN_DISCRIMINATION", "0.2"))
+
+
+def _item_response_pipeline() -> List[dict]:
+    """Aggregate item responses down to sufficient statistics on the server.
+
+    For every (item, response, correct) combination this returns the count and
+    the sums needed for a corrected item-total (point-biserial) correlation:
+    the rest score y is the proportion correct on the *other* items of the same
+    assessment. Only a handful of groups per item leave the server, and
+    allowDiskUse lets MongoDB spill the $group stage instead of holding tens of
+    millions of unwound responses in memory.
+    """
+    items = "$raw_data.memory_items"
+    return [
+        {"$match": {"raw_data.memory_items.1": {"$exists": True}}},
+        {"$project": {
+            "_id": 0,
+            "items": items,
+            "item_count": {"$size": items},
+            "score": {"$size": {"$filter": {"input": items, "cond": "$$this.correct"}}},
+        }},
+        {"$unwind": "$items"},
+        {"$project": {
+            "item_id": "$items.item_id",
+            "response": {"$ifNull": ["$items.response", None]},
+            "x": {"$cond": ["$items.correct", 1, 0]},
+            "y": {"$divide": [
+                {"$subtract": ["$score", {"$cond": ["$items.correct", 1, 0]}]},
+                {"$subtract": ["$item_count", 1]},
+            ]},
+        }},
+        {"$group": {
+            "_id": {"item_id": "$item_id", "response": "$response", "x": "$x"},
+            "n": {"$sum": 1},
+            "sum_y": {"$sum": "$y"},
+            "sum_yy": {"$sum": {"$multiply": ["$y", "$y"]}},
+        }},
+    ]
+
+
+def _summarise_item(item_id: str, groups: List[dict]) -> dict:
+    """Turn one item's grouped sums into difficulty, discrimination and distractor stats."""
+    n = sum(group["n"] for group in groups)
+    sum_x = sum(group["n"] for group in groups if group["_id"]["x"] == 1)
+    sum_y = sum(group["sum_y"] for group in groups)
+    sum_yy = sum(group["sum_yy"] for group in groups)
+    sum_xy = sum(group["sum_y"] for group in groups if group["_id"]["x"] == 1)
+
+    difficulty = sum_x / n
+    covariance = sum_xy / n - difficulty * (sum_y / n)
+    variance_x = difficulty * (1 - difficulty)
+    variance_y = sum_yy / n - (sum_y / n) ** 2
+    if variance_x > 0 and variance_y > 1e-12:
+        discrimination = covariance / math.sqrt(variance_x * variance_y)
+    else:
+        discrimination = None
+
+    distractors = sorted(
+        (
+            {
+                "response": group["_id"]["response"],
+                "count": group["n"],
+                "proportion": group["n"] / n,
+                "mean_rest_score": group["sum_y"] / group["n"],
+            }
+            for group in groups
+            if group["_id"]["x"] == 0
+        ),
+        key=lambda distractor: distractor["count"],
+        reverse=True
+    )
+
+    flags = []
+    if difficulty >= TOO_EASY_DIFFICULTY:
+        flags.append("too_easy")
+    if difficulty <= TOO_HARD_DIFFICULTY:
+        flags.append("too_hard")
+    if discrimination is not None and discrimination < MIN_DISCRIMINATION:
+        flags.append("poor_discrimination")
+
+    return {
+        "item_id": item_id,
+        "responses": n,
+        "difficulty": difficulty,
+        "discrimination": discrimination,
+        "mean_rest_score_correct": sum_xy / sum_x if sum_x else None,
+        "mean_rest_score_incorrect": (sum_y - sum_xy) / (n - sum_x) if n > sum_x else None,
+        "distractors": distractors,
+        "flags": flags,
+    }
+
+
+async def run_item_analysis(db) -> int:
+    """Recompute memory item statistics and cache them in `memory_item_stats`."""
+    started = datetime.utcnow()
+    run_id = str(uuid.uuid4())
+
+    # Archived assessments keep their item responses; their groups' sums are
+    # added to the hot collection's
+    merged = {}
+    for collection in ("assessments", ARCHIVE_COLLECTION):
+        cursor = db[collection].aggregate(_item_response_pipeline(), allowDiskUse=True)
+        async for group in cursor:
+            key = (group["_id"]["item_id"], group["_id"]["response"], group["_id"]["x"])
+            if key in merged:
+                for field in ("n", "sum_y", "sum_yy"):
+                    merged[key][field] += group[field]
+            else:
+                merged[key] = group
+    by_item = {}
+    for group in merged.values():
+        by_item.setdefault(group["_id"]["item_id"], []).append(group)
+
+    stats = db[STATS_COLLECTION]
+    requests = []
+    for item_id, groups in by_item.items():
+        summary = _summarise_item(item_id, groups)
+        summary.update({"run_id": run_id, "computed_at": started})
+        requests.append(ReplaceOne({"item_id": item_id}, summary, upsert=True))
+    if requests:
+        await stats.bulk_write(requests, ordered=False)
+    # Items that no longer appear in any assessment
+    await stats.delete_many({"run_id": {"$ne": run_id}})
+
+    logger.info("Analysed %d memory items in %.1fs", len(requests),
+                (datetime.utcnow() - started).total_seconds())
+    return len(requests)
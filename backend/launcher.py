@@ -0,0 +1,122 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+import warmup
+from structured_logging import stop_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, worker_index: int, log_level: str):
+    """Serve the preloaded app on the shared socket; runs in the forked child."""
+    warmup.mark_process_start()
+    logger.info("Worker %d started (pid %d)", worker_index, os.getpid())
+    # uvicorn's loggers propagate to the root queue handler (see
+    # structured_logging); the middleware there writes the access lines
+    config = uvicorn.Config(app, log_level=log_level, log_config=None, access_log=False, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(app, sock: socket.socket, worker_index: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Restore default handlers; uvicorn installs its own in the worker
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            _run_worker(app, sock, worker_index, log_level)
+        except BaseException:
+            logger.exception("Worker %d crashed", worker_index)
+            exit_code = 1
+        finally:
+            # os._exit skips atexit; flush the log queue first
+            stop_logging()
+            os._exit(exit_code)
+    return pid
+
+
+def run(
+    host: str = "0.0.0.0",
+    port: int = 8001,
+    workers: int = 2,
+    warm_up: bool = True,
+    backlog: int = 2048,
+    log_level: str = "info"
+):
+    """Preload the app once, then fork `workers` uvicorn processes sharing one socket.
+
+    Everything imported before the fork (FastAPI, pydantic models, ReportLab...)
+    is shared copy-on-write, so workers only pay for their own lifespan start-up:
+    a fresh Motor client and, optionally, the warm-up in warmup.py.
+    """
+    if warm_up:
+        os.environ["WARMUP_ON_START"] = "true"
+        warmup.WARMUP_ON_START = True
+    # Import the lazily loaded modules in the parent so every fork shares them
+    warmup.EAGER_IMPORTS = True
+
+    preload_started = time.perf_counter()
+    from server import app
+    logger.info("Preloaded app in %.0f ms", (time.perf_counter() - preload_started) * 1000)
+
+    sock = _bind_socket(host, port, backlog)
+    logger.info("Listening on %s:%d with %d workers", host, port, workers)
+
+    # Keep preloaded objects out of the collector's generations so the
+    # workers' first GC pass doesn't touch (and copy) every shared page
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    for index in range(workers):
+        children[_fork_worker(app, sock, index, log_level)] = index
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        if not stopping:
+            logger.warning("Worker %d (pid %d) exited with status %d, restarting",
+                           index, pid, os.waitstatus_to_exitcode(status))
+            time.sleep(1)
+            children[_fork_worker(app, sock, index, log_level)] = index
+
+    sock.close()
+    logger.info("All workers stopped")
@@ -0,0 +1,125 @@
+from typing import Dict, Tuple
+import threading
+
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Summary:
+    """Count, sum and max of observed values."""
+
+    kind = "summary"
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else 0.0
+        }
+
+
+class MetricsRegistry:
+    """In-process metrics, safe to update from worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[tuple, object]] = {}
+
+    def _get(self, cls, name: str, labels: dict):
+        key = _label_key(labels)
+        family = self._metrics.get(name)
+        if family is not None and key in family:
+            return family[key]
+        with self._lock:
+            family = self._metrics.setdefault(name, {})
+            if key not in family:
+                family[key] = cls(threading.Lock())
+            metric = family[key]
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is a {metric.kind}, not a {cls.kind}")
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def summary(self, name: str, **labels) -> Summary:
+        return self._get(Summary, name, labels)
+
+    def snapshot(self) -> dict:
+        """Return every metric as plain JSON-able data."""
+        with self._lock:
+            families = [(name, list(family.items())) for name, family in self._metrics.items()]
+
+        result = {}
+        for name, family in sorted(families):
+            if [key for key, _ in family] == [()]:
+                result[name] = family[0][1].snapshot()
+            else:
+                result[name] = [
+                    {"labels": dict(key), "value": metric.snapshot()}
+                    for key, metric in family
+                ]
+        return result
+
+
+registry = MetricsRegistry()
@@ -22,11 +22,6 @@ class UserLogin(BaseModel):
 class User(UserBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class UserResponse(BaseModel):
@@ -35,17 +30,31 @@ class UserResponse(BaseModel):
     name: str
     preferred_language: str
     created_at: datetime
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime in seconds
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class MemoryItemResponse(BaseModel):
+    item_id: str
+    correct: bool
+    response: Optional[str] = None  # option the patient chose, for distractor analysis
+    response_time_ms: Optional[float] = None
+
+
+class AttentionEvent(BaseModel):
+    onset_ms: float  # stimulus onset from the start of the attention test
+    is_target: bool
+    response_time_ms: Optional[float] = None  # None when there was no response
 
 
 class AssessmentResult(BaseModel):
@@ -53,17 +62,30 @@ class AssessmentResult(BaseModel):
     memory_accuracy: Optional[float] = None
     memory_correct: Optional[int] = None
     memory_total: Optional[int] = None
+    # Per-item responses; stored under raw_data for population item analysis
+    memory_items: Optional[List[MemoryItemResponse]] = Field(None, max_length=200)
     
     attention_score: Optional[float] = None
     attention_accuracy: Optional[float] = None
     attention_hits: Optional[int] = None
     attention_false_alarms: Optional[int] = None
+    # Raw event stream; stored packed outside `results` and summarised
+    # server-side into signal-detection metrics in `attention_sdt`
+    attention_events: Optional[List[AttentionEvent]] = Field(None, max_length=2000)
+    # Server-computed; ignored when sent by a client
+    attention_sdt: Optional[dict] = None
     
     reaction_score: Optional[float] = None
     reaction_avg_time: Optional[float] = None
     reaction_best_time: Optional[float] = None
+    # Raw per-trial latencies (ms); stored packed outside `results` and
+    # summarised server-side into `reaction_stats`
+    reaction_trials: Optional[List[float]] = Field(None, max_length=1000)
+    # Server-computed; ignored when sent by a client
+    reaction_stats: Optional[dict] = None
     
     speech_duration: Optional[float] = None
+    # Base64 recording or data URL; stored as 16 kHz mono PCM under raw_data
     speech_data: Optional[str] = None
     speech_analysis: Optional[dict] = None
 
@@ -75,17 +97,21 @@ class Assessment(BaseModel):
     results: AssessmentResult
     overall_score: float
     risk_level: str  # Low, Moderate, High
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    raw_data: dict = Field(default_factory=dict)  # packed per-trial arrays, not returned by the API
 
 
 class AssessmentCreate(BaseModel):
     results: AssessmentResult
 
 
+class AssessmentImportRow(BaseModel):
+    id: Optional[str] = None  # source id; a stable one is derived when missing
+    user_id: Optional[str] = None
+    email: Optional[EmailStr] = None  # alternative to user_id
+    test_date: datetime
+    results: AssessmentResult
+
+
 class AssessmentResponse(BaseModel):
     id: str
     user_id: str
@@ -93,11 +119,6 @@ class AssessmentResponse(BaseModel):
     results: AssessmentResult
     overall_score: float
     risk_level: str
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class AssessmentHistory(BaseModel):
@@ -112,9 +133,108 @@ class ShareLink(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     expires_at: datetime
     accessed_count: int = 0
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
+
+class SharedReportResponse(BaseModel):
+    assessment: AssessmentResponse
+    patient_name: str
+    shared_at: datetime
+    expires_at: datetime
+
+
+class ReportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    kind: str  # handler name in report_jobs.REPORT_HANDLERS
+    params: dict = Field(default_factory=dict)
+    status: str = "queued"  # queued, running, succeeded, failed
+    attempts: int = 0
+    max_attempts: int = 3
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    available_at: datetime = Field(default_factory=datetime.utcnow)  # not claimable before this (retry backoff)
+    lease_expires_at: Optional[datetime] = None  # visibility timeout while running
+    worker_id: Optional[str] = None
+    lease_id: Optional[str] = None  # changes on every claim, so a stale worker cannot finish the job
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None  # filename, size and content type of the stored file
+    expires_at: Optional[datetime] = None  # TTL for finished jobs
+
+
+class ReportJobCreate(BaseModel):
+    kind: str = "assessment_pdf"  # or "history_pdf"
+    assessment_id: Optional[str] = None
+    start: Optional[datetime] = None  # history_pdf date range
+    end: Optional[datetime] = None
+
+
+class ReportJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
+
+
+class BulkReportExportRequest(BaseModel):
+    assessment_ids: Optional[List[str]] = Field(None, max_length=20000)  # explicit selection...
+    # ...or a filter; by default the latest assessment of every patient
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    risk_level: Optional[str] = None
+    latest_per_patient: bool = True
+
+
+class AssessmentDraft(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))  # becomes the assessment id on finalize
+    user_id: str
+    results: dict = Field(default_factory=dict)  # completed steps' fields, unscored
+    steps_completed: List[str] = Field(default_factory=list)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime  # TTL: abandoned drafts are deleted by MongoDB
+
+
+class AssessmentDraftResponse(BaseModel):
+    id: str
+    steps_completed: List[str]
+    created_at: datetime
+    updated_at: datetime
+    expires_at: datetime
+
+
+class CareTeamLink(BaseModel):
+    clinician_id: str
+    patient_ids: List[str] = Field(..., max_length=5000)
+
+
+class CohortRequest(BaseModel):
+    patient_ids: Optional[List[str]] = Field(None, max_length=5000)  # default: the whole care team
+    cursor: Optional[str] = None  # next_cursor of the previous page
+    limit: int = Field(500, ge=1, le=1000)
+
+
+class CohortAssessmentSummary(BaseModel):
+    id: str
+    test_date: datetime
+    overall_score: float
+    risk_level: str
+
+
+class CohortPatient(BaseModel):
+    patient_id: str
+    name: Optional[str] = None
+    latest: Optional[CohortAssessmentSummary] = None
+    previous_score: Optional[float] = None
+    assessment_count: int
+    trend: Optional[str] = None  # improving, stable or declining; None with fewer than two assessments
+
+
+class CohortPage(BaseModel):
+    patients: List[CohortPatient]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,26 @@
+from typing import Sequence
+import numpy as np
+
+# Raw per-trial data is stored as packed little-endian arrays (BSON binary)
+# instead of JSON lists: 4 bytes per float32 value versus ~12 for a BSON double
+# plus its array index key, and it loads straight into NumPy without parsing.
+
+
+def pack_float32(values: Sequence[float]) -> bytes:
+    """Pack numbers as little-endian float32 bytes."""
+    return np.asarray(values, dtype="<f4").tobytes()
+
+
+def unpack_float32(data: bytes) -> np.ndarray:
+    """Unpack little-endian float32 bytes into a float64 array."""
+    return np.frombuffer(data, dtype="<f4").astype(np.float64)
+
+
+def pack_uint8(values: Sequence[int]) -> bytes:
+    """Pack small non-negative integers (flags, categories) as bytes."""
+    return np.asarray(values, dtype=np.uint8).tobytes()
+
+
+def unpack_uint8(data: bytes) -> np.ndarray:
+    """Unpack bytes written by pack_uint8."""
+    return np.frombuffer(data, dtype=np.uint8)
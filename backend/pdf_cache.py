@@ -0,0 +1,110 @@
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Rendered reports are written to disk once and served from there, so memory
+# per download is one read chunk and a resumed download gets the same bytes
+CACHE_DIR = Path(os.environ.get("PDF_CACHE_DIR", Path(tempfile.gettempdir()) / "dementia-pdf-cache"))
+CACHE_TTL_SECONDS = float(os.environ.get("PDF_CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_BYTES = int(float(os.environ.get("PDF_CACHE_MAX_MB", "512")) * 1024 * 1024)
+PRUNE_INTERVAL_SECONDS = 60
+
+_locks: Dict[str, asyncio.Lock] = {}
+_last_prune = 0.0
+
+
+def cache_key(kind: str, *parts) -> str:
+    """Stable key for a report built from `parts` (the documents it renders)."""
+    payload = json.dumps([kind, *parts], default=str, sort_keys=True, separators=(",", ":"))
+    return f"{kind}-{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def _render_file(path: Path, render: Callable):
+    """Render into a temporary file next to `path`, then move it into place."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    started = time.perf_counter()
+    try:
+        with os.fdopen(handle, "wb") as output:
+            render(output)
+        os.replace(temporary, path)
+        logger.info("Rendered %s in %.0fms", path.name, (time.perf_counter() - started) * 1000)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def prune(now: Optional[float] = None):
+    """Drop expired files, then the oldest ones while over the size cap."""
+    now = now or time.time()
+    if not CACHE_DIR.exists():
+        return
+    files = []
+    for entry in os.scandir(CACHE_DIR):
+        try:
+            stat_result = entry.stat()
+        except FileNotFoundError:
+            continue
+        if now - stat_result.st_mtime > CACHE_TTL_SECONDS:
+            Path(entry.path).unlink(missing_ok=True)
+        else:
+            files.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= CACHE_MAX_BYTES:
+            break
+        Path(path).unlink(missing_ok=True)
+        total -= size
+
+
+def _fresh(path: Path):
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        return None
+    if time.time() - stat_result.st_mtime > CACHE_TTL_SECONDS:
+        return None
+    return stat_result
+
+
+async def cached_render(key: str, render: Callable) -> Tuple[Path, os.stat_result]:
+    """Return the cached file for `key`, rendering it with `render(output)` if needed.
+
+    Concurrent requests for the same report in this process render it once;
+    the rendering itself runs in a worker thread.
+    """
+    global _last_prune
+    path = CACHE_DIR / f"{key}.pdf"
+    stat_result = _fresh(path)
+    if stat_result is not None:
+        registry.counter("pdf_cache_requests_total", result="hit").inc()
+        return path, stat_result
+
+    lock = _locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            stat_result = _fresh(path)
+            if stat_result is None:
+                registry.counter("pdf_cache_requests_total", result="miss").inc()
+                await asyncio.to_thread(_render_file, path, render)
+                stat_result = path.stat()
+            else:
+                registry.counter("pdf_cache_requests_total", result="hit").inc()
+    finally:
+        if not lock.locked():
+            _locks.pop(key, None)
+
+    if time.monotonic() - _last_prune > PRUNE_INTERVAL_SECONDS:
+        _last_prune = time.monotonic()
+        await asyncio.to_thread(prune)
+    return path, stat_result
@@ -1,17 +1,34 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from io import BytesIO
-from datetime import datetime
+from datetime import date, datetime
+from typing import BinaryIO, Optional
+import os
 import uuid
 
+# ReportLab takes ~150 ms to import, so it is imported on first use rather
+# than on every process start; call preload() to pay that cost up front.
 
-def generate_assessment_pdf(assessment: dict, user: dict) -> BytesIO:
-    """Generate a professional PDF report for an assessment."""
-    buffer = BytesIO()
+
+def preload():
+    """Import ReportLab and build its stylesheet ahead of the first report."""
+    from reportlab.platypus import SimpleDocTemplate  # noqa: F401
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    getSampleStyleSheet()
+
+
+def generate_assessment_pdf(assessment: dict, user: dict, output: Optional[BinaryIO] = None) -> BinaryIO:
+    """Generate a professional PDF report for an assessment.
+
+    Writes into `output` (e.g. a cache file) when given, otherwise a BytesIO.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+    buffer = output if output is not None else BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
     
     # Container for PDF elements
@@ -238,6 +255,194 @@ def generate_assessment_pdf(assessment: dict, user: dict) -> BytesIO:
     return buffer
 
 
+# Longest series drawn per trend chart and most rows in the history table, so
+# rendering cost is bounded however long the patient's history is
+HISTORY_CHART_POINTS = int(os.environ.get("HISTORY_CHART_POINTS", "60"))
+HISTORY_TABLE_ROWS = int(os.environ.get("HISTORY_TABLE_ROWS", "24"))
+
+# (title, getter, fixed y range) of each trend chart in the history report
+TREND_DOMAINS = [
+    ("Overall Cognitive Score", lambda a: a.get("overall_score"), (0, 100)),
+    ("Memory Recall (%)", lambda a: (a.get("results") or {}).get("memory_accuracy"), (0, 100)),
+    ("Attention & Focus (%)", lambda a: (a.get("results") or {}).get("attention_accuracy"), (0, 100)),
+    ("Reaction Time (ms)", lambda a: (a.get("results") or {}).get("reaction_avg_time"), None),
+]
+
+
+def _day_number(value) -> float:
+    """Date as a fractional day ordinal, for the x axis of trend charts."""
+    value = datetime.fromisoformat(str(value))
+    return value.toordinal() + (value.hour * 3600 + value.minute * 60 + value.second) / 86400
+
+
+def _trend_chart(title: str, xs: list, ys: list, y_range=None, max_points: int = HISTORY_CHART_POINTS):
+    """Line chart of one domain over time, downsampled to `max_points`."""
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.graphics.charts.lineplots import LinePlot
+    from reportlab.graphics.widgets.markers import makeMarker
+    from reportlab.lib import colors
+    from downsample import lttb
+
+    xs, ys = lttb(xs, ys, max_points)
+    xs, ys = xs.tolist(), ys.tolist()
+
+    drawing = Drawing(500, 170)
+    drawing.add(String(0, 158, title, fontName='Helvetica-Bold', fontSize=11,
+                       fillColor=colors.HexColor('#1e293b')))
+
+    plot = LinePlot()
+    plot.x, plot.y, plot.width, plot.height = 40, 25, 440, 120
+    plot.data = [list(zip(xs, ys))]
+    plot.lines[0].strokeColor = colors.HexColor('#2563eb')
+    plot.lines[0].strokeWidth = 1.5
+    if len(xs) <= 40:
+        plot.lines[0].symbol = makeMarker('FilledCircle', size=3)
+
+    # Pad a single-day span so the axis has a range to draw
+    x_min, x_max = xs[0], xs[-1]
+    if x_max - x_min < 30:
+        x_min, x_max = x_min - 15, x_max + 15
+    plot.xValueAxis.valueMin, plot.xValueAxis.valueMax = x_min, x_max
+    plot.xValueAxis.valueSteps = [x_min + (x_max - x_min) * step / 4 for step in range(5)]
+    plot.xValueAxis.labelTextFormat = lambda value: date.fromordinal(int(value)).strftime('%b %Y')
+    plot.xValueAxis.labels.fontSize = 8
+    plot.yValueAxis.labels.fontSize = 8
+    plot.yValueAxis.visibleGrid = True
+    plot.yValueAxis.gridStrokeColor = colors.HexColor('#e2e8f0')
+    if y_range:
+        plot.yValueAxis.valueMin, plot.yValueAxis.valueMax = y_range
+        plot.yValueAxis.valueStep = 25
+    drawing.add(plot)
+    return drawing
+
+
+def generate_history_pdf(assessments: list, user: dict, output: Optional[BinaryIO] = None) -> BinaryIO:
+    """Generate a longitudinal PDF report over a patient's assessments (oldest first)."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, KeepTogether
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+
+    buffer = output if output is not None else BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+
+    elements = []
+    styles = getSampleStyleSheet()
+
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2563eb'),
+        spaceAfter=20,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#1e293b'),
+        spaceAfter=12,
+        spaceBefore=20
+    )
+    note_style = ParagraphStyle(
+        'Note',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#64748b')
+    )
+
+    elements.append(Paragraph("Cognitive Screening History Report", title_style))
+    elements.append(Paragraph(
+        "<b>IMPORTANT MEDICAL DISCLAIMER:</b> This report summarises screening results only and "
+        "does NOT constitute a medical diagnosis. Trends should be interpreted by a qualified "
+        "healthcare professional.", note_style
+    ))
+
+    # Patient and summary
+    elements.append(Paragraph("Summary", heading_style))
+    first, latest = assessments[0], assessments[-1]
+    scores = [a['overall_score'] for a in assessments if a.get('overall_score') is not None]
+    change = latest['overall_score'] - first['overall_score']
+    summary_data = [
+        ['Name:', user.get('name', 'N/A')],
+        ['Assessments:', str(len(assessments))],
+        ['Period:', f"{datetime.fromisoformat(str(first['test_date'])):%B %d, %Y} - "
+                    f"{datetime.fromisoformat(str(latest['test_date'])):%B %d, %Y}"],
+        ['Latest Score:', f"{round(latest['overall_score'])}/100 ({latest['risk_level']} risk)"],
+        ['Change Since First:', f"{change:+.0f} points"],
+        ['Average Score:', f"{sum(scores) / len(scores):.0f}/100"],
+    ]
+    summary_table = Table(summary_data, colWidths=[2*inch, 4*inch])
+    summary_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#64748b')),
+        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1e293b')),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    elements.append(summary_table)
+
+    # Per-domain trends
+    elements.append(Paragraph("Trends by Domain", heading_style))
+    for title, value_of, y_range in TREND_DOMAINS:
+        points = [(_day_number(a['test_date']), value_of(a)) for a in assessments]
+        points = [(x, y) for x, y in points if y is not None]
+        if not points:
+            continue
+        xs, ys = zip(*points)
+        elements.append(KeepTogether([_trend_chart(title, list(xs), list(ys), y_range), Spacer(1, 0.15*inch)]))
+    if len(assessments) > HISTORY_CHART_POINTS:
+        elements.append(Paragraph(
+            f"Charts show {HISTORY_CHART_POINTS} representative points of {len(assessments)} "
+            "assessments, keeping peaks and dips.", note_style
+        ))
+
+    # Most recent assessments
+    elements.append(Paragraph("Recent Assessments", heading_style))
+    recent = assessments[-HISTORY_TABLE_ROWS:][::-1]
+    table_data = [['Date', 'Score', 'Risk', 'Memory', 'Attention', 'Reaction']]
+    for a in recent:
+        results = a.get('results') or {}
+        table_data.append([
+            f"{datetime.fromisoformat(str(a['test_date'])):%Y-%m-%d}",
+            f"{round(a['overall_score'])}",
+            a['risk_level'],
+            f"{round(results['memory_accuracy'])}%" if results.get('memory_accuracy') is not None else '-',
+            f"{round(results['attention_accuracy'])}%" if results.get('attention_accuracy') is not None else '-',
+            f"{round(results['reaction_avg_time'])}ms" if results.get('reaction_avg_time') is not None else '-',
+        ])
+    history_table = Table(table_data, colWidths=[1.2*inch, 0.8*inch, 1*inch, 1*inch, 1*inch, 1*inch], repeatRows=1)
+    history_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+    ]))
+    elements.append(history_table)
+    if len(assessments) > len(recent):
+        elements.append(Spacer(1, 0.1*inch))
+        elements.append(Paragraph(f"Showing the {len(recent)} most recent of {len(assessments)} assessments.", note_style))
+
+    elements.append(Spacer(1, 0.3*inch))
+    elements.append(Paragraph(
+        f"<b>Report Generated:</b> {datetime.utcnow().strftime('%B %d, %Y at %I:%M %p UTC')}<br/>"
+        "<i>This report is confidential and intended for the named patient and their healthcare providers only.</i>",
+        ParagraphStyle('Footer', parent=note_style, fontSize=8, alignment=TA_CENTER)
+    ))
+
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+
 def generate_share_token() -> str:
     """Generate a unique share token."""
     return str(uuid.uuid4())
@@ -0,0 +1,118 @@
+from typing import Dict, Optional, Tuple
+import math
+import os
+import time
+
+from fastapi import HTTPException, Request
+
+from metrics import registry
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Reverse proxies in front of the API that append to X-Forwarded-For; the
+# client address is taken that many entries from the right. 0 trusts only
+# the socket peer, so the header cannot be spoofed to dodge limits.
+TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+# Idle keys are forgotten once their bucket is full again; sweeps run at
+# most this often, and a bucket set never holds more than MAX_KEYS
+SWEEP_INTERVAL_SECONDS = float(os.environ.get("RATE_LIMIT_SWEEP_INTERVAL_SECONDS", "60"))
+MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Default "<requests>/<seconds>" per policy: a full bucket allows that many
+# requests at once and refills at that rate. Override with
+# RATE_LIMIT_<POLICY>, e.g. RATE_LIMIT_LOGIN_ACCOUNT=10/300; "off" disables.
+DEFAULT_POLICIES = {
+    "login_ip": "20/60",
+    "login_account": "5/60",
+    "register_ip": "10/3600",
+    "shared_report_ip": "60/60",
+    "shared_report_token": "120/60",
+}
+
+
+class TokenBucket:
+    """Token buckets for many keys, one float per key.
+
+    Stored per key is the time at which its bucket will be full again (the
+    "theoretical arrival time" of the generic cell rate algorithm), which
+    behaves exactly like a token count plus a last-refill timestamp. A key
+    whose time has passed has a full bucket and can be dropped.
+    """
+
+    def __init__(self, capacity: int, period_seconds: float, max_keys: int = MAX_KEYS):
+        self.capacity = capacity
+        self.interval = period_seconds / capacity  # seconds to refill one token
+        self.window = period_seconds  # time to refill an empty bucket
+        self.max_keys = max_keys
+        self._full_at: Dict[str, float] = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._full_at)
+
+    def acquire(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take a token for `key`; returns (allowed, seconds until one is available)."""
+        now = time.monotonic() if now is None else now
+        full_at = self._full_at.get(key, now)
+        if full_at < now:
+            full_at = now
+        new_full_at = full_at + self.interval
+        wait = new_full_at - self.window - now
+        if wait > 0:
+            return False, wait
+        self._full_at[key] = new_full_at
+        if now - self._last_sweep > SWEEP_INTERVAL_SECONDS or len(self._full_at) > self.max_keys:
+            self.sweep(now)
+        return True, 0.0
+
+    def sweep(self, now: Optional[float] = None):
+        """Forget keys whose buckets have refilled; evict the oldest if still too many."""
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        self._full_at = {key: full_at for key, full_at in self._full_at.items() if full_at > now}
+        # Evict down to 90% so a flood of new keys does not sweep on every call
+        excess = len(self._full_at) - int(self.max_keys * 0.9)
+        if len(self._full_at) > self.max_keys:
+            for key in list(self._full_at)[:excess]:
+                del self._full_at[key]
+
+
+def _parse_policy(name: str, default: str) -> Optional[TokenBucket]:
+    spec = os.environ.get(f"RATE_LIMIT_{name.upper()}", default).strip().lower()
+    if spec in ("", "0", "off", "none"):
+        return None
+    count, _, seconds = spec.partition("/")
+    return TokenBucket(int(count), float(seconds or 1))
+
+
+def load_policies() -> Dict[str, Optional[TokenBucket]]:
+    return {name: _parse_policy(name, default) for name, default in DEFAULT_POLICIES.items()}
+
+
+# Buckets live in this process only: with several workers each enforces its
+# own share. They are only touched from the event loop, so need no lock.
+policies = load_policies()
+
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXIES:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= TRUSTED_PROXIES:
+            return forwarded[-TRUSTED_PROXIES]
+    return request.client.host if request.client else "unknown"
+
+
+def enforce(policy: str, key: str):
+    """Count a request against `policy` for `key`; raise 429 when over the limit."""
+    if not RATE_LIMIT_ENABLED:
+        return
+    bucket = policies.get(policy)
+    if bucket is None:
+        return
+    allowed, wait = bucket.acquire(key)
+    if not allowed:
+        registry.counter("rate_limited_total", policy=policy).inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
@@ -0,0 +1,141 @@
+from typing import List, Sequence
+import logging
+import os
+
+import numpy as np
+from pymongo import UpdateOne
+
+from assessment_service import ARCHIVE_COLLECTION, invalidate_summaries
+from packing import pack_float32, unpack_float32
+
+logger = logging.getLogger(__name__)
+
+# Responses slower than this count as attention lapses
+LAPSE_THRESHOLD_MS = float(os.environ.get("REACTION_LAPSE_THRESHOLD_MS", "500"))
+# Responses faster than this are anticipations, not reactions to the stimulus
+ANTICIPATION_THRESHOLD_MS = float(os.environ.get("REACTION_ANTICIPATION_THRESHOLD_MS", "100"))
+
+
+def pack_trials(trials: Sequence[float]) -> bytes:
+    """Pack per-trial latencies (ms) for storage."""
+    return pack_float32(trials)
+
+
+def _to_matrix(trial_arrays: Sequence[np.ndarray]) -> np.ndarray:
+    """Stack ragged trial arrays into one NaN-padded (assessments x trials) matrix."""
+    width = max((len(trials) for trials in trial_arrays), default=0)
+    matrix = np.full((len(trial_arrays), max(width, 1)), np.nan)
+    for row, trials in enumerate(trial_arrays):
+        matrix[row, :len(trials)] = trials
+    return matrix
+
+
+def _order_statistic(ordered: np.ndarray, position: np.ndarray) -> np.ndarray:
+    """Linearly interpolate each sorted row at a fractional index."""
+    below = np.floor(position).astype(np.intp)
+    above = np.ceil(position).astype(np.intp)
+    low = np.take_along_axis(ordered, below[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(ordered, above[:, None], axis=1)[:, 0]
+    return low + (position - below) * (high - low)
+
+
+def compute_reaction_stats_batch(trial_arrays: Sequence[np.ndarray]) -> List[dict]:
+    """Robust reaction-time statistics for many assessments in one vectorized pass.
+
+    Anticipations are excluded before computing the median, IQR, coefficient
+    of variation and the mean of trials inside the Tukey fences
+    (Q1 - 1.5 IQR, Q3 + 1.5 IQR).
+    """
+    if len(trial_arrays) == 0:
+        return []
+
+    latencies = _to_matrix(trial_arrays)
+    recorded = ~np.isnan(latencies)
+    anticipations = (latencies < ANTICIPATION_THRESHOLD_MS).sum(axis=1)
+    lapses = (latencies > LAPSE_THRESHOLD_MS).sum(axis=1)
+
+    valid = np.where(latencies >= ANTICIPATION_THRESHOLD_MS, latencies, np.nan)
+    valid_count = (~np.isnan(valid)).sum(axis=1)
+    has_valid = valid_count > 0
+    # Rows without a single valid trial would make the nan-reductions warn;
+    # give them a dummy value here and report them as missing below
+    safe = np.where(has_valid[:, None], valid, 0.0)
+    missing = np.full(len(safe), np.nan)
+
+    # np.nanpercentile loops over rows in Python; sorting once (NaNs go last)
+    # and interpolating between order statistics keeps it vectorized
+    ordered = np.sort(safe, axis=1)
+    last = np.maximum(valid_count - 1, 0)
+    q1, median, q3 = (_order_statistic(ordered, last * fraction) for fraction in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    minimum = ordered[:, 0].copy()
+    mean = np.divide(np.nansum(safe, axis=1), valid_count, out=missing.copy(), where=has_valid)
+    squares = np.nansum((safe - mean[:, None]) ** 2, axis=1)
+    std = np.sqrt(np.divide(squares, valid_count - 1, out=missing.copy(), where=valid_count > 1))
+    cv = np.divide(std, mean, out=missing.copy(), where=(valid_count > 1) & (mean > 0))
+
+    inliers = (safe >= (q1 - 1.5 * iqr)[:, None]) & (safe <= (q3 + 1.5 * iqr)[:, None])
+    inlier_count = inliers.sum(axis=1)
+    trimmed_mean = np.divide(
+        np.where(inliers, safe, 0.0).sum(axis=1), inlier_count,
+        out=missing.copy(), where=has_valid & (inlier_count > 0)
+    )
+
+    for column in (q1, median, q3, iqr, minimum):
+        column[~has_valid] = np.nan
+
+    columns = {
+        "trials": recorded.sum(axis=1),
+        "valid_trials": valid_count,
+        "median_ms": median,
+        "q1_ms": q1,
+        "q3_ms": q3,
+        "iqr_ms": iqr,
+        "mean_ms": mean,
+        "cv": cv,
+        "trimmed_mean_ms": trimmed_mean,
+        "min_ms": minimum,
+        "lapses": lapses,
+        "anticipations": anticipations,
+    }
+    # tolist() converts a whole column to Python numbers at C speed; NaN
+    # (missing) is stored as None
+    names = list(columns)
+    rows = zip(*(column.tolist() for column in columns.values()))
+    return [
+        {name: None if value != value else value for name, value in zip(names, row)}
+        for row in rows
+    ]
+
+
+def compute_reaction_stats(trials: Sequence[float]) -> dict:
+    """Robust reaction-time statistics for one assessment."""
+    return compute_reaction_stats_batch([np.asarray(trials, dtype=np.float64)])[0]
+
+
+async def reanalyse_reactions(db, batch_size: int = 5000) -> int:
+    """Recompute `results.reaction_stats` for every assessment with raw trials."""
+    updated = 0
+    # Archived assessments keep their raw data and are re-analysed too
+    for collection in ("assessments", ARCHIVE_COLLECTION):
+        cursor = db[collection].find(
+            {"raw_data.reaction_trials": {"$exists": True}},
+            projection={"_id": 1, "raw_data.reaction_trials": 1},
+            batch_size=batch_size
+        )
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            stats = compute_reaction_stats_batch(
+                [unpack_float32(doc["raw_data"]["reaction_trials"]) for doc in batch]
+            )
+            await db[collection].bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"results.reaction_stats": doc_stats}})
+                for doc, doc_stats in zip(batch, stats)
+            ], ordered=False)
+            updated += len(batch)
+            logger.info("Re-analysed reaction trials for %d assessments", updated)
+    # Cached dashboard responses now show stale results
+    await invalidate_summaries(db)
+    return updated
@@ -0,0 +1,334 @@
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from pymongo import ReturnDocument
+
+from metrics import registry
+from models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "report_jobs"
+FILES_COLLECTION = "report_files"
+
+# Queue tuning; everything lives in MongoDB so no external broker is needed
+LEASE_SECONDS = float(os.environ.get("REPORT_JOB_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.environ.get("REPORT_JOB_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_SECONDS = float(os.environ.get("REPORT_JOB_RETRY_BACKOFF_SECONDS", "5"))
+MAX_ACTIVE_PER_USER = int(os.environ.get("REPORT_JOBS_MAX_ACTIVE_PER_USER", "5"))
+MAX_RUNNING_PER_USER = int(os.environ.get("REPORT_JOBS_MAX_RUNNING_PER_USER", "1"))
+RESULT_TTL_HOURS = float(os.environ.get("REPORT_JOB_RESULT_TTL_HOURS", "24"))
+POLL_SECONDS = float(os.environ.get("REPORT_WORKER_POLL_SECONDS", "1"))
+WORKER_CONCURRENCY = int(os.environ.get("REPORT_WORKER_CONCURRENCY", "1"))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+class JobLimitExceeded(Exception):
+    """The user already has the maximum number of active report jobs."""
+
+
+class JobFailed(Exception):
+    """A job failed in a way that retrying cannot fix."""
+
+
+# A handler renders one job and returns (file bytes, filename, content type)
+ReportHandler = Callable[[object, dict], Awaitable[Tuple[bytes, str, str]]]
+REPORT_HANDLERS: Dict[str, ReportHandler] = {}
+
+
+def report_handler(kind: str):
+    """Register a coroutine that renders jobs of `kind`."""
+    def register(handler: ReportHandler) -> ReportHandler:
+        REPORT_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+@report_handler("assessment_pdf")
+async def render_assessment_pdf(db, job: dict) -> Tuple[bytes, str, str]:
+    from assessment_service import find_assessment
+    from pdf_service import generate_assessment_pdf
+
+    assessment_id = job["params"].get("assessment_id")
+    assessment = await find_assessment(db, {"id": assessment_id, "user_id": job["user_id"]})
+    if not assessment:
+        raise JobFailed("Assessment not found")
+    user = await db.users.find_one({"id": job["user_id"]})
+    pdf_buffer = await asyncio.to_thread(generate_assessment_pdf, assessment, user)
+    return pdf_buffer.getvalue(), f"cognitive_assessment_{assessment_id[:8]}.pdf", "application/pdf"
+
+
+@report_handler("history_pdf")
+async def render_history_pdf(db, job: dict) -> Tuple[bytes, str, str]:
+    from pdf_service import generate_history_pdf
+    from assessment_service import fetch_history
+
+    params = job["params"]
+    assessments = await fetch_history(db, job["user_id"], params.get("start"), params.get("end"))
+    if not assessments:
+        raise JobFailed("No assessments found")
+    user = await db.users.find_one({"id": job["user_id"]})
+    pdf_buffer = await asyncio.to_thread(generate_history_pdf, assessments, user)
+    return pdf_buffer.getvalue(), f"cognitive_history_{job['created_at']:%Y%m%d}.pdf", "application/pdf"
+
+
+class _FinishedEvent:
+    """Set when a job finishes; counts the long-polls waiting on it."""
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.waiters = 0
+
+
+# Wakes long-polling requests in this process as soon as a local worker
+# finishes a job; requests for jobs finished elsewhere fall back to polling.
+# An entry lives only while someone is waiting on it.
+_finished_events: Dict[str, _FinishedEvent] = {}
+
+
+def _notify_finished(job_id: str):
+    finished = _finished_events.pop(job_id, None)
+    if finished is not None:
+        finished.event.set()
+
+
+def _stop_waiting(job_id: str, finished: Optional[_FinishedEvent]):
+    if finished is None:
+        return
+    finished.waiters -= 1
+    if finished.waiters == 0 and _finished_events.get(job_id) is finished:
+        del _finished_events[job_id]
+
+
+async def submit_job(db, user_id: str, kind: str, params: dict) -> dict:
+    """Queue a report job, enforcing the per-user limit on active jobs."""
+    if kind not in REPORT_HANDLERS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    active = await db[JOBS_COLLECTION].count_documents(
+        {"user_id": user_id, "status": {"$in": list(ACTIVE_STATUSES)}}
+    )
+    if active >= MAX_ACTIVE_PER_USER:
+        raise JobLimitExceeded(f"At most {MAX_ACTIVE_PER_USER} report jobs can be queued or running")
+
+    job = ReportJob(user_id=user_id, kind=kind, params=params, max_attempts=MAX_ATTEMPTS).dict()
+    await db[JOBS_COLLECTION].insert_one(job)
+    registry.counter("report_jobs_submitted_total", kind=kind).inc()
+    return job
+
+
+async def get_job(db, job_id: str, user_id: str) -> Optional[dict]:
+    return await db[JOBS_COLLECTION].find_one({"id": job_id, "user_id": user_id}, projection={"_id": 0})
+
+
+async def wait_for_job(db, job_id: str, user_id: str, timeout: float) -> Optional[dict]:
+    """Long-poll a job until it finishes or `timeout` seconds pass."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    finished = None
+    try:
+        while True:
+            job = await get_job(db, job_id, user_id)
+            remaining = deadline - loop.time()
+            if job is None or job["status"] in FINISHED_STATUSES or remaining <= 0:
+                return job
+            if finished is None or finished.event.is_set():
+                # First wait, or woken by a finish this read did not see (a
+                # stale worker): wait on a fresh event
+                _stop_waiting(job_id, finished)
+                finished = _finished_events.setdefault(job_id, _FinishedEvent())
+                finished.waiters += 1
+            try:
+                await asyncio.wait_for(finished.event.wait(), min(remaining, POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _stop_waiting(job_id, finished)
+
+
+async def get_job_file(db, job_id: str) -> Optional[dict]:
+    return await db[FILES_COLLECTION].find_one({"job_id": job_id}, projection={"_id": 0})
+
+
+async def _busy_users(db) -> list:
+    """Users already at their running-job limit (a soft limit: claims may race)."""
+    pipeline = [
+        {"$match": {"status": "running", "lease_expires_at": {"$gt": datetime.utcnow()}}},
+        {"$group": {"_id": "$user_id", "running": {"$sum": 1}}},
+        {"$match": {"running": {"$gte": MAX_RUNNING_PER_USER}}},
+    ]
+    return [group["_id"] async for group in db[JOBS_COLLECTION].aggregate(pipeline)]
+
+
+async def claim_job(db, worker_id: str) -> Optional[dict]:
+    """Atomically claim the oldest runnable job.
+
+    Queued jobs become claimable at `available_at`; running jobs whose lease
+    has expired (the worker died or hung) become claimable again, which is the
+    queue's visibility timeout.
+    """
+    now = datetime.utcnow()
+    query = {"$or": [
+        {"status": "queued", "available_at": {"$lte": now}},
+        {"status": "running", "lease_expires_at": {"$lte": now}},
+    ]}
+    busy = await _busy_users(db)
+    if busy:
+        query["user_id"] = {"$nin": busy}
+    return await db[JOBS_COLLECTION].find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_id": uuid.uuid4().hex,
+                "started_at": now,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _owned(job: dict) -> dict:
+    """Filter matching a job only while this claim still holds its lease."""
+    return {"id": job["id"], "lease_id": job["lease_id"], "status": "running"}
+
+
+async def _finish(db, job: dict, status: str, error: Optional[str] = None, result: Optional[dict] = None) -> bool:
+    now = datetime.utcnow()
+    outcome = await db[JOBS_COLLECTION].update_one(_owned(job), {"$set": {
+        "status": status,
+        "finished_at": now,
+        "lease_expires_at": None,
+        "error": error,
+        "result": result,
+        "expires_at": now + timedelta(hours=RESULT_TTL_HOURS),
+    }})
+    registry.counter("report_jobs_finished_total", kind=job["kind"], status=status).inc()
+    _notify_finished(job["id"])
+    return outcome.modified_count == 1
+
+
+async def _retry_or_fail(db, job: dict, error: str):
+    if job["attempts"] >= job["max_attempts"]:
+        await _finish(db, job, "failed", error=error)
+        return
+    delay = RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+    await db[JOBS_COLLECTION].update_one(_owned(job), {"$set": {
+        "status": "queued",
+        "available_at": datetime.utcnow() + timedelta(seconds=delay),
+        "lease_expires_at": None,
+        "error": error,
+    }})
+    registry.counter("report_jobs_retried_total", kind=job["kind"]).inc()
+
+
+async def _keep_lease(db, job: dict):
+    """Extend the lease while a long job is still rendering."""
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        await db[JOBS_COLLECTION].update_one(_owned(job), {"$set": {
+            "lease_expires_at": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)
+        }})
+
+
+async def run_job(db, job: dict):
+    """Render a claimed job, store its file and record the outcome."""
+    if job["attempts"] > job["max_attempts"]:
+        # Lease expired on the last attempt: the worker died mid-job
+        await _finish(db, job, "failed", error=job.get("error") or "Worker lease expired")
+        return
+
+    registry.summary("report_job_queue_seconds", kind=job["kind"]).observe(
+        (job["started_at"] - job["created_at"]).total_seconds()
+    )
+    handler = REPORT_HANDLERS.get(job["kind"])
+    heartbeat = asyncio.ensure_future(_keep_lease(db, job))
+    started = asyncio.get_running_loop().time()
+    try:
+        if handler is None:
+            raise JobFailed(f"Unknown report kind: {job['kind']}")
+        content, filename, content_type = await handler(db, job)
+    except JobFailed as error:
+        await _finish(db, job, "failed", error=str(error))
+        return
+    except Exception as error:
+        logger.exception("Report job %s failed (attempt %d)", job["id"], job["attempts"])
+        await _retry_or_fail(db, job, f"{type(error).__name__}: {error}")
+        return
+    finally:
+        heartbeat.cancel()
+        registry.summary("report_job_seconds", kind=job["kind"]).observe(
+            asyncio.get_running_loop().time() - started
+        )
+
+    result = {"filename": filename, "content_type": content_type, "size": len(content)}
+    await db[FILES_COLLECTION].replace_one({"job_id": job["id"]}, {
+        "job_id": job["id"],
+        "user_id": job["user_id"],
+        "content": content,
+        **result,
+        "expires_at": datetime.utcnow() + timedelta(hours=RESULT_TTL_HOURS),
+    }, upsert=True)
+    if not await _finish(db, job, "succeeded", result=result):
+        logger.warning("Report job %s finished after losing its lease", job["id"])
+
+
+class ReportWorker:
+    """Claims and renders report jobs with a fixed number of concurrent slots.
+
+    Runs inside each API process by default (REPORT_WORKER_CONCURRENCY slots,
+    0 disables it) or standalone via `python cli.py report-worker`.
+    """
+
+    def __init__(self, db, concurrency: int = WORKER_CONCURRENCY):
+        self.db = db
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks = []
+        self._stopping = asyncio.Event()
+
+    async def _slot(self):
+        while not self._stopping.is_set():
+            try:
+                job = await claim_job(self.db, self.worker_id)
+            except Exception:
+                logger.exception("Could not claim a report job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await run_job(self.db, job)
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._slot()) for _ in range(self.concurrency)]
+
+    async def run(self):
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def stop(self, timeout: float = LEASE_SECONDS):
+        """Stop claiming and give running jobs `timeout` seconds to finish.
+
+        Jobs still running afterwards are cancelled; their leases expire and
+        another worker picks them up.
+        """
+        self._stopping.set()
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Query
+from fastapi.responses import Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional
+from models import ReportJobCreate, ReportJobResponse
+from routes import get_current_user
+from serialization import json_response
+from assessment_service import find_assessment
+from database import get_db
+import report_jobs
+
+report_router = APIRouter(tags=["Reports"])
+
+MAX_WAIT_SECONDS = 30
+
+
+def _job_response(job: dict) -> dict:
+    return {
+        **job,
+        "download_url": f"/api/reports/jobs/{job['id']}/download" if job["status"] == "succeeded" else None,
+    }
+
+
+@report_router.post("/reports/jobs", response_model=ReportJobResponse, status_code=202)
+async def submit_report_job(
+    job_create: ReportJobCreate,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Queue a report for background rendering and return its job id."""
+    user = await get_current_user(authorization, request)
+
+    if job_create.kind not in report_jobs.REPORT_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown report kind: {job_create.kind}")
+    if job_create.assessment_id is not None:
+        assessment = await find_assessment(db, {"id": job_create.assessment_id, "user_id": user["id"]})
+        if not assessment:
+            raise HTTPException(status_code=404, detail="Assessment not found")
+
+    params = job_create.dict(exclude={"kind"}, exclude_none=True)
+    try:
+        job = await report_jobs.submit_job(db, user["id"], job_create.kind, params)
+    except report_jobs.JobLimitExceeded as error:
+        raise HTTPException(status_code=429, detail=str(error), headers={"Retry-After": "10"})
+
+    return json_response(
+        ReportJobResponse, _job_response(job), status_code=202,
+        headers={"Location": f"/api/reports/jobs/{job['id']}"}
+    )
+
+
+@report_router.get("/reports/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: str,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="Long-poll up to this many seconds"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get a report job's status, optionally waiting for it to finish."""
+    user = await get_current_user(authorization, request)
+
+    if wait:
+        job = await report_jobs.wait_for_job(db, job_id, user["id"], wait)
+    else:
+        job = await report_jobs.get_job(db, job_id, user["id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+
+    return json_response(ReportJobResponse, _job_response(job))
+
+
+@report_router.get("/reports/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: str,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Download the file produced by a finished report job."""
+    user = await get_current_user(authorization, request)
+
+    job = await report_jobs.get_job(db, job_id, user["id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Report job is {job['status']}")
+
+    stored = await report_jobs.get_job_file(db, job_id)
+    if not stored:
+        raise HTTPException(status_code=410, detail="Report file has expired")
+
+    return Response(
+        content=stored["content"],
+        media_type=stored["content_type"],
+        headers={"Content-Disposition": f"attachment; filename={stored['filename']}"}
+    )
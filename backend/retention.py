@@ -0,0 +1,173 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+
+from pymongo.errors import BulkWriteError
+
+from assessment_service import ARCHIVE_COLLECTION, SUMMARIES_COLLECTION
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Assessments older than this leave the hot collection, so its documents and
+# indexes stay small enough to be held in memory
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "730"))
+# "collection" keeps archived assessments queryable in ARCHIVE_COLLECTION;
+# "ndjson" writes them to gzip-compressed NDJSON files in ARCHIVE_DIR
+ARCHIVE_TARGET = os.environ.get("RETENTION_ARCHIVE_TARGET", "collection")
+ARCHIVE_DIR = Path(os.environ.get("RETENTION_ARCHIVE_DIR", "archive"))
+BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "1000"))
+# Pause between batches, leaving I/O for live traffic
+BATCH_PAUSE_SECONDS = float(os.environ.get("RETENTION_BATCH_PAUSE_SECONDS", "0.5"))
+
+DUPLICATE_KEY = 11000
+
+
+@dataclass
+class ArchiveStats:
+    archived: int = 0
+    batches: int = 0
+    audio_stripped: int = 0
+    seconds: float = 0.0
+    target: str = ""
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _strip_audio(assessment: dict) -> bool:
+    """Drop inline speech audio; the duration and analysis derived from it stay."""
+    results = assessment.get("results") or {}
+    stripped = (assessment.get("raw_data") or {}).pop("speech_audio", None) is not None
+    if results.get("speech_data"):
+        results["speech_data"] = None
+        stripped = True
+    return stripped
+
+
+def _ndjson_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"Cannot archive {type(value).__name__}")
+
+
+class _NdjsonArchive:
+    """One gzip-compressed NDJSON file per archive run.
+
+    Every batch is flushed and fsynced before its assessments are deleted
+    from the hot collection. The rows can be loaded again with `cli import`.
+    """
+
+    def __init__(self, directory: Path, cutoff: datetime):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"assessments_before_{cutoff:%Y%m%d}_{datetime.utcnow():%Y%m%d%H%M%S}.ndjson.gz"
+        self._raw = open(self.path, "xb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb")
+
+    def write(self, assessments: List[dict]):
+        lines = "".join(json.dumps(assessment, default=_ndjson_default) + "\n" for assessment in assessments)
+        self._gzip.write(lines.encode("utf-8"))
+        self._gzip.flush()
+        os.fsync(self._raw.fileno())
+
+    def close(self):
+        self._gzip.close()
+        self._raw.close()
+
+
+async def _store_in_collection(db, assessments: List[dict]):
+    # Idempotent: an interrupted run leaves copies that are skipped next time
+    try:
+        await db[ARCHIVE_COLLECTION].insert_many(assessments, ordered=False)
+    except BulkWriteError as error:
+        if any(write_error.get("code") != DUPLICATE_KEY for write_error in error.details.get("writeErrors", [])):
+            raise
+
+
+async def _update_summaries(db, assessments: List[dict], target: str):
+    """Keep per-patient summaries right after a batch left the hot collection.
+
+    Archived to the collection, assessments are still counted (history
+    reads fall through to it) but their audio is gone, so only the version
+    moves. Archived to files, they are no longer served and are taken out
+    of the counts.
+    """
+    per_user = {}
+    for assessment in assessments:
+        per_user.setdefault(assessment["user_id"], []).append(assessment["id"])
+    summaries = db[SUMMARIES_COLLECTION]
+    if target == "collection":
+        await summaries.update_many({"user_id": {"$in": list(per_user)}}, {"$inc": {"version": 1}})
+        return
+    for user_id, ids in per_user.items():
+        archived_latest = {"$in": ["$latest_id", ids]}
+        await summaries.update_one({"user_id": user_id}, [{"$set": {
+            "count": {"$subtract": ["$count", len(ids)]},
+            "latest_id": {"$cond": [archived_latest, None, "$latest_id"]},
+            "latest_test_date": {"$cond": [archived_latest, None, "$latest_test_date"]},
+            "version": {"$add": ["$version", 1]},
+        }}])
+
+
+async def archive_assessments(
+    db,
+    older_than_days: int = RETENTION_DAYS,
+    target: str = ARCHIVE_TARGET,
+    archive_dir: Path = ARCHIVE_DIR,
+    batch_size: int = BATCH_SIZE,
+    pause_seconds: float = BATCH_PAUSE_SECONDS,
+    limit: Optional[int] = None
+) -> ArchiveStats:
+    """Move assessments older than `older_than_days` out of the hot collection.
+
+    Works oldest first in batches: each batch is written to the archive,
+    then deleted from `assessments`, so a crash at any point loses nothing.
+    """
+    if target not in ("collection", "ndjson"):
+        raise ValueError("target must be 'collection' or 'ndjson'")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    stats = ArchiveStats(target=target)
+    archive = _NdjsonArchive(archive_dir, cutoff) if target == "ndjson" else None
+    try:
+        while limit is None or stats.archived < limit:
+            size = batch_size if limit is None else min(batch_size, limit - stats.archived)
+            cursor = db.assessments.find({"test_date": {"$lt": cutoff}}).sort("test_date", 1).limit(size)
+            batch = await cursor.to_list(length=size)
+            if not batch:
+                break
+            object_ids = [assessment.pop("_id") for assessment in batch]
+            for assessment in batch:
+                stats.audio_stripped += _strip_audio(assessment)
+                assessment["archived_at"] = datetime.utcnow()
+
+            if archive is not None:
+                await asyncio.to_thread(archive.write, batch)
+            else:
+                await _store_in_collection(db, batch)
+            await db.assessments.delete_many({"_id": {"$in": object_ids}})
+            await _update_summaries(db, batch, target)
+
+            stats.archived += len(batch)
+            stats.batches += 1
+            registry.counter("retention_archived_total", target=target).inc(len(batch))
+            logger.info("Archived %d assessments older than %s", stats.archived, f"{cutoff:%Y-%m-%d}")
+            if pause_seconds:
+                await asyncio.sleep(pause_seconds)
+    finally:
+        if archive is not None:
+            archive.close()
+            if stats.archived == 0:
+                archive.path.unlink(missing_ok=True)
+    stats.seconds = loop.time() - started
+    return stats
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import asyncio
+import hashlib
+import logging
+import math
+import os
+
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES, issued_at
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "token_revocations"
+
+# How often each process pulls new revocations; a logout takes effect
+# everywhere within about this long
+SYNC_INTERVAL_SECONDS = float(os.environ.get("REVOCATION_SYNC_INTERVAL_SECONDS", "2"))
+# Expired entries are dropped (and the filter rebuilt) on a full reload
+FULL_RELOAD_SECONDS = float(os.environ.get("REVOCATION_FULL_RELOAD_SECONDS", "600"))
+# Incremental syncs re-read this far back to catch writes committed late
+SYNC_OVERLAP_SECONDS = 5
+# Access tokens issued before a revocation expire within this long, after
+# which the entry is no longer needed
+REVOCATION_TTL = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES + 1)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1024)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """In-memory copy of the token revocations, synced from MongoDB.
+
+    An entry revokes every access token of a session (`sid:<id>`) or of a
+    user (`user:<id>`) issued up to its `revoked_at`, both compared to the
+    millisecond (MongoDB keeps no finer dates). Lookups hit the Bloom
+    filter first, so the common case, a token nobody revoked, costs a few
+    hashes; the exact dict settles the rare positives.
+    """
+
+    def __init__(self):
+        self._revoked_at: Dict[str, float] = {}
+        self._filter_capacity = 1024
+        self._filter = BloomFilter(self._filter_capacity)
+        self._synced_until: Optional[datetime] = None
+        self._last_full_reload = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _add(self, key: str, revoked_at: datetime):
+        timestamp = issued_at(revoked_at)
+        if timestamp > self._revoked_at.get(key, 0.0):
+            self._revoked_at[key] = timestamp
+            self._filter.add(key)
+            if len(self._revoked_at) > self._filter_capacity:
+                self._rebuild_filter()
+
+    def _rebuild_filter(self):
+        # Sized with headroom so the false-positive rate holds as entries arrive
+        self._filter_capacity = max(1024, len(self._revoked_at) * 2)
+        bloom = BloomFilter(self._filter_capacity)
+        for key in self._revoked_at:
+            bloom.add(key)
+        self._filter = bloom
+
+    def is_revoked(self, claims: dict) -> bool:
+        issued_at = claims.get("iat", 0)
+        for key in (f"sid:{claims.get('sid')}", f"user:{claims.get('sub')}"):
+            if key in self._filter:
+                revoked_at = self._revoked_at.get(key)
+                if revoked_at is not None and issued_at <= revoked_at:
+                    return True
+        return False
+
+    async def revoke(self, db, key: str):
+        """Record a revocation and apply it to this process immediately."""
+        now = datetime.utcnow()
+        await db[COLLECTION].update_one(
+            {"key": key},
+            {"$set": {"revoked_at": now, "expires_at": now + REVOCATION_TTL}},
+            upsert=True
+        )
+        self._add(key, now)
+        registry.counter("token_revocations_total", kind=key.split(":", 1)[0]).inc()
+
+    async def sync(self, db, full: bool = False):
+        """Pull revocations written by other processes since the last sync.
+
+        A full reload drops expired entries; it reads everything before
+        swapping, so lookups never see a half-loaded list.
+        """
+        now = datetime.utcnow()
+        full = full or self._synced_until is None
+        if full:
+            query = {"expires_at": {"$gt": now}}
+        else:
+            query = {"revoked_at": {"$gte": self._synced_until - timedelta(seconds=SYNC_OVERLAP_SECONDS)}}
+        cursor = db[COLLECTION].find(query, projection={"_id": 0, "key": 1, "revoked_at": 1})
+        entries = await cursor.to_list(length=None)
+        if full:
+            self._revoked_at = {entry["key"]: issued_at(entry["revoked_at"]) for entry in entries}
+            self._rebuild_filter()
+            self._last_full_reload = asyncio.get_running_loop().time()
+        else:
+            for entry in entries:
+                self._add(entry["key"], entry["revoked_at"])
+        self._synced_until = now
+        registry.gauge("token_revocations_loaded").set(len(self._revoked_at))
+
+    async def run(self, db):
+        loop = asyncio.get_running_loop()
+        while True:
+            full = loop.time() - self._last_full_reload > FULL_RELOAD_SECONDS
+            try:
+                await self.sync(db, full=full)
+            except Exception as error:
+                # Keep enforcing what we already know until the database is back
+                logger.warning("Token revocation sync failed: %s", error)
+            await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+
+    def start(self, db):
+        self._task = asyncio.create_task(self.run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocations = RevocationList()
@@ -1,26 +1,50 @@
 from fastapi import APIRouter, HTTPException, Depends, Header, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Optional
 from models import (
-    UserCreate, UserLogin, User, UserResponse, Token,
-    Assessment, AssessmentCreate, AssessmentResponse, AssessmentHistory, ShareLink
+    UserCreate, UserLogin, User, UserResponse, Token, RefreshTokenRequest,
+    AssessmentCreate, AssessmentResponse, AssessmentHistory, ShareLink,
+    SharedReportResponse, AssessmentResult, AssessmentDraft, AssessmentDraftResponse
+)
+from auth import (
+    get_password_hash, verify_password, create_access_token, create_refresh_token, decode_access_token,
+    ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from auth import get_password_hash, verify_password, create_access_token, decode_access_token
 from datetime import datetime, timedelta
-from pdf_service import generate_assessment_pdf, generate_share_token
+import asyncio
+import hashlib
+import json
+from pdf_service import generate_assessment_pdf, generate_history_pdf, generate_share_token
+from serialization import json_response
+from assessment_service import (
+    build_assessment, fetch_history, fetch_history_page, find_assessment, draft_step_update, get_summary,
+    record_new_assessments,
+    ASSESSMENT_STEPS, DRAFT_TTL_HOURS
+)
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import get_db
+from pdf_cache import cache_key, cached_render
+from file_responses import RangeFileResponse
+from idempotency import run_idempotent
+from rate_limit import client_ip, enforce
+from revocation import revocations
+from structured_logging import set_log_user
+import uuid
 
 auth_router = APIRouter(tags=["Authentication"])
 assessment_router = APIRouter(tags=["Assessments"])
 
 
-# Dependency to get database
-def get_db(request: Request):
-    return request.state.db
-
-
 # Dependency to get current user from token
 async def get_current_user(authorization: Optional[str] = Header(None), request: Request = None) -> dict:
-    """Get current user from authorization header."""
+    """Get current user from authorization header.
+
+    Authorised from the access token's claims alone: `id`, `role` and the
+    session `sid`. Revoked sessions are rejected by the in-memory
+    revocation list; handlers that need the profile call `load_user`.
+    """
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
     
@@ -39,20 +63,138 @@ async def get_current_user(authorization: Optional[str] = Header(None), request:
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    # Get user from database
-    db = request.state.db
-    user = await db.users.find_one({"id": user_id})
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+    if revocations.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
     
+    set_log_user(user_id)
+    return {"id": user_id, "role": payload.get("role", "user"), "sid": payload.get("sid")}
+
+
+async def load_user(db, user: dict) -> dict:
+    """Fetch the full profile of an authenticated user."""
+    profile = await db.users.find_one({"id": user["id"]}, projection={"_id": 0, "password_hash": 0})
+    if profile is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return profile
+
+
+async def _issue_tokens(db, user: dict, session_id: Optional[str] = None) -> Token:
+    """Access plus refresh token for `user`; a new session unless `session_id` is given."""
+    session_id = session_id or str(uuid.uuid4())
+    access_token = create_access_token(data={
+        "sub": user["id"],
+        "role": user.get("role", "user"),
+        "sid": session_id
+    })
+    refresh = create_refresh_token(user["id"], session_id)
+    await db.refresh_tokens.insert_one({
+        "jti": refresh["jti"],
+        "user_id": user["id"],
+        "sid": session_id,
+        "created_at": refresh["issued"],
+        "expires_at": refresh["exp"],
+        "used_at": None,
+        "revoked": False
+    })
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        refresh_token=refresh["token"],
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        user=UserResponse(
+            id=user["id"],
+            email=user["email"],
+            name=user["name"],
+            preferred_language=user["preferred_language"],
+            created_at=user["created_at"]
+        )
+    )
+
+
+async def _revoke_session(db, session_id: str):
+    await revocations.revoke(db, f"sid:{session_id}")
+    await db.refresh_tokens.update_many({"sid": session_id}, {"$set": {"revoked": True}})
+
+
+# Dependency to restrict a route to administrators (users with role "admin")
+async def get_current_admin(authorization: Optional[str] = Header(None), request: Request = None) -> dict:
+    """Get current user and require the admin role."""
+    user = await get_current_user(authorization, request)
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Administrator access required")
+    return user
+
+
+# Dependency for clinician views; administrators may use them too
+async def get_current_clinician(authorization: Optional[str] = Header(None), request: Request = None) -> dict:
+    """Get current user and require the clinician (or admin) role."""
+    user = await get_current_user(authorization, request)
+    if user.get("role") not in ("clinician", "admin"):
+        raise HTTPException(status_code=403, detail="Clinician access required")
     return user
 
 
+def _assessment_report_key(assessment: dict, user: dict) -> str:
+    """Cache key covering everything the assessment PDF shows."""
+    results = {k: v for k, v in (assessment.get("results") or {}).items() if k != "speech_data"}
+    return cache_key(
+        "assessment", assessment["id"], assessment["test_date"], assessment["overall_score"],
+        assessment["risk_level"], results, user.get("name"), user.get("email")
+    )
+
+
+async def _pdf_response(request: Request, key: str, render, filename: str) -> RangeFileResponse:
+    """Serve a rendered (or cached) PDF with Content-Length and Range support."""
+    path, stat_result = await cached_render(key, render)
+    return RangeFileResponse(
+        str(path),
+        request.headers,
+        filename=filename,
+        media_type="application/pdf",
+        stat_result=stat_result,
+        headers={"Cache-Control": "private, no-cache"}
+    )
+
+
+def _etag(*parts) -> str:
+    """Weak validator over the values a response is built from.
+
+    Weak because it names the content, not the bytes: it is the same
+    whether or not the compression middleware encodes the body, so 200s
+    and 304s carry the same ETag.
+    """
+    payload = json.dumps(parts, default=str, separators=(",", ":"))
+    return 'W/"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response when the client's cached copy (If-None-Match) is current.
+
+    If-None-Match uses the weak comparison: `W/` prefixes are ignored.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag.removeprefix("W/") in candidates or "*" in candidates:
+        return Response(status_code=304, headers=_cache_headers(etag))
+    return None
+
+
+def _cache_headers(etag: str) -> dict:
+    # Browsers keep the body but revalidate on every use
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
 # Auth routes
 @auth_router.post("/auth/register", response_model=Token)
-async def register(user_create: UserCreate, request: Request):
+async def register(
+    user_create: UserCreate,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """Register a new user."""
-    db = request.state.db
+    enforce("register_ip", client_ip(request))
     
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user_create.email})
@@ -68,54 +210,101 @@ async def register(user_create: UserCreate, request: Request):
     
     # Hash password and store
     user_dict = user.dict()
-    user_dict["password_hash"] = get_password_hash(user_create.password)
+    user_dict["password_hash"] = await asyncio.to_thread(get_password_hash, user_create.password)
     
     await db.users.insert_one(user_dict)
     
-    # Create access token
-    access_token = create_access_token(data={"sub": user.id})
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=UserResponse(**user.dict())
-    )
+    # Create access and refresh tokens
+    return await _issue_tokens(db, user_dict)
 
 
 @auth_router.post("/auth/login", response_model=Token)
-async def login(user_login: UserLogin, request: Request):
+async def login(
+    user_login: UserLogin,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """Login user and return token."""
-    db = request.state.db
+    # Each attempt costs a bcrypt verify: limit per client and per account
+    enforce("login_ip", client_ip(request))
+    enforce("login_account", user_login.email.lower())
     
     # Find user
     user = await db.users.find_one({"email": user_login.email})
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    # Verify password
-    if not verify_password(user_login.password, user["password_hash"]):
+    # Verify password; bcrypt runs on a worker thread so reads keep flowing
+    if not await asyncio.to_thread(verify_password, user_login.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    # Create access token
-    access_token = create_access_token(data={"sub": user["id"]})
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=UserResponse(
-            id=user["id"],
-            email=user["email"],
-            name=user["name"],
-            preferred_language=user["preferred_language"],
-            created_at=user["created_at"]
-        )
+    # Create access and refresh tokens
+    return await _issue_tokens(db, user)
+
+
+@auth_router.post("/auth/refresh", response_model=Token)
+async def refresh_tokens(
+    refresh_request: RefreshTokenRequest,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Exchange a refresh token for a new access and refresh token.
+
+    Refresh tokens are single use. Presenting one that was already used
+    means it was copied, so the whole session is revoked.
+    """
+    payload = decode_access_token(refresh_request.refresh_token, token_type="refresh")
+    if payload is None or revocations.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    
+    stored = await db.refresh_tokens.find_one_and_update(
+        {"jti": payload["jti"], "used_at": None, "revoked": False},
+        {"$set": {"used_at": datetime.utcnow()}}
     )
+    if stored is None:
+        if await db.refresh_tokens.find_one({"jti": payload["jti"], "used_at": {"$ne": None}}):
+            await _revoke_session(db, payload["sid"])
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    
+    user = await db.users.find_one({"id": payload["sub"]})
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return await _issue_tokens(db, user, session_id=payload["sid"])
+
+
+@auth_router.post("/auth/logout", status_code=204)
+async def logout(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """End this session: its access tokens stop working within seconds on every server."""
+    user = await get_current_user(authorization, request)
+    await _revoke_session(db, user["sid"])
+    return Response(status_code=204)
+
+
+@auth_router.post("/auth/logout-all", status_code=204)
+async def logout_everywhere(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """End every session of the user, e.g. after a device was lost or stolen."""
+    user = await get_current_user(authorization, request)
+    await revocations.revoke(db, f"user:{user['id']}")
+    await db.refresh_tokens.update_many({"user_id": user["id"]}, {"$set": {"revoked": True}})
+    return Response(status_code=204)
 
 
 @auth_router.get("/auth/me", response_model=UserResponse)
-async def get_me(request: Request, authorization: Optional[str] = Header(None)):
+async def get_me(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """Get current user info."""
-    user = await get_current_user(authorization, request)
+    user = await load_user(db, await get_current_user(authorization, request))
     return UserResponse(
         id=user["id"],
         email=user["email"],
@@ -130,44 +319,142 @@ async def get_me(request: Request, authorization: Optional[str] = Header(None)):
 async def save_assessment(
     assessment_create: AssessmentCreate,
     request: Request,
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Save a new assessment result.
+
+    Send an `Idempotency-Key` header to make retries safe: a retried save
+    returns the original response instead of storing another assessment.
+    """
+    user = await get_current_user(authorization, request)
+    
+    async def save():
+        # Score the results and move raw per-trial data out of them; on a
+        # worker thread, since decoding a recording is CPU-bound
+        try:
+            assessment = await asyncio.to_thread(build_assessment, user["id"], assessment_create.results)
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=str(error))
+        
+        assessment_dict = assessment.dict()
+        await db.assessments.insert_one(assessment_dict)
+        await record_new_assessments(db, [assessment_dict])
+        
+        return json_response(AssessmentResponse, assessment_dict)
+    
+    if idempotency_key:
+        return await run_idempotent(db, request, user["id"], idempotency_key, save)
+    return await save()
+
+
+@assessment_router.post("/assessments/drafts", response_model=AssessmentDraftResponse, status_code=201)
+async def create_assessment_draft(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Save a new assessment result."""
+    """Start a draft assessment that each completed step is saved into."""
     user = await get_current_user(authorization, request)
-    db = request.state.db
-    
-    # Calculate overall score
-    scores = []
-    results = assessment_create.results
-    
-    if results.memory_accuracy is not None:
-        scores.append(results.memory_accuracy)
-    if results.attention_accuracy is not None:
-        scores.append(results.attention_accuracy)
-    if results.reaction_score is not None:
-        scores.append(results.reaction_score)
-    
-    overall_score = sum(scores) / len(scores) if scores else 0
-    
-    # Determine risk level
-    if overall_score >= 75:
-        risk_level = "Low"
-    elif overall_score >= 50:
-        risk_level = "Moderate"
-    else:
-        risk_level = "High"
-    
-    # Create assessment
-    assessment = Assessment(
+
+    draft = AssessmentDraft(
         user_id=user["id"],
-        results=results,
-        overall_score=overall_score,
-        risk_level=risk_level
+        expires_at=datetime.utcnow() + timedelta(hours=DRAFT_TTL_HOURS)
     )
-    
-    await db.assessments.insert_one(assessment.dict())
-    
-    return AssessmentResponse(**assessment.dict())
+    draft_dict = draft.dict()
+    await db.assessment_drafts.insert_one(draft_dict)
+
+    return json_response(AssessmentDraftResponse, draft_dict, status_code=201)
+
+
+@assessment_router.get("/assessments/drafts/{draft_id}", response_model=AssessmentDraftResponse)
+async def get_assessment_draft(
+    draft_id: str,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get a draft's completed steps, e.g. to resume an interrupted assessment."""
+    user = await get_current_user(authorization, request)
+
+    draft = await db.assessment_drafts.find_one(
+        {"id": draft_id, "user_id": user["id"]}, projection={"results": 0}
+    )
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found or expired")
+
+    return json_response(AssessmentDraftResponse, draft)
+
+
+@assessment_router.put("/assessments/drafts/{draft_id}/steps/{step}", response_model=AssessmentDraftResponse)
+async def save_assessment_step(
+    draft_id: str,
+    step: str,
+    step_results: AssessmentResult,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Save one completed step's results into a draft (idempotent)."""
+    user = await get_current_user(authorization, request)
+
+    if step not in ASSESSMENT_STEPS:
+        raise HTTPException(status_code=404, detail="Unknown assessment step")
+    try:
+        update = draft_step_update(step, step_results)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+    draft = await db.assessment_drafts.find_one_and_update(
+        {"id": draft_id, "user_id": user["id"]},
+        update,
+        projection={"results": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found or expired")
+
+    return json_response(AssessmentDraftResponse, draft)
+
+
+@assessment_router.post("/assessments/drafts/{draft_id}/finalize", response_model=AssessmentResponse)
+async def finalize_assessment_draft(
+    draft_id: str,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Score a draft and turn it into a saved assessment.
+
+    The assessment keeps the draft's id, so retrying a finalize whose
+    response was lost returns the same assessment instead of a duplicate.
+    """
+    user = await get_current_user(authorization, request)
+
+    draft = await db.assessment_drafts.find_one({"id": draft_id, "user_id": user["id"]})
+    if draft:
+        try:
+            assessment = await asyncio.to_thread(
+                build_assessment, user["id"], AssessmentResult(**draft["results"]), assessment_id=draft_id
+            )
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=str(error))
+        assessment_dict = assessment.dict()
+        try:
+            await db.assessments.insert_one(assessment_dict)
+            await record_new_assessments(db, [assessment_dict])
+        except DuplicateKeyError:
+            assessment_dict = None
+        await db.assessment_drafts.delete_one({"id": draft_id})
+        if assessment_dict:
+            return json_response(AssessmentResponse, assessment_dict)
+
+    # Already finalized by an earlier attempt
+    assessment = await db.assessments.find_one({"id": draft_id, "user_id": user["id"]})
+    if not assessment:
+        raise HTTPException(status_code=404, detail="Draft not found or expired")
+    return json_response(AssessmentResponse, assessment)
 
 
 @assessment_router.get("/assessments/history", response_model=AssessmentHistory)
@@ -175,72 +462,99 @@ async def get_assessment_history(
     request: Request,
     authorization: Optional[str] = Header(None),
     limit: int = 10,
-    skip: int = 0
+    skip: int = 0,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get user's assessment history."""
+    """Get user's assessment history.
+
+    Responses carry an ETag from the patient's assessment summary; a
+    dashboard revalidating with If-None-Match gets 304 after one lookup.
+    """
     user = await get_current_user(authorization, request)
-    db = request.state.db
-    
-    # Get assessments
-    cursor = db.assessments.find({"user_id": user["id"]}).sort("test_date", -1).skip(skip).limit(limit)
-    assessments = await cursor.to_list(length=limit)
     
-    # Get total count
-    total_count = await db.assessments.count_documents({"user_id": user["id"]})
+    summary = await get_summary(db, user["id"])
+    etag = _etag("history", summary["count"], summary["latest_id"], summary.get("version"), skip, limit)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
     
-    assessment_responses = [AssessmentResponse(**assessment) for assessment in assessments]
+    # Get assessments, paging into the archive past the hot ones
+    assessments = await fetch_history_page(db, user["id"], skip, limit)
     
-    return AssessmentHistory(
-        assessments=assessment_responses,
-        total_count=total_count
-    )
+    return json_response(AssessmentHistory, {
+        "assessments": assessments,
+        "total_count": summary["count"]
+    }, headers=_cache_headers(etag))
 
 
 @assessment_router.get("/assessments/latest", response_model=AssessmentResponse)
 async def get_latest_assessment(
     request: Request,
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get user's latest assessment."""
+    """Get user's latest assessment (conditional on If-None-Match)."""
     user = await get_current_user(authorization, request)
-    db = request.state.db
     
-    assessment = await db.assessments.find_one(
-        {"user_id": user["id"]},
-        sort=[("test_date", -1)]
-    )
+    summary = await get_summary(db, user["id"])
+    if not summary["count"]:
+        raise HTTPException(status_code=404, detail="No assessments found")
+    etag = _etag("latest", summary["latest_id"], summary.get("version"))
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    
+    assessment = await find_assessment(db, {"id": summary["latest_id"], "user_id": user["id"]})
     
     if not assessment:
         raise HTTPException(status_code=404, detail="No assessments found")
     
-    return AssessmentResponse(**assessment)
+    return json_response(AssessmentResponse, assessment, headers=_cache_headers(etag))
+
+
+@assessment_router.get("/assessments/history/pdf")
+async def generate_history_report(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Generate and download a longitudinal PDF report over the user's assessments."""
+    user = await load_user(db, await get_current_user(authorization, request))
+
+    assessments = await fetch_history(db, user["id"], start, end)
+    if not assessments:
+        raise HTTPException(status_code=404, detail="No assessments found")
+
+    key = cache_key("history", user["id"], user.get("name"), user.get("email"), start, end, assessments)
+    return await _pdf_response(
+        request, key,
+        lambda output: generate_history_pdf(assessments, user, output),
+        f"cognitive_history_{assessments[-1]['test_date']:%Y%m%d}.pdf"
+    )
 
 
 @assessment_router.get("/assessments/{assessment_id}/pdf")
 async def generate_assessment_report(
     assessment_id: str,
     request: Request,
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Generate and download PDF report for an assessment."""
-    user = await get_current_user(authorization, request)
-    db = request.state.db
+    user = await load_user(db, await get_current_user(authorization, request))
     
     # Get assessment
-    assessment = await db.assessments.find_one({"id": assessment_id, "user_id": user["id"]})
+    assessment = await find_assessment(db, {"id": assessment_id, "user_id": user["id"]})
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
-    # Generate PDF
-    pdf_buffer = generate_assessment_pdf(assessment, user)
-    
-    # Return as downloadable file
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=cognitive_assessment_{assessment_id[:8]}.pdf"
-        }
+    # Render (or reuse the cached file) and serve it with Range support
+    return await _pdf_response(
+        request, _assessment_report_key(assessment, user),
+        lambda output: generate_assessment_pdf(assessment, user, output),
+        f"cognitive_assessment_{assessment_id[:8]}.pdf"
     )
 
 
@@ -249,94 +563,105 @@ async def create_share_link(
     assessment_id: str,
     request: Request,
     authorization: Optional[str] = Header(None),
-    expires_hours: int = 48
+    idempotency_key: Optional[str] = Header(None),
+    expires_hours: int = 48,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create a shareable link for an assessment (expires in 48 hours by default)."""
     user = await get_current_user(authorization, request)
-    db = request.state.db
     
     # Verify assessment belongs to user
-    assessment = await db.assessments.find_one({"id": assessment_id, "user_id": user["id"]})
+    assessment = await find_assessment(db, {"id": assessment_id, "user_id": user["id"]})
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
-    # Check if share link already exists
-    existing_link = await db.share_links.find_one({
-        "assessment_id": assessment_id,
-        "expires_at": {"$gt": datetime.utcnow()}
-    })
-    
-    if existing_link:
+    async def share():
+        # One link document per assessment, created or renewed by a single
+        # atomic upsert: an unexpired link is returned as is, an expired one
+        # gets a fresh token, so concurrent clicks cannot create duplicates
+        now = datetime.utcnow()
+        new_link = ShareLink(
+            assessment_id=assessment_id,
+            token=generate_share_token(),
+            created_at=now,
+            expires_at=now + timedelta(hours=expires_hours)
+        ).dict()
+        unexpired = {"$gt": ["$expires_at", now]}
+        share_link = await db.share_links.find_one_and_update(
+            {"assessment_id": assessment_id},
+            [{"$set": {
+                field: {"$cond": [unexpired, f"${field}", {"$literal": new_link[field]}]}
+                for field in ("id", "token", "created_at", "expires_at", "accessed_count")
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
         return {
-            "share_token": existing_link["token"],
-            "expires_at": existing_link["expires_at"],
-            "share_url": f"/shared-report/{existing_link['token']}"
+            "share_token": share_link["token"],
+            "expires_at": share_link["expires_at"],
+            "share_url": f"/shared-report/{share_link['token']}"
         }
-    
-    # Create new share link
-    share_link = ShareLink(
-        assessment_id=assessment_id,
-        token=generate_share_token(),
-        expires_at=datetime.utcnow() + timedelta(hours=expires_hours)
-    )
-    
-    await db.share_links.insert_one(share_link.dict())
-    
-    return {
-        "share_token": share_link.token,
-        "expires_at": share_link.expires_at,
-        "share_url": f"/shared-report/{share_link.token}"
-    }
 
+    if idempotency_key:
+        return await run_idempotent(db, request, user["id"], idempotency_key, share)
+    return await share()
 
-@assessment_router.get("/reports/shared/{token}")
+
+@assessment_router.get("/reports/shared/{token}", response_model=SharedReportResponse)
 async def get_shared_report(
     token: str,
-    request: Request
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get a shared assessment report (no authentication required)."""
-    db = request.state.db
+    """Get a shared assessment report (no authentication required).
+
+    The link lookup supplies the ETag, so a care team refreshing an
+    unchanged report gets 304 from that one read. Only reports actually
+    sent count as an access.
+    """
+    # Unauthenticated: limit token guessing per client and hammering per link
+    enforce("shared_report_ip", client_ip(request))
+    enforce("shared_report_token", token)
     
-    # Find share link
     share_link = await db.share_links.find_one({"token": token})
     if not share_link:
         raise HTTPException(status_code=404, detail="Share link not found")
-    
-    # Check if expired
     if share_link["expires_at"] < datetime.utcnow():
         raise HTTPException(status_code=410, detail="Share link has expired")
     
+    etag = _etag(
+        "shared", share_link["assessment_id"], share_link["created_at"], share_link["expires_at"],
+        share_link.get("version")
+    )
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    await db.share_links.update_one({"_id": share_link["_id"]}, {"$inc": {"accessed_count": 1}})
+    
     # Get assessment
-    assessment = await db.assessments.find_one({"id": share_link["assessment_id"]})
+    assessment = await find_assessment(db, {"id": share_link["assessment_id"]})
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
     # Get user info (limited)
-    user = await db.users.find_one({"id": assessment["user_id"]})
-    
-    # Increment access count
-    await db.share_links.update_one(
-        {"token": token},
-        {"$inc": {"accessed_count": 1}}
-    )
+    user = await db.users.find_one({"id": assessment["user_id"]}, projection={"_id": 0, "name": 1})
     
     # Return assessment data with limited user info
-    return {
-        "assessment": AssessmentResponse(**assessment),
+    return json_response(SharedReportResponse, {
+        "assessment": assessment,
         "patient_name": user.get("name", "N/A") if user else "N/A",
         "shared_at": share_link["created_at"],
         "expires_at": share_link["expires_at"]
-    }
+    }, headers=_cache_headers(etag))
 
 
 @assessment_router.get("/reports/shared/{token}/pdf")
 async def download_shared_report_pdf(
     token: str,
-    request: Request
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Download PDF for a shared assessment report."""
-    db = request.state.db
-    
     # Find share link
     share_link = await db.share_links.find_one({"token": token})
     if not share_link:
@@ -347,7 +672,7 @@ async def download_shared_report_pdf(
         raise HTTPException(status_code=410, detail="Share link has expired")
     
     # Get assessment
-    assessment = await db.assessments.find_one({"id": share_link["assessment_id"]})
+    assessment = await find_assessment(db, {"id": share_link["assessment_id"]})
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
@@ -356,21 +681,17 @@ async def download_shared_report_pdf(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Generate PDF
-    pdf_buffer = generate_assessment_pdf(assessment, user)
-    
-    # Increment access count
-    await db.share_links.update_one(
-        {"token": token},
-        {"$inc": {"accessed_count": 1}}
+    response = await _pdf_response(
+        request, _assessment_report_key(assessment, user),
+        lambda output: generate_assessment_pdf(assessment, user, output),
+        f"shared_assessment_{share_link['assessment_id'][:8]}.pdf"
     )
     
-    # Return as downloadable file
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=shared_assessment_{share_link['assessment_id'][:8]}.pdf"
-        }
-    )
-
+    # Increment access count (resumed downloads are not new accesses)
+    if "range" not in request.headers:
+        await db.share_links.update_one(
+            {"token": token},
+            {"$inc": {"accessed_count": 1}}
+        )
+    
+    return response
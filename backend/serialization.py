@@ -0,0 +1,63 @@
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+from functools import lru_cache
+from typing import Any, Optional, Type, get_args, get_origin
+import os
+
+# When enabled, documents read back from MongoDB are trusted (we wrote them
+# through the models in the first place) and serialized straight to JSON bytes
+# by pydantic-core, skipping the build -> dump -> validate -> encode round trip
+# FastAPI does for `response_model`.
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "true").lower() in ("1", "true", "yes")
+
+
+def _document_type(tp: Any) -> Any:
+    """Replace models inside an annotation with their TypedDict mirrors."""
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        return _typed_dict_for(tp)
+    origin = get_origin(tp)
+    if origin is None:
+        return tp
+    args = tuple(_document_type(arg) for arg in get_args(tp))
+    if hasattr(tp, "copy_with"):
+        return tp.copy_with(args)
+    return origin[args]
+
+
+@lru_cache(maxsize=None)
+def _typed_dict_for(model: Type[BaseModel]) -> Any:
+    """Build a TypedDict with the same fields as a response model.
+
+    Serializing through a TypedDict works on plain dicts, drops keys that
+    are not part of the model (such as Mongo's `_id`) and never validates.
+    """
+    fields = {name: _document_type(field.annotation) for name, field in model.model_fields.items()}
+    return TypedDict(f"{model.__name__}Document", fields)
+
+
+@lru_cache(maxsize=None)
+def document_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Return a cached TypeAdapter that serializes documents shaped like `model`."""
+    return TypeAdapter(_typed_dict_for(model))
+
+
+def json_response(model: Type[BaseModel], content: dict, status_code: int = 200, headers: Optional[dict] = None):
+    """Serialize a trusted document as `model` straight to JSON bytes.
+
+    Falls back to building the model, so the route's `response_model`
+    validates and encodes it the usual way, when fast serialization is off.
+    """
+    if not FAST_SERIALIZATION:
+        if status_code == 200 and not headers:
+            return model(**content)
+        # A returned model would lose the status code and headers
+        return JSONResponse(jsonable_encoder(model(**content)), status_code=status_code, headers=headers)
+
+    return Response(
+        content=document_adapter(model).dump_json(content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json"
+    )
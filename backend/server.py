@@ -1,40 +1,76 @@
-from fastapi import FastAPI, APIRouter, Request
+from fastapi import FastAPI, APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
 import logging
 from pathlib import Path
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime
 from routes import auth_router, assessment_router
+from admin_routes import admin_router
+from report_routes import report_router
+from clinician_routes import clinician_router
+from report_jobs import ReportWorker, WORKER_CONCURRENCY
+from revocation import revocations
+import bulk_report_export
+from database import lifespan as database_lifespan, get_db, InFlightMiddleware
+from metrics import registry
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware
+from structured_logging import RequestLoggingMiddleware, configure_logging
+from serialization import document_adapter
+import warmup
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI()
+if warmup.EAGER_IMPORTS:
+    warmup.preload_modules()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database, warm up hot paths, run the report worker and report readiness."""
+    async with database_lifespan(app) as state:
+        if warmup.WARMUP_ON_START:
+            timings = await run_in_threadpool(warmup.warm_up)
+            logger.info("Warm-up finished: %s", ", ".join(
+                f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()
+            ))
+        ready_seconds = warmup.seconds_since_start()
+        registry.gauge("worker_time_to_ready_seconds").set(ready_seconds)
+        logger.info("Worker %d ready in %.0f ms", os.getpid(), ready_seconds * 1000)
+
+        # Load token revocations before serving, then keep them in sync
+        await revocations.sync(state["db"], full=True)
+        revocations.start(state["db"])
+
+        # Render queued reports in the background of every API process
+        report_worker = ReportWorker(state["db"], WORKER_CONCURRENCY)
+        report_worker.start()
+        try:
+            yield state
+        finally:
+            await report_worker.stop()
+            await revocations.stop()
+            bulk_report_export.shutdown_pool()
+
+
+# Create the main app without a prefix; the MongoDB client is opened and
+# closed by the lifespan handler above
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 
-# Middleware to inject db into request state
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    request.state.db = db
-    response = await call_next(request)
-    return response
-
-
 # Define Models
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -49,24 +85,79 @@ class StatusCheckCreate(BaseModel):
 async def root():
     return {"message": "Early Dementia Detection API"}
 
+@api_router.get("/metrics")
+async def get_metrics():
+    return registry.snapshot()
+
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(db: AsyncIOMotorDatabase = Depends(get_db)):
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+@api_router.get("/status/stream")
+async def stream_status_checks(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    batch_size: int = Query(500, ge=1, le=10000),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Stream status checks as NDJSON, oldest first, one cursor batch at a time."""
+    query = {}
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if client_name:
+        query["client_name"] = client_name
+
+    cursor = db.status_checks.find(
+        query,
+        projection={"_id": 0, "id": 1, "client_name": 1, "timestamp": 1},
+        batch_size=batch_size
+    ).sort("timestamp", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    adapter = document_adapter(StatusCheck)
+
+    async def ndjson_lines():
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            yield b"".join(adapter.dump_json(status_check) + b"\n" for status_check in batch)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 # Include the router in the main app
 app.include_router(api_router)
 
 # Include auth and assessment routers
 app.include_router(auth_router, prefix="/api")
 app.include_router(assessment_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
+app.include_router(report_router, prefix="/api")
+app.include_router(clinician_router, prefix="/api")
+
+# Innermost: a request holds the database until its last body chunk is
+# sent, streamed responses included, so shutdown drains it
+app.add_middleware(InFlightMiddleware)
+
+app.add_middleware(CompressionMiddleware)
+
+# Inside CORS, so browsers can read the 503s it sheds heavy requests with
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -76,13 +167,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so access lines time the whole response including compression
+app.add_middleware(RequestLoggingMiddleware)
+
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -0,0 +1,250 @@
+from functools import lru_cache
+from math import gcd
+from typing import Optional, Tuple
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import struct
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Recordings are stored at this rate, mono, as 16-bit PCM: what speech
+# recognition and acoustic analysis work at, and a fraction of the 44.1 or
+# 48 kHz (often stereo) that browsers record
+TARGET_SAMPLE_RATE = int(os.environ.get("SPEECH_SAMPLE_RATE", "16000"))
+ZLIB_LEVEL = int(os.environ.get("SPEECH_ZLIB_LEVEL", "6"))
+
+# Int16 samples, first-differenced (neighbouring samples are close, so the
+# differences compress far better), then zlib. Exactly reversible.
+CODEC = "pcm16-delta-zlib"
+# Containers we cannot decode here (WebM/Opus, Ogg, MP4) are kept as sent,
+# as binary rather than base64
+ORIGINAL_CODEC = "original"
+
+# Polyphase resampler: Kaiser-windowed sinc low-pass. The cutoff sits a
+# little under the new Nyquist frequency so that the transition band ends
+# before it and nothing aliases; speech has little energy that high.
+FILTER_CUTOFF = 0.9
+FILTER_ZERO_CROSSINGS = 16
+KAISER_BETA = 8.0
+RESAMPLE_BLOCK = 16384
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def decode_upload(speech_data: str) -> Tuple[bytes, Optional[str]]:
+    """Bytes and MIME type (if given) of a base64 upload or data URL."""
+    mime = None
+    if speech_data.startswith("data:"):
+        header, _, speech_data = speech_data.partition(",")
+        mime = header[len("data:"):].split(";")[0] or None
+    try:
+        return base64.b64decode(speech_data, validate=True), mime
+    except (binascii.Error, ValueError):
+        raise ValueError("speech_data is not valid base64 audio")
+
+
+def sniff_mime(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "audio/wav"
+    if data[:4] == b"\x1aE\xdf\xa3":
+        return "audio/webm"
+    if data[:4] == b"OggS":
+        return "audio/ogg"
+    if data[4:8] == b"ftyp":
+        return "audio/mp4"
+    return "application/octet-stream"
+
+
+def read_wav(data: bytes) -> Tuple[np.ndarray, int, dict]:
+    """Decode a WAV file into float samples in [-1, 1], shaped (frames, channels).
+
+    Handles integer PCM (8, 16, 24, 32 bit) and IEEE float, plain or
+    WAVE_FORMAT_EXTENSIBLE. A data chunk cut short (a recording stopped
+    mid-write) is read up to its last whole frame.
+    """
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    fmt = None
+    samples = None
+    position = 12
+    while position + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, position)
+        body = position + 8
+        if chunk_id == b"fmt ":
+            fmt = data[body:body + size]
+        elif chunk_id == b"data":
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF
+            end = len(data) if size in (0, 0xFFFFFFFF) else min(body + size, len(data))
+            samples = data[body:end]
+            break
+        position = body + size + (size & 1)
+    if fmt is None or len(fmt) < 16 or samples is None:
+        raise ValueError("WAV file has no fmt or data chunk")
+
+    encoding, channels, sample_rate, _, block_align, bits = struct.unpack_from("<HHIIHH", fmt)
+    if encoding == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        # The real format is the first two bytes of the sub-format GUID
+        encoding = struct.unpack_from("<H", fmt, 24)[0]
+    if channels == 0 or sample_rate == 0 or block_align != channels * bits // 8:
+        raise ValueError("Malformed WAV format chunk")
+
+    samples = samples[:len(samples) - len(samples) % block_align]
+    if encoding == WAVE_FORMAT_PCM and bits == 8:
+        decoded = (np.frombuffer(samples, dtype=np.uint8).astype(np.float64) - 128) / 128
+    elif encoding == WAVE_FORMAT_PCM and bits == 16:
+        decoded = np.frombuffer(samples, dtype="<i2") / 32768.0
+    elif encoding == WAVE_FORMAT_PCM and bits == 24:
+        # Widen each 3-byte sample to 4 bytes, low byte zero, then shift the
+        # sign back down
+        widened = np.zeros((len(samples) // 3, 4), dtype=np.uint8)
+        widened[:, 1:] = np.frombuffer(samples, dtype=np.uint8).reshape(-1, 3)
+        decoded = (widened.view("<i4")[:, 0] >> 8) / 8388608.0
+    elif encoding == WAVE_FORMAT_PCM and bits == 32:
+        decoded = np.frombuffer(samples, dtype="<i4") / 2147483648.0
+    elif encoding == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        decoded = np.frombuffer(samples, dtype="<f4" if bits == 32 else "<f8").astype(np.float64)
+    else:
+        raise ValueError(f"Unsupported WAV encoding {encoding} with {bits} bits")
+
+    info = {"encoding": "float" if encoding == WAVE_FORMAT_IEEE_FLOAT else "pcm", "bits_per_sample": bits}
+    return decoded.reshape(-1, channels), sample_rate, info
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """Low-pass FIR for resampling by up/down, split into `up` phases.
+
+    Row p holds the taps applied to successive input samples for outputs
+    that fall p/up of the way between two of them.
+    """
+    ratio = max(up, down)
+    half_length = FILTER_ZERO_CROSSINGS * ratio
+    taps = np.arange(-half_length, half_length + 1)
+    kernel = np.sinc(taps * FILTER_CUTOFF / ratio) * np.kaiser(len(taps), KAISER_BETA)
+    kernel *= up / kernel.sum()
+    per_phase = -(-len(kernel) // up)
+    padded = np.zeros(per_phase * up)
+    padded[:len(kernel)] = kernel
+    return padded.reshape(per_phase, up).T.copy(), half_length
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Resample a 1-D signal by a rational factor with a polyphase FIR.
+
+    Equivalent to zero-stuffing by `up`, low-pass filtering and keeping
+    every `down`-th sample, without building the upsampled signal: each
+    output is one dot product of its filter phase with the input samples
+    under it, computed a block of outputs at a time.
+    """
+    divisor = gcd(source_rate, target_rate)
+    up, down = target_rate // divisor, source_rate // divisor
+    if up == down or len(samples) == 0:
+        return samples
+    table, half_length = _polyphase_filter(up, down)
+    per_phase = table.shape[1]
+
+    output_count = -(-len(samples) * up // down)
+    offsets = np.arange(output_count, dtype=np.int64) * down + half_length
+    newest = offsets // up  # newest input sample under each output
+    phases = offsets % up
+    # Pad so every window [newest - per_phase + 1, newest] is in range
+    left = per_phase
+    right = max(0, int(newest[-1]) - len(samples) + 1)
+    padded = np.concatenate([np.zeros(left), samples, np.zeros(right)])
+    steps = np.arange(per_phase)
+
+    resampled = np.empty(output_count)
+    for start in range(0, output_count, RESAMPLE_BLOCK):
+        block = slice(start, start + RESAMPLE_BLOCK)
+        windows = padded[(newest[block] + left)[:, None] - steps]
+        resampled[block] = np.einsum("ij,ij->i", windows, table[phases[block]])
+    return resampled
+
+
+def encode_pcm16(samples: np.ndarray) -> bytes:
+    deltas = np.diff(samples.astype("<i2"), prepend=np.int16(0))
+    return zlib.compress(deltas.astype("<i2").tobytes(), ZLIB_LEVEL)
+
+
+def decode_pcm16(data: bytes) -> np.ndarray:
+    deltas = np.frombuffer(zlib.decompress(data), dtype="<i2")
+    # Int16 arithmetic wraps exactly as the differences did
+    return np.cumsum(deltas, dtype=np.int16)
+
+
+def to_pcm16(samples: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(samples * 32768.0), -32768, 32767).astype("<i2")
+
+
+def normalize_speech(speech_data: str) -> dict:
+    """Decode an uploaded recording and store it as 16 kHz mono int16.
+
+    Returns the `raw_data["speech_audio"]` document: the compacted samples,
+    a SHA-256 of the PCM they decode to, and the original format and
+    checksum. Recordings in containers we cannot decode are kept as sent.
+    Raises ValueError when `speech_data` is not base64.
+    """
+    original, mime = decode_upload(speech_data)
+    original_info = {
+        "mime": mime or sniff_mime(original),
+        "bytes": len(original),
+        "sha256": hashlib.sha256(original).hexdigest(),
+    }
+    try:
+        frames, sample_rate, wav_info = read_wav(original)
+    except ValueError as error:
+        if original[:4] == b"RIFF":
+            logger.warning("Keeping WAV recording as sent: %s", error)
+        return {"codec": ORIGINAL_CODEC, "data": original, "sha256": original_info["sha256"], "original": original_info}
+
+    original_info.update(wav_info, sample_rate=sample_rate, channels=frames.shape[1])
+    mono = frames.mean(axis=1) if frames.shape[1] > 1 else frames[:, 0]
+    pcm = to_pcm16(resample(mono, sample_rate, TARGET_SAMPLE_RATE))
+    return {
+        "codec": CODEC,
+        "sample_rate": TARGET_SAMPLE_RATE,
+        "channels": 1,
+        "samples": len(pcm),
+        "data": encode_pcm16(pcm),
+        "sha256": hashlib.sha256(pcm.tobytes()).hexdigest(),
+        "original": original_info,
+    }
+
+
+def speech_duration(audio: dict) -> Optional[float]:
+    if audio.get("codec") != CODEC:
+        return None
+    return round(audio["samples"] / audio["sample_rate"], 2)
+
+
+def load_speech_samples(audio: dict) -> np.ndarray:
+    """The stored int16 samples, checked against the recorded checksum."""
+    if audio.get("codec") != CODEC:
+        raise ValueError(f"Recording is stored as {audio.get('codec')}, not PCM")
+    pcm = decode_pcm16(audio["data"])
+    if hashlib.sha256(pcm.tobytes()).hexdigest() != audio["sha256"]:
+        raise ValueError("Stored recording does not match its checksum")
+    return pcm
+
+
+def speech_audio_bytes(audio: dict) -> Tuple[bytes, str]:
+    """A playable file for a stored recording and its MIME type."""
+    if audio.get("codec") != CODEC:
+        return bytes(audio["data"]), audio["original"]["mime"]
+    pcm = load_speech_samples(audio).tobytes()
+    rate = audio["sample_rate"]
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(pcm), b"WAVE",
+        b"fmt ", 16, WAVE_FORMAT_PCM, 1, rate, rate * 2, 2, 16,
+        b"data", len(pcm)
+    )
+    return header + pcm, "audio/wav"
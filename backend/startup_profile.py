@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+import subprocess
+import sys
+
+BACKEND_DIR = Path(__file__).parent
+
+
+@dataclass
+class ImportTiming:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def measure_import_seconds(module: str = "server") -> float:
+    """Time importing `module` in a fresh interpreter (interpreter start-up excluded)."""
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - started)"
+    )
+    return float(_run(["-c", code]).stdout.strip().splitlines()[-1])
+
+
+def profile_imports(module: str = "server") -> List[ImportTiming]:
+    """Per-module import times for `module`, from `python -X importtime`."""
+    stderr = _run(["-X", "importtime", "-c", f"import {module}"]).stderr
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append(ImportTiming(
+            name=name.strip(),
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+            depth=(len(name) - len(name.lstrip())) // 2
+        ))
+    return timings
@@ -0,0 +1,203 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for the classic format
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+# Per-route sampling of access lines, e.g. "/api/assessments/latest=0.1,/api/metrics=0";
+# errors and slow requests are always logged
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+LOG_SLOW_REQUEST_MS = float(os.environ.get("LOG_SLOW_REQUEST_MS", "1000"))
+# User ids are logged as a salted hash, enough to follow one user's requests
+LOG_USER_HASH_SALT = os.environ.get("LOG_USER_HASH_SALT", "")
+
+# Per-request fields, shared by every record logged while serving it. A dict
+# rather than separate variables, so handlers can fill in the user in place.
+request_context: ContextVar[Optional[Dict[str, str]]] = ContextVar("request_context", default=None)
+
+access_logger = logging.getLogger("access")
+
+_listener: Optional[QueueListener] = None
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def hash_user_id(user_id: str) -> str:
+    return hashlib.sha256(f"{LOG_USER_HASH_SALT}{user_id}".encode()).hexdigest()[:16]
+
+
+def set_log_user(user_id: str):
+    """Attach the authenticated user (hashed) to the current request's records."""
+    context = request_context.get()
+    if context is not None:
+        context["user"] = hash_user_id(user_id)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        route, _, rate = item.strip().rpartition("=")
+        if route:
+            rates[route] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request fields it was logged under."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", None) or {})
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+JsonFormatter.converter = time.gmtime
+
+
+class ContextQueueHandler(QueueHandler):
+    """Hands records to the listener thread with the request context attached.
+
+    Only the message is rendered here; JSON formatting and the write happen
+    on the listener thread, off the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The root logger has no other handlers, so the record is reused
+        # rather than copied
+        context = request_context.get()
+        record.context = dict(context) if context else None
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _start_listener(handler: logging.Handler) -> QueueHandler:
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return ContextQueueHandler(log_queue)
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT):
+    """Route all logging through a queue to a stdout writer thread.
+
+    Replaces any handlers on the root logger; calling it again reconfigures.
+    Forked workers (see launcher.py) start their own writer thread.
+    """
+    stop_logging()
+    output = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_start_listener(output))
+    root.setLevel(level)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork(); give the child its own
+    global _listener
+    if _listener is None:
+        return
+    output = _listener.handlers[0]
+    _listener = None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, ContextQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_start_listener(output))
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(stop_logging)
+
+
+class RequestLoggingMiddleware:
+    """Assign each request an id and log one access line when it finishes.
+
+    The id comes from a well-formed incoming `X-Request-ID` or is generated,
+    is echoed in the response, and tags every record logged while the
+    request is served, including from worker threads. Access lines carry
+    the route template, status, latency and hashed user id; routes listed
+    in LOG_SAMPLE_RATES are sampled.
+    """
+
+    def __init__(self, app, sample_rates: Optional[Dict[str, float]] = None):
+        self.app = app
+        self.sample_rates = parse_sample_rates(LOG_SAMPLE_RATES) if sample_rates is None else sample_rates
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        context = {"request_id": request_id}
+        token = request_context.set(context)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            context["route"] = route
+            rate = self.sample_rates.get(route, 1.0)
+            if status >= 500 or latency_ms >= LOG_SLOW_REQUEST_MS or rate >= 1.0 or random.random() < rate:
+                access_logger.info(
+                    "%s %s %d %.1fms", scope["method"], scope["path"], status, latency_ms,
+                    extra={"fields": {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "latency_ms": round(latency_ms, 2),
+                        "sample_rate": rate,
+                    }}
+                )
+            request_context.reset(token)
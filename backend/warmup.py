@@ -0,0 +1,82 @@
+from datetime import datetime
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Reset by the launcher right after fork so time-to-ready covers the worker's
+# own start-up rather than the parent's preload
+PROCESS_STARTED_AT = time.perf_counter()
+
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "false").lower() in ("1", "true", "yes")
+
+# Heavy optional modules (ReportLab) are imported on first use unless this is
+# set, e.g. by the preloading launcher so forked workers share them
+EAGER_IMPORTS = os.environ.get("EAGER_IMPORTS", "false").lower() in ("1", "true", "yes")
+
+
+def mark_process_start():
+    global PROCESS_STARTED_AT
+    PROCESS_STARTED_AT = time.perf_counter()
+
+
+def seconds_since_start() -> float:
+    return time.perf_counter() - PROCESS_STARTED_AT
+
+
+def preload_modules():
+    """Import the modules that are otherwise loaded lazily on first use."""
+    import pdf_service
+
+    pdf_service.preload()
+
+
+def _timed(timings: dict, name: str, func):
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception:
+        logger.exception("Warm-up step %s failed", name)
+    timings[name] = time.perf_counter() - started
+
+
+def _render_dummy_pdf():
+    from pdf_service import generate_assessment_pdf
+
+    assessment = {
+        "id": "00000000-warm-up",
+        "test_date": datetime.utcnow(),
+        "overall_score": 80.0,
+        "risk_level": "Low",
+        "results": {
+            "memory_accuracy": 80.0, "memory_correct": 8, "memory_total": 10,
+            "attention_accuracy": 75.0, "attention_hits": 15, "attention_false_alarms": 2,
+            "reaction_avg_time": 350.0, "reaction_best_time": 280.0,
+            "speech_duration": 12.0,
+        },
+    }
+    generate_assessment_pdf(assessment, {"name": "Warm-up", "email": "warm-up@example.com"})
+
+
+def _touch_bcrypt():
+    from auth import get_password_hash
+
+    get_password_hash("warm-up")
+
+
+def _prime_caches():
+    from serialization import document_adapter
+    from models import AssessmentResponse, AssessmentHistory, SharedReportResponse
+
+    for model in (AssessmentResponse, AssessmentHistory, SharedReportResponse):
+        document_adapter(model)
+
+
+def warm_up() -> dict:
+    """Exercise the slow first-call paths of a worker and time each step."""
+    timings = {}
+    _timed(timings, "pdf", _render_dummy_pdf)
+    _timed(timings, "bcrypt", _touch_bcrypt)
+    _timed(timings, "caches", _prime_caches)
+    return timings
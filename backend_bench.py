@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Backend Micro-Benchmarks for AI-Powered Early Dementia Detection Platform
+Runs in-process against the backend modules (no server or database needed)
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def seeded_assessments(count, seed=42, speech_bytes=0):
+    """Build deterministic assessment documents shaped like the ones we store"""
+    from models import AssessmentResult
+
+    # Stored results carry every AssessmentResult field, unset ones as None
+    empty_results = dict.fromkeys(AssessmentResult.model_fields)
+    rng = random.Random(seed)
+    user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    start = datetime(2020, 1, 1)
+    documents = []
+    for i in range(count):
+        memory_total = 10
+        memory_correct = rng.randint(3, 10)
+        hits = rng.randint(10, 20)
+        false_alarms = rng.randint(0, 5)
+        avg_time = rng.uniform(250, 700)
+        results = {
+            **empty_results,
+            "memory_score": memory_correct * 10.0,
+            "memory_accuracy": memory_correct / memory_total * 100,
+            "memory_correct": memory_correct,
+            "memory_total": memory_total,
+            "attention_score": hits * 5.0,
+            "attention_accuracy": max(0.0, (hits - false_alarms) / 20 * 100),
+            "attention_hits": hits,
+            "attention_false_alarms": false_alarms,
+            "reaction_score": max(0.0, 100 - (avg_time - 250) / 5),
+            "reaction_avg_time": avg_time,
+            "reaction_best_time": avg_time - rng.uniform(20, 120),
+            "speech_duration": rng.uniform(5, 30),
+            "speech_data": "UklGR" + "A" * speech_bytes if speech_bytes else None,
+            "speech_analysis": None,
+        }
+        documents.append({
+            "_id": rng.getrandbits(96),
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": user_id,
+            "test_date": start + timedelta(days=30 * i, minutes=rng.randint(0, 600)),
+            "results": results,
+            "overall_score": rng.uniform(20, 100),
+            "risk_level": rng.choice(["Low", "Moderate", "High"]),
+        })
+    return documents
+
+
+class BackendBenchmark:
+    def __init__(self, iterations=None):
+        self.iterations = iterations or int(os.environ.get("BENCH_ITERATIONS", "200"))
+        self.bench_results = []
+
+    def measure(self, func, iterations=None):
+        """Return the mean wall time of func() in microseconds"""
+        iterations = iterations or self.iterations
+        func()  # warm caches and lazy imports
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    def log_result(self, bench_name, baseline_us, candidate_us, details=None):
+        """Log a baseline vs. candidate comparison"""
+        speedup = baseline_us / candidate_us if candidate_us else float("inf")
+        self.bench_results.append({
+            "bench": bench_name,
+            "baseline_us": baseline_us,
+            "candidate_us": candidate_us,
+            "speedup": speedup,
+            "details": details,
+        })
+        print(f"{bench_name}: {baseline_us:,.1f}us -> {candidate_us:,.1f}us ({speedup:.2f}x)")
+        if details:
+            print(f"   {details}")
+
+    def bench_history_serialization(self):
+        """Compare the response_model path with the trusted fast-JSON path"""
+        print("\n=== History Serialization ===")
+        from models import AssessmentResponse, AssessmentHistory
+        from pydantic import TypeAdapter
+        import serialization
+
+        documents = seeded_assessments(50)
+        adapter = TypeAdapter(AssessmentHistory)
+
+        def current_path():
+            # What FastAPI does with response_model: build, dump, re-validate,
+            # dump to JSON-able python and encode with json.dumps.
+            model = AssessmentHistory(
+                assessments=[AssessmentResponse(**doc) for doc in documents],
+                total_count=len(documents)
+            )
+            validated = adapter.validate_python(model.model_dump())
+            content = adapter.dump_python(validated, mode="json")
+            return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                              separators=(",", ":")).encode("utf-8")
+
+        def fast_path():
+            return serialization.json_response(AssessmentHistory, {
+                "assessments": documents,
+                "total_count": len(documents)
+            }).body
+
+        serialization.FAST_SERIALIZATION = True
+        assert json.loads(current_path()) == json.loads(fast_path())
+        self.log_result(
+            "history (50 assessments)",
+            self.measure(current_path),
+            self.measure(fast_path),
+            f"{len(fast_path())} bytes per response"
+        )
+
+    def bench_history_pdf(self):
+        """A ten-year monthly history report should cost about the same as a one-year one"""
+        print("\n=== Longitudinal History PDF ===")
+        from pdf_service import generate_history_pdf, HISTORY_CHART_POINTS
+
+        user = {"name": "Benchmark Patient", "email": "bench@example.com"}
+        one_year = seeded_assessments(12)
+        ten_years = seeded_assessments(120)
+        iterations = max(1, self.iterations // 20)
+
+        self.log_result(
+            "history PDF (12 -> 120 monthly assessments)",
+            self.measure(lambda: generate_history_pdf(one_year, user), iterations),
+            self.measure(lambda: generate_history_pdf(ten_years, user), iterations),
+            f"charts capped at {HISTORY_CHART_POINTS} points; speedup near 1.0x means flat cost"
+        )
+
+    def bench_response_compression(self):
+        """Wire size of a history response with and without compression"""
+        print("\n=== Response Compression ===")
+        import base64
+        import serialization
+        from compression import ENCODINGS, compress
+        from models import AssessmentHistory
+
+        serialization.FAST_SERIALIZATION = True
+        rng = random.Random(7)
+        with_speech = seeded_assessments(50)
+        for document in with_speech[:10]:
+            # Recorded audio is noise-like, unlike a run of one character
+            audio = bytes(rng.getrandbits(8) for _ in range(48 * 1024))
+            document["results"]["speech_data"] = "UklGR" + base64.b64encode(audio).decode()
+
+        for label, documents in (("scores only", seeded_assessments(50)), ("10 with speech", with_speech)):
+            def serialize():
+                return serialization.json_response(AssessmentHistory, {
+                    "assessments": documents,
+                    "total_count": len(documents)
+                }).body
+
+            body = serialize()
+            for encoding in ENCODINGS:
+                compressed, _ = compress(body, encoding)
+                self.log_result(
+                    f"history {encoding} ({label})",
+                    self.measure(serialize, 20),
+                    self.measure(lambda: compress(serialize(), encoding), 20),
+                    f"{len(body):,} -> {len(compressed):,} bytes on the wire "
+                    f"({1 - len(compressed) / len(body):.0%} saved); times: serialize vs serialize + compress"
+                )
+
+    def bench_rate_limiter(self):
+        """Per-request cost of the token-bucket check next to the bcrypt verify it protects"""
+        print("\n=== Rate Limiter ===")
+        from auth import get_password_hash, verify_password
+        from rate_limit import TokenBucket
+
+        password_hash = get_password_hash("benchmark-password")
+        bucket = TokenBucket(20, 60.0, max_keys=100000)
+        keys = [f"10.0.{i // 256}.{i % 256}" for i in range(50000)]
+
+        def check_many():
+            for key in keys:
+                bucket.acquire(key)
+
+        per_check_us = self.measure(check_many, 5) / len(keys)
+        self.log_result(
+            "login: bcrypt verify vs limiter check",
+            self.measure(lambda: verify_password("benchmark-password", password_hash), 3),
+            per_check_us,
+            f"{per_check_us:.2f}us per check with {len(bucket):,} tracked keys"
+        )
+
+    def bench_logging_overhead(self):
+        """Cost on the request path of one access line, written inline vs queued"""
+        print("\n=== Logging Overhead ===")
+        import logging
+        import tempfile
+        from logging.handlers import QueueListener
+        import queue
+        from structured_logging import ContextQueueHandler, JsonFormatter, request_context
+
+        records = 2000
+        logger = logging.getLogger("bench.access")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        request_context.set({"request_id": uuid.uuid4().hex, "route": "/api/assessments/history", "user": "0" * 16})
+        fields = {"method": "GET", "path": "/api/assessments/history", "status": 200, "latency_ms": 12.5, "sample_rate": 1.0}
+
+        def log_many():
+            for _ in range(records):
+                logger.info("GET /api/assessments/history 200 12.5ms", extra={"fields": fields})
+
+        with tempfile.TemporaryFile("w") as output:
+            inline = logging.StreamHandler(output)
+            inline.setFormatter(JsonFormatter())
+            logger.handlers = [inline]
+            inline_us = self.measure(log_many, 5) / records
+
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, inline)
+            listener.start()
+            logger.handlers = [ContextQueueHandler(log_queue)]
+            queued_us = self.measure(log_many, 5) / records
+            listener.stop()
+        logger.handlers = []
+
+        self.log_result(
+            "access line: inline JSON write vs queue handler",
+            inline_us,
+            queued_us,
+            "per record on the calling thread; formatting and the write move to the listener"
+        )
+
+    def bench_speech_normalization(self):
+        """Stored size of a recording kept verbatim vs normalized to 16 kHz mono int16"""
+        print("\n=== Speech Normalization ===")
+        import base64
+        import io
+        import wave
+        import numpy as np
+        from speech_audio import normalize_speech
+
+        # 30 s of voiced, amplitude-modulated tones with a little noise, in the
+        # 48 kHz stereo WAV a browser might record
+        rng = np.random.default_rng(11)
+        t = np.arange(48000 * 30) / 48000
+        voice = 0.3 * np.sin(2 * np.pi * 140 * t) * (1 + np.sin(2 * np.pi * 4 * t))
+        voice += 0.05 * np.sin(2 * np.pi * 1200 * t) + rng.normal(0, 0.002, len(t))
+        frames = (np.stack([voice, 0.9 * voice], axis=1) * 32767).astype("<i2")
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as output:
+            output.setnchannels(2)
+            output.setsampwidth(2)
+            output.setframerate(48000)
+            output.writeframes(frames.tobytes())
+        upload = base64.b64encode(buffer.getvalue()).decode()
+
+        audio = normalize_speech(upload)
+        self.log_result(
+            "30 s 48 kHz stereo WAV: verbatim base64 vs normalized",
+            self.measure(lambda: base64.b64decode(upload), 5),
+            self.measure(lambda: normalize_speech(upload), 5),
+            f"{len(upload):,} -> {len(audio['data']):,} bytes stored "
+            f"({len(upload) / len(audio['data']):.1f}x smaller); times: decode vs decode + resample + pack"
+        )
+
+    def run_all_benchmarks(self):
+        """Run all backend benchmarks"""
+        print("⏱️  Starting Backend Micro-Benchmarks")
+        print(f"Iterations: {self.iterations}")
+        print("=" * 80)
+
+        self.bench_history_serialization()
+        self.bench_history_pdf()
+        self.bench_response_compression()
+        self.bench_rate_limiter()
+        self.bench_logging_overhead()
+        self.bench_speech_normalization()
+
+        print("\n" + "=" * 80)
+        return self.bench_results
+
+
+if __name__ == "__main__":
+    BackendBenchmark().run_all_benchmarks()
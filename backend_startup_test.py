@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Cold-Start Budget Tests for AI-Powered Early Dementia Detection Platform
+Imports the backend in a fresh interpreter and fails when start-up regresses
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from startup_profile import measure_import_seconds, profile_imports  # noqa: E402
+
+# Budget for `import server` in a fresh interpreter, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "1500"))
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ["reportlab", "numpy", "pandas", "boto3"]
+
+
+def test_cold_start_import_within_budget():
+    """Importing the app must stay within IMPORT_BUDGET_MS"""
+    elapsed_ms = measure_import_seconds("server") * 1000
+    if elapsed_ms > IMPORT_BUDGET_MS:
+        slowest = sorted(profile_imports("server"), key=lambda t: t.self_us, reverse=True)[:10]
+        report = ", ".join(f"{t.name} {t.self_us / 1000:.0f}ms" for t in slowest)
+        raise AssertionError(
+            f"Cold import took {elapsed_ms:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms); slowest: {report}"
+        )
+
+
+def test_heavy_modules_are_lazy():
+    """Heavy optional modules must not be imported by a plain start-up"""
+    imported = {timing.name.split(".")[0] for timing in profile_imports("server")}
+    eager = [module for module in LAZY_MODULES if module in imported]
+    assert not eager, f"Imported on cold start: {', '.join(eager)}"
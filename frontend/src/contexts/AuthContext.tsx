@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useEffect } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef } from 'react';
 
 interface User {
   id: string;
@@ -14,6 +14,7 @@ interface AuthContextType {
   login: (email: string, password: string) => Promise<void>;
   register: (email: string, password: string, name: string, language?: string) => Promise<void>;
   logout: () => void;
+  authFetch: (url: string, init?: RequestInit) => Promise<Response>;
   isAuthenticated: boolean;
   isLoading: boolean;
 }
@@ -24,6 +25,8 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   const [user, setUser] = useState<User | null>(null);
   const [token, setToken] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const tokenRef = useRef<string | null>(null);
+  const refreshRef = useRef<Promise<string | null> | null>(null);
 
   const backendUrl = import.meta.env.REACT_APP_BACKEND_URL || '';
 
@@ -33,12 +36,74 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
     const storedUser = localStorage.getItem('user');
     
     if (storedToken && storedUser) {
+      tokenRef.current = storedToken;
       setToken(storedToken);
       setUser(JSON.parse(storedUser));
     }
     setIsLoading(false);
   }, []);
 
+  const storeSession = (data: any) => {
+    tokenRef.current = data.access_token;
+    setToken(data.access_token);
+    setUser(data.user);
+
+    localStorage.setItem('token', data.access_token);
+    localStorage.setItem('refresh_token', data.refresh_token);
+    localStorage.setItem('user', JSON.stringify(data.user));
+  };
+
+  const clearSession = () => {
+    tokenRef.current = null;
+    setUser(null);
+    setToken(null);
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    localStorage.removeItem('user');
+  };
+
+  // Access tokens are short-lived; trade the refresh token for a new pair.
+  // Concurrent callers share one refresh, since each refresh token works once.
+  const refreshSession = () => {
+    if (!refreshRef.current) {
+      refreshRef.current = (async () => {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (!refreshToken) return null;
+        try {
+          const response = await fetch(`${backendUrl}/api/auth/refresh`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+          });
+          if (!response.ok) {
+            clearSession();
+            return null;
+          }
+          const data = await response.json();
+          storeSession(data);
+          return data.access_token as string;
+        } catch (error) {
+          return null;
+        } finally {
+          refreshRef.current = null;
+        }
+      })();
+    }
+    return refreshRef.current;
+  };
+
+  // fetch with the access token, refreshing it once if it has expired
+  const authFetch = async (url: string, init: RequestInit = {}) => {
+    const send = (accessToken: string | null) => fetch(url, {
+      ...init,
+      headers: { ...(init.headers || {}), 'Authorization': `Bearer ${accessToken}` },
+    });
+    const response = await send(tokenRef.current);
+    if (response.status !== 401) return response;
+    const refreshed = await refreshSession();
+    return refreshed ? send(refreshed) : response;
+  };
+
   const login = async (email: string, password: string) => {
     try {
       const response = await fetch(`${backendUrl}/api/auth/login`, {
@@ -54,12 +119,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
         throw new Error(error.detail || 'Login failed');
       }
 
-      const data = await response.json();
-      setToken(data.access_token);
-      setUser(data.user);
-      
-      localStorage.setItem('token', data.access_token);
-      localStorage.setItem('user', JSON.stringify(data.user));
+      storeSession(await response.json());
     } catch (error: any) {
       console.error('Login error:', error);
       throw error;
@@ -86,12 +146,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
         throw new Error(error.detail || 'Registration failed');
       }
 
-      const data = await response.json();
-      setToken(data.access_token);
-      setUser(data.user);
-      
-      localStorage.setItem('token', data.access_token);
-      localStorage.setItem('user', JSON.stringify(data.user));
+      storeSession(await response.json());
     } catch (error: any) {
       console.error('Registration error:', error);
       throw error;
@@ -99,10 +154,14 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   };
 
   const logout = () => {
-    setUser(null);
-    setToken(null);
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    // Revoke the session server-side too, so the tokens stop working everywhere
+    if (tokenRef.current) {
+      fetch(`${backendUrl}/api/auth/logout`, {
+        method: 'POST',
+        headers: { 'Authorization': `Bearer ${tokenRef.current}` },
+      }).catch(() => undefined);
+    }
+    clearSession();
   };
 
   return (
@@ -113,6 +172,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
         login,
         register,
         logout,
+        authFetch,
         isAuthenticated: !!token,
         isLoading,
       }}
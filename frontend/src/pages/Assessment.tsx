@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useRef, useState } from "react";
 import { Card } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Progress } from "@/components/ui/progress";
@@ -19,13 +19,111 @@ const Assessment = () => {
   const [results, setResults] = useState<any>({});
   const [isSaving, setIsSaving] = useState(false);
   const navigate = useNavigate();
-  const { token, isAuthenticated } = useAuth();
+  const { token, isAuthenticated, authFetch } = useAuth();
   const backendUrl = import.meta.env.REACT_APP_BACKEND_URL || '';
 
   const steps: TestStep[] = ["intro", "memory", "attention", "reaction", "speech", "complete"];
   const currentStepIndex = steps.indexOf(currentStep);
   const progress = (currentStepIndex / (steps.length - 1)) * 100;
 
+  // Each completed step is saved into a server-side draft, so a dropped
+  // connection costs at most one step; the draft is scored on finalize.
+  const draftRef = useRef<Promise<string | null>>(Promise.resolve(null));
+  const stepSavesRef = useRef<Promise<boolean>>(Promise.resolve(true));
+
+  const stepResults = (stepName: string, data: any) => {
+    switch (stepName) {
+      case "memory":
+        return {
+          memory_accuracy: data?.accuracy,
+          memory_correct: data?.correctItems,
+          memory_total: data?.totalItems,
+        };
+      case "attention":
+        return {
+          attention_accuracy: data?.accuracy,
+          attention_hits: data?.correctHits,
+          attention_false_alarms: data?.falseAlarms,
+        };
+      case "reaction":
+        return {
+          reaction_avg_time: data?.averageReactionTime,
+          reaction_best_time: data?.bestTime,
+        };
+      case "speech":
+        return {
+          speech_duration: data?.recordingTime,
+          speech_data: data?.audioData,
+        };
+      default:
+        return {};
+    }
+  };
+
+  // Retry transient failures (network errors, 5xx) with exponential backoff
+  // Retries of a request carrying an idempotency key are replayed, not repeated
+  const backendRequest = async (
+    path: string, method: string, body?: any, retries = 2, idempotencyKey?: string
+  ) => {
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const response = await authFetch(`${backendUrl}${path}`, {
+          method,
+          headers: {
+            'Content-Type': 'application/json',
+            ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}),
+          },
+          body: body === undefined ? undefined : JSON.stringify(body),
+        });
+        if (response.ok || response.status < 500 || attempt >= retries) {
+          return response;
+        }
+      } catch (error) {
+        if (attempt >= retries) throw error;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt));
+    }
+  };
+
+  const startDraft = () => {
+    if (!isAuthenticated || !token) return;
+    draftRef.current = backendRequest('/api/assessments/drafts', 'POST')
+      .then(async (response) => (response.ok ? (await response.json()).id : null))
+      .catch(() => null);
+  };
+
+  const saveStep = (stepName: string, data: any) => {
+    if (!isAuthenticated || !token) return;
+    const previous = stepSavesRef.current;
+    stepSavesRef.current = draftRef.current.then(async (draftId) => {
+      const previousOk = await previous;
+      if (!draftId) return false;
+      try {
+        const response = await backendRequest(
+          `/api/assessments/drafts/${draftId}/steps/${stepName}`, 'PUT', stepResults(stepName, data)
+        );
+        return previousOk && response.ok;
+      } catch (error) {
+        console.error(`Error saving ${stepName} step:`, error);
+        return false;
+      }
+    });
+  };
+
+  // Finalizing is idempotent per draft: a finalize whose response was lost
+  // is retried, never replaced by a save, which would store the assessment
+  // twice. Returns null only when there is no draft to finalize.
+  const finalizeDraft = async () => {
+    const draftId = await draftRef.current;
+    const stepsSaved = await stepSavesRef.current;
+    if (!draftId || !stepsSaved) return null;
+    const response = await backendRequest(`/api/assessments/drafts/${draftId}/finalize`, 'POST', undefined, 4);
+    if (response.ok) return await response.json();
+    // Neither the draft nor an assessment finalized from it exists: it expired
+    if (response.status === 404) return null;
+    throw new Error(`Failed to finalize assessment (${response.status})`);
+  };
+
   const saveAssessmentToBackend = async (assessmentResults: any) => {
     if (!isAuthenticated || !token) {
       // If not authenticated, just navigate to results with local data
@@ -35,27 +133,24 @@ const Assessment = () => {
 
     setIsSaving(true);
     try {
-      const response = await fetch(`${backendUrl}/api/assessments/save`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`,
+      const finalized = await finalizeDraft();
+      if (finalized) {
+        toast.success('Assessment saved successfully!');
+        navigate("/results", { state: { assessment: finalized, results: assessmentResults } });
+        return;
+      }
+
+      // Draft unavailable (e.g. expired): save everything in one request,
+      // keyed by the draft so repeated attempts store one assessment
+      const draftId = await draftRef.current;
+      const response = await backendRequest('/api/assessments/save', 'POST', {
+        results: {
+          ...stepResults("memory", assessmentResults.memory),
+          ...stepResults("attention", assessmentResults.attention),
+          ...stepResults("reaction", assessmentResults.reaction),
+          ...stepResults("speech", assessmentResults.speech),
         },
-        body: JSON.stringify({
-          results: {
-            memory_accuracy: assessmentResults.memory?.accuracy,
-            memory_correct: assessmentResults.memory?.correctItems,
-            memory_total: assessmentResults.memory?.totalItems,
-            attention_accuracy: assessmentResults.attention?.accuracy,
-            attention_hits: assessmentResults.attention?.correctHits,
-            attention_false_alarms: assessmentResults.attention?.falseAlarms,
-            reaction_avg_time: assessmentResults.reaction?.averageReactionTime,
-            reaction_best_time: assessmentResults.reaction?.bestTime,
-            speech_duration: assessmentResults.speech?.recordingTime,
-            speech_data: assessmentResults.speech?.audioData,
-          },
-        }),
-      });
+      }, 2, draftId ? `draft-save-${draftId}` : crypto.randomUUID());
 
       if (response.ok) {
         const savedAssessment = await response.json();
@@ -86,6 +181,12 @@ const Assessment = () => {
       complete: "complete",
     };
     
+    if (stepName === "intro") {
+      startDraft();
+    } else {
+      saveStep(stepName, data);
+    }
+
     const nextStep = nextStepMap[currentStep];
     if (nextStep === "complete") {
       // Save results and navigate to results page
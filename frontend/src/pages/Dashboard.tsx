@@ -15,7 +15,7 @@ interface AssessmentData {
 }
 
 const Dashboard = () => {
-  const { user, token, logout } = useAuth();
+  const { user, logout, authFetch } = useAuth();
   const [assessments, setAssessments] = useState<AssessmentData[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const backendUrl = import.meta.env.REACT_APP_BACKEND_URL || '';
@@ -26,11 +26,7 @@ const Dashboard = () => {
 
   const fetchAssessments = async () => {
     try {
-      const response = await fetch(`${backendUrl}/api/assessments/history`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
+      const response = await authFetch(`${backendUrl}/api/assessments/history`);
 
       if (response.ok) {
         const data = await response.json();
@@ -58,11 +54,7 @@ const Dashboard = () => {
 
   const downloadPDF = async (assessmentId: string) => {
     try {
-      const response = await fetch(`${backendUrl}/api/assessments/${assessmentId}/pdf`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
+      const response = await authFetch(`${backendUrl}/api/assessments/${assessmentId}/pdf`);
 
       if (response.ok) {
         const blob = await response.blob();
@@ -86,11 +78,8 @@ const Dashboard = () => {
 
   const shareReport = async (assessmentId: string) => {
     try {
-      const response = await fetch(`${backendUrl}/api/assessments/${assessmentId}/share`, {
+      const response = await authFetch(`${backendUrl}/api/assessments/${assessmentId}/share`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
       });
 
       if (response.ok) {
@@ -0,0 +1,64 @@
+"""
+Shared fixtures: an in-memory MongoDB (mongomock-motor) and an app client
+running the real lifespan against it
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dementia_test")
+# Tests exercise the limiter directly; endpoint tests should not trip it
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()[os.environ["DB_NAME"]]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import database
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(database, "create_client", lambda settings: AsyncMongoMockClient())
+    import server
+
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def app_db(client):
+    """The database behind `client`."""
+    return client.app.state.database.db
+
+
+@pytest.fixture
+def login(client, app_db):
+    """Register (or log in) a user and return their Authorization header."""
+
+    def login(email="patient@example.com", password="secret-password", name="Test Patient", role=None):
+        response = client.post("/api/auth/register", json={"email": email, "password": password, "name": name})
+        if response.status_code != 200 or role:
+            if role:
+                # The role is read into the token at login
+                client.portal.call(app_db.users.update_one, {"email": email}, {"$set": {"role": role}})
+            response = client.post("/api/auth/login", json={"email": email, "password": password})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login
@@ -0,0 +1,141 @@
+"""
+Tests for per-class admission control and load shedding
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admission
+from admission import AdmissionMiddleware, ClassLimiter, Shed, classify, load_limiters
+
+
+async def _settle():
+    # Let woken waiters run past wait_for/shield
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_classify_routes():
+    assert classify("GET", "/api/assessments/abc/pdf") == "pdf"
+    assert classify("HEAD", "/api/reports/shared/tok/pdf") == "pdf"
+    assert classify("POST", "/api/auth/login") == "auth"
+    assert classify("POST", "/api/admin/import/assessments") == "bulk"
+    assert classify("GET", "/api/admin/export/assessments") == "bulk"
+    assert classify("POST", "/api/admin/export/reports") == "bulk"
+    assert classify("GET", "/api/admin/export/reports") is None
+    assert classify("GET", "/api/auth/login") is None
+    assert classify("GET", "/api/assessments/history") is None
+
+
+def test_classes_are_configured_from_the_environment(monkeypatch):
+    monkeypatch.setenv("ADMISSION_PDF", "8/16/2.5")
+    monkeypatch.setenv("ADMISSION_BULK", "off")
+    limiters = load_limiters()
+    pdf = limiters["pdf"]
+    assert (pdf.concurrency, pdf.max_queue, pdf.max_wait_seconds) == (8, 16, 2.5)
+    assert limiters["bulk"] is None
+    assert limiters["auth"].concurrency == 8
+
+
+@pytest.mark.anyio
+async def test_freed_slots_go_to_waiters_in_order():
+    limiter = ClassLimiter("test", concurrency=1, max_queue=4, max_wait_seconds=5)
+    await limiter.acquire()
+    admitted = []
+
+    async def wait(name):
+        await limiter.acquire()
+        admitted.append(name)
+
+    waiters = [asyncio.create_task(wait(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    assert (limiter.active, limiter.queued) == (1, 2)
+
+    limiter.release(0.5)
+    await _settle()
+    assert admitted == ["first"]
+    assert (limiter.active, limiter.queued) == (1, 1)
+
+    limiter.release()
+    limiter.release()
+    await asyncio.gather(*waiters)
+    assert admitted == ["first", "second"]
+    assert (limiter.active, limiter.queued) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_full_queue_is_shed_immediately():
+    limiter = ClassLimiter("test", concurrency=1, max_queue=0, max_wait_seconds=5)
+    await limiter.acquire()
+    with pytest.raises(Shed) as shed:
+        await limiter.acquire()
+    assert shed.value.reason == "queue_full"
+    assert shed.value.retry_after >= 1
+
+
+@pytest.mark.anyio
+async def test_waiting_too_long_is_shed_and_leaves_the_queue():
+    limiter = ClassLimiter("test", concurrency=1, max_queue=2, max_wait_seconds=0.01)
+    await limiter.acquire()
+    with pytest.raises(Shed) as shed:
+        await limiter.acquire()
+    assert shed.value.reason == "timeout"
+    assert (limiter.active, limiter.queued) == (1, 0)
+
+
+@pytest.mark.anyio
+async def test_cancelled_waiter_does_not_keep_a_slot():
+    limiter = ClassLimiter("test", concurrency=1, max_queue=2, max_wait_seconds=5)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert limiter.queued == 0
+
+    limiter.release()
+    assert limiter.active == 0
+
+
+def test_retry_after_grows_with_the_queue():
+    limiter = ClassLimiter("test", concurrency=2, max_queue=10, max_wait_seconds=5)
+    limiter._service_seconds = 4.0
+    short = limiter.retry_after()
+    limiter._waiters.extend([object()] * 3)
+    assert limiter.retry_after() > short
+
+
+def _client(limiter):
+    app = FastAPI()
+
+    @app.get("/api/assessments/{assessment_id}/pdf")
+    def pdf(assessment_id: str):
+        return {"id": assessment_id}
+
+    @app.get("/api/assessments/history")
+    def history():
+        return []
+
+    app.add_middleware(AdmissionMiddleware, limiters={"pdf": limiter})
+    return TestClient(app)
+
+
+def test_middleware_sheds_with_503_and_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    limiter = ClassLimiter("pdf", concurrency=1, max_queue=0, max_wait_seconds=1)
+    client = _client(limiter)
+
+    assert client.get("/api/assessments/a1/pdf").status_code == 200
+    assert limiter.active == 0
+
+    # Every slot is held: the next PDF is turned away, light reads are not
+    limiter.active = 1
+    response = client.get("/api/assessments/a1/pdf")
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Server is busy, please try again shortly"}
+    assert int(response.headers["retry-after"]) >= 1
+    assert client.get("/api/assessments/history").status_code == 200
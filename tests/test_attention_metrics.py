@@ -0,0 +1,98 @@
+"""
+Tests for the signal-detection (d', criterion) metrics of the attention test
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from assessment_service import ARCHIVE_COLLECTION, build_assessment
+from attention_metrics import (
+    backfill_attention_metrics, compute_attention_metrics, compute_attention_metrics_batch,
+    norm_ppf, pack_events, unpack_events,
+)
+from models import AssessmentResult, AttentionEvent
+
+
+def _events(outcomes):
+    """Events from (is_target, response_time_ms or None) pairs."""
+    return [
+        AttentionEvent(onset_ms=1000.0 * i, is_target=is_target, response_time_ms=rt)
+        for i, (is_target, rt) in enumerate(outcomes)
+    ]
+
+
+def test_norm_ppf_matches_the_normal_distribution():
+    p = np.array([1e-6, 0.001, 0.02, 0.02425, 0.1, 0.5, 0.8, 0.975, 0.999, 1 - 1e-6])
+    expected = [NormalDist().inv_cdf(value) for value in p]
+    np.testing.assert_allclose(norm_ppf(p), expected, rtol=1e-8, atol=1e-9)
+
+
+def test_d_prime_and_criterion():
+    # 8 targets with 6 hits, 12 distractors with 3 false alarms
+    outcomes = [(True, 400.0)] * 6 + [(True, None)] * 2 + [(False, 500.0)] * 3 + [(False, None)] * 9
+    metrics = compute_attention_metrics(_events(outcomes))
+    hit_rate = (6 + 0.5) / (8 + 1)
+    false_alarm_rate = (3 + 0.5) / (12 + 1)
+    z_hit, z_false_alarm = NormalDist().inv_cdf(hit_rate), NormalDist().inv_cdf(false_alarm_rate)
+    assert metrics["hits"] == 6
+    assert metrics["misses"] == 2
+    assert metrics["false_alarms"] == 3
+    assert metrics["correct_rejections"] == 9
+    assert metrics["d_prime"] == pytest.approx(z_hit - z_false_alarm)
+    assert metrics["criterion"] == pytest.approx(-(z_hit + z_false_alarm) / 2)
+    assert metrics["accuracy"] == pytest.approx(75.0)
+    assert metrics["hit_rt_mean_ms"] == pytest.approx(400.0)
+    assert metrics["false_alarm_rt_mean_ms"] == pytest.approx(500.0)
+
+
+def test_perfect_and_empty_response_sets_stay_finite():
+    perfect, silent = compute_attention_metrics_batch([
+        (np.array([True, True, False]), np.array([300.0, 320.0, np.nan])),
+        (np.array([True, False]), np.array([np.nan, np.nan])),
+    ])
+    assert np.isfinite(perfect["d_prime"]) and perfect["d_prime"] > 0
+    assert silent["hits"] == 0
+    assert silent["hit_rt_mean_ms"] is None
+    assert silent["hit_rt_median_ms"] is None
+
+
+def test_batch_medians_are_per_assessment():
+    first, second = compute_attention_metrics_batch([
+        (np.array([True, True, True]), np.array([300.0, 100.0, 200.0])),
+        (np.array([True, True]), np.array([900.0, 700.0])),
+    ])
+    assert first["hit_rt_median_ms"] == 200.0
+    assert second["hit_rt_median_ms"] == 800.0
+
+
+def test_pack_round_trip():
+    events = _events([(True, 350.0), (False, None)])
+    is_target, response_time = unpack_events(pack_events(events))
+    assert is_target.tolist() == [True, False]
+    assert response_time[0] == 350.0 and np.isnan(response_time[1])
+
+
+def test_build_assessment_derives_metrics_and_ignores_client_values():
+    events = [event.dict() for event in _events([(True, 300.0), (False, None)])]
+    assessment = build_assessment("u1", AssessmentResult(attention_events=events, attention_sdt={"d_prime": 9}))
+    assert assessment.results.attention_events is None
+    assert assessment.results.attention_sdt["d_prime"] != 9
+    assert assessment.results.attention_hits == 1
+    assert "attention_events" in assessment.raw_data
+
+    forged = build_assessment("u1", AssessmentResult(attention_sdt={"d_prime": 9}))
+    assert forged.results.attention_sdt is None
+
+
+@pytest.mark.anyio
+async def test_backfill_covers_hot_and_archived_assessments(db):
+    packed = pack_events(_events([(True, 300.0), (False, None)]))
+    await db.assessments.insert_one({"id": "hot", "raw_data": {"attention_events": packed}})
+    await db[ARCHIVE_COLLECTION].insert_one({"id": "cold", "raw_data": {"attention_events": packed}})
+
+    assert await backfill_attention_metrics(db) == 2
+    for collection, assessment_id in (("assessments", "hot"), (ARCHIVE_COLLECTION, "cold")):
+        stored = await db[collection].find_one({"id": assessment_id})
+        assert stored["results"]["attention_sdt"]["hits"] == 1
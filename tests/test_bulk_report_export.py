@@ -0,0 +1,147 @@
+"""
+Tests for the clinic-wide bulk PDF export streamed as a ZIP
+"""
+
+import csv
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+import bulk_report_export
+from assessment_service import ARCHIVE_COLLECTION
+from models import BulkReportExportRequest
+
+
+def _assessment(assessment_id, user_id, day, risk_level="Low"):
+    return {
+        "id": assessment_id,
+        "user_id": user_id,
+        "test_date": datetime(2024, 1, day),
+        "overall_score": 80.0,
+        "risk_level": risk_level,
+        "results": {"memory_accuracy": 80.0},
+        "raw_data": {"reaction_trials": b"\x00" * 8},
+    }
+
+
+@pytest.fixture
+async def clinic_db(db):
+    await db.users.insert_many([
+        {"id": "u1", "name": "Ada Lovelace", "email": "ada@example.com", "password_hash": "x", "role": "user"},
+        {"id": "u2", "name": "Alan Turing", "email": "alan@example.com", "password_hash": "x"},
+        {"id": "u3", "name": "Grace Hopper", "email": "grace@example.com", "password_hash": "x"},
+    ])
+    await db.assessments.insert_many([
+        _assessment("u1-new", "u1", 20),
+        _assessment("u1-old", "u1", 10, risk_level="High"),
+        _assessment("u2-hot", "u2", 5),
+    ])
+    await db[ARCHIVE_COLLECTION].insert_many([
+        # Newer than u2's hot assessment (e.g. archived by an earlier policy)
+        _assessment("u2-archived", "u2", 6),
+        _assessment("u3-archived", "u3", 1),
+    ])
+    return db
+
+
+async def _selection(db, **fields):
+    request = BulkReportExportRequest(**fields)
+    return [pair async for pair in bulk_report_export.iter_selection(db, request)]
+
+
+@pytest.mark.anyio
+async def test_latest_assessment_per_patient_across_hot_and_archive(clinic_db):
+    selection = await _selection(clinic_db)
+    assert sorted(assessment["id"] for assessment, _ in selection) == ["u1-new", "u2-archived", "u3-archived"]
+    assert await bulk_report_export.count_selection(clinic_db, BulkReportExportRequest()) == 3
+
+
+@pytest.mark.anyio
+async def test_filters_and_explicit_ids(clinic_db):
+    selection = await _selection(clinic_db, latest_per_patient=False, risk_level="High")
+    assert [assessment["id"] for assessment, _ in selection] == ["u1-old"]
+
+    ids = ["u1-old", "u3-archived"]
+    selection = await _selection(clinic_db, assessment_ids=ids)
+    assert sorted(assessment["id"] for assessment, _ in selection) == ids
+    assert await bulk_report_export.count_selection(clinic_db, BulkReportExportRequest(assessment_ids=ids)) == 2
+
+
+@pytest.mark.anyio
+async def test_selection_loads_only_what_the_report_needs(clinic_db):
+    for assessment, user in await _selection(clinic_db):
+        assert "raw_data" not in assessment
+        assert set(user) <= {"id", "name", "email", "age", "gender"}
+        assert user["name"]
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    """Render in threads: the process pool's behaviour is the same, only slower to start."""
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(bulk_report_export, "_get_pool", lambda: pool)
+    yield pool
+    pool.shutdown()
+
+
+async def _zip(db, request, export):
+    chunks = [chunk async for chunk in bulk_report_export.stream_report_zip(db, request, export)]
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+@pytest.mark.anyio
+async def test_stream_zip_with_manifest_and_failures(clinic_db, thread_pool, monkeypatch):
+    render = bulk_report_export.render_report
+
+    def flaky_render(assessment, user):
+        if assessment["id"] == "u3-archived":
+            raise RuntimeError("font missing")
+        return render(assessment, user)
+
+    monkeypatch.setattr(bulk_report_export, "render_report", flaky_render)
+    request = BulkReportExportRequest()
+    export = await bulk_report_export.start_export(clinic_db, "admin", 3)
+    archive = await _zip(clinic_db, request, export)
+
+    pdfs = [name for name in archive.namelist() if name.endswith(".pdf")]
+    assert sorted(pdfs) == ["Ada_Lovelace_20240120_u1-new.pdf", "Alan_Turing_20240106_u2-archi.pdf"]
+    assert all(archive.read(name).startswith(b"%PDF") for name in pdfs)
+    manifest = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode())))
+    assert {row["assessment_id"]: row["status"] for row in manifest} == {
+        "u1-new": "ok", "u2-archived": "ok", "u3-archived": "failed"
+    }
+
+    stored = await bulk_report_export.get_export(clinic_db, export["id"])
+    assert (stored["status"], stored["rendered"], stored["failed"]) == ("completed", 2, 1)
+
+
+@pytest.mark.anyio
+async def test_cancelled_export_closes_the_archive_early(clinic_db, thread_pool, monkeypatch):
+    monkeypatch.setattr(bulk_report_export, "PROGRESS_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(bulk_report_export, "MAX_IN_FLIGHT", 1)
+    export = await bulk_report_export.start_export(clinic_db, "admin", 3)
+    assert await bulk_report_export.cancel_export(clinic_db, export["id"])
+
+    archive = await _zip(clinic_db, BulkReportExportRequest(), export)
+    assert len(archive.namelist()) == 2  # one report and the manifest
+    assert (await bulk_report_export.get_export(clinic_db, export["id"]))["status"] == "cancelled"
+    assert not await bulk_report_export.cancel_export(clinic_db, export["id"])
+
+
+def test_export_endpoint(client, app_db, login, thread_pool):
+    headers = login("admin@example.com", role="admin")
+    response = client.post("/api/admin/export/reports", headers=headers, json={"risk_level": "High"})
+    assert response.status_code == 404
+
+    client.portal.call(app_db.assessments.insert_one, _assessment("a1", "someone", 1))
+    response = client.post("/api/admin/export/reports", headers=headers, json={})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert len(zipfile.ZipFile(io.BytesIO(response.content)).namelist()) == 2
+
+    export_id = response.headers["x-export-id"]
+    assert client.get(f"/api/admin/export/reports/{export_id}", headers=headers).json()["status"] == "completed"
+    assert client.post("/api/admin/export/reports", headers=login(), json={}).status_code == 403
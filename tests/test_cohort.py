@@ -0,0 +1,109 @@
+"""
+Tests for the clinician cohort overview: care-team paging and hot/archive merging
+"""
+
+from datetime import datetime
+
+import pytest
+
+from assessment_service import ARCHIVE_COLLECTION
+from cohort_service import CARE_TEAM_COLLECTION, cohort_overview, cohort_page_ids, trend_direction
+
+
+def _assessment(assessment_id, user_id, day, score):
+    return {
+        "id": assessment_id,
+        "user_id": user_id,
+        "test_date": datetime(2024, 1, day),
+        "overall_score": score,
+        "risk_level": "Low" if score >= 75 else "Moderate",
+    }
+
+
+def test_trend_direction():
+    assert trend_direction(80, 70) == "improving"
+    assert trend_direction(70, 80) == "declining"
+    assert trend_direction(72, 70) == "stable"
+    assert trend_direction(80, None) is None
+    assert trend_direction(None, 80) is None
+
+
+@pytest.mark.anyio
+async def test_clinicians_page_through_their_care_team(db):
+    await db[CARE_TEAM_COLLECTION].insert_many(
+        [{"clinician_id": "c1", "patient_id": f"p{index}"} for index in range(5)]
+        + [{"clinician_id": "c2", "patient_id": "other"}]
+    )
+    clinician = {"id": "c1", "role": "clinician"}
+
+    page, cursor = await cohort_page_ids(db, clinician, None, None, 2)
+    assert (page, cursor) == (["p0", "p1"], "p1")
+    page, cursor = await cohort_page_ids(db, clinician, None, cursor, 2)
+    assert (page, cursor) == (["p2", "p3"], "p3")
+    page, cursor = await cohort_page_ids(db, clinician, None, cursor, 2)
+    assert (page, cursor) == (["p4"], None)
+
+    # Explicit ids are narrowed to the care team
+    page, _ = await cohort_page_ids(db, clinician, ["p3", "other", "p1"], None, 10)
+    assert page == ["p1", "p3"]
+
+
+@pytest.mark.anyio
+async def test_admins_may_ask_for_any_patients(db):
+    admin = {"id": "a1", "role": "admin"}
+    page, cursor = await cohort_page_ids(db, admin, ["z", "x", "y", "x"], None, 2)
+    assert (page, cursor) == (["x", "y"], "y")
+    assert await cohort_page_ids(db, admin, ["z", "x", "y"], cursor, 2) == (["z"], None)
+    # Without explicit ids an admin sees their own care team, here empty
+    assert await cohort_page_ids(db, admin, None, None, 2) == ([], None)
+
+
+@pytest.mark.anyio
+async def test_overview_merges_hot_and_archived_assessments(db):
+    await db.users.insert_one({"id": "p1", "name": "Pat One"})
+    await db.assessments.insert_many([_assessment("h1", "p1", 20, 60.0)])
+    await db[ARCHIVE_COLLECTION].insert_many([
+        _assessment("old1", "p1", 1, 90.0),
+        _assessment("old2", "p1", 10, 80.0),
+    ])
+    await db[ARCHIVE_COLLECTION].insert_one(_assessment("only", "p2", 3, 70.0))
+
+    overview = await cohort_overview(db, ["p2", "p1", "p3"])
+    assert [patient["patient_id"] for patient in overview] == ["p2", "p1", "p3"]
+
+    archived_only, merged, unknown = overview
+    assert merged["name"] == "Pat One"
+    assert merged["assessment_count"] == 3
+    assert merged["latest"]["id"] == "h1"
+    # The previous score is the archive's newest, not the archive's oldest
+    assert merged["previous_score"] == 80.0
+    assert merged["trend"] == "declining"
+
+    assert (archived_only["assessment_count"], archived_only["latest"]["id"]) == (1, "only")
+    assert archived_only["previous_score"] is None and archived_only["trend"] is None
+    assert unknown == {
+        "patient_id": "p3", "name": None, "latest": None,
+        "previous_score": None, "assessment_count": 0, "trend": None,
+    }
+
+
+def test_cohort_endpoint_is_scoped_to_the_care_team(client, app_db, login):
+    patient_headers = login()
+    patient_id = client.get("/api/auth/me", headers=patient_headers).json()["id"]
+    client.post("/api/assessments/save", headers=patient_headers, json={"results": {"memory_accuracy": 80}})
+
+    clinician_headers = login("clinician@example.com", name="Dr Test", role="clinician")
+    clinician_id = client.get("/api/auth/me", headers=clinician_headers).json()["id"]
+    assert client.post("/api/clinician/cohort", headers=patient_headers, json={}).status_code == 403
+    assert client.post("/api/clinician/cohort", headers=clinician_headers, json={}).json() == {
+        "patients": [], "next_cursor": None
+    }
+
+    client.portal.call(app_db[CARE_TEAM_COLLECTION].insert_one, {"clinician_id": clinician_id, "patient_id": patient_id})
+    response = client.post("/api/clinician/cohort", headers=clinician_headers, json={"limit": 10})
+    assert response.status_code == 200
+    [patient] = response.json()["patients"]
+    assert patient["patient_id"] == patient_id
+    assert patient["name"] == "Test Patient"
+    assert patient["assessment_count"] == 1
+    assert patient["latest"]["overall_score"] == 80
@@ -0,0 +1,116 @@
+"""
+Tests for size-aware response compression
+"""
+
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware, choose_encoding
+
+LARGE = {"assessments": [{"id": f"a{i}", "overall_score": 72.5, "risk_level": "Low"} for i in range(200)]}
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("identity", None),
+    ("", None),
+    ("gzip;q=0", None),
+    ("*", next(iter(compression.ENCODINGS))),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("GZIP;q=bad, gzip", "gzip"),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_client_preference_wins_over_server_order(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", {"zstd": None, "br": None, "gzip": None})
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+    assert choose_encoding("gzip, br, zstd") == "zstd"
+
+
+@pytest.fixture
+def app_client():
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(LARGE, headers={"ETag": '"v1"'})
+
+    @app.get("/weak")
+    def weak():
+        return JSONResponse(LARGE, headers={"ETag": 'W/"v1"'})
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/pdf")
+    def pdf():
+        return Response(b"%PDF" + b"0" * 5000, media_type="application/pdf")
+
+    @app.get("/no-transform")
+    def no_transform():
+        return JSONResponse(LARGE, headers={"Cache-Control": "no-transform"})
+
+    @app.get("/not-modified")
+    def not_modified():
+        return Response(status_code=304, headers={"ETag": 'W/"v1"'})
+
+    @app.get("/stream")
+    def stream():
+        lines = (json.dumps({"line": i}).encode() + b"\n" for i in range(500))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, thread_threshold=4096)
+    return TestClient(app)
+
+
+def test_large_json_is_compressed(app_client):
+    response = app_client.get("/large", headers=GZIP)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(json.dumps(LARGE))
+    assert response.json() == LARGE
+
+
+def test_strong_etag_is_weakened_and_weak_kept(app_client):
+    assert app_client.get("/large", headers=GZIP).headers["etag"] == 'W/"v1"'
+    assert app_client.get("/weak", headers=GZIP).headers["etag"] == 'W/"v1"'
+    assert app_client.get("/large", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"v1"'
+
+
+@pytest.mark.parametrize("path", ["/small", "/pdf", "/no-transform", "/not-modified"])
+def test_passthrough(app_client, path):
+    response = app_client.get(path, headers=GZIP)
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_ndjson_is_compressed_chunk_by_chunk(app_client):
+    with app_client.stream("GET", "/stream", headers=GZIP) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert [json.loads(line)["line"] for line in lines] == list(range(500))
+
+
+def test_api_etag_is_the_same_on_compressed_200_and_304(client, login):
+    headers = {**login(), **GZIP}
+    for _ in range(30):
+        client.post("/api/assessments/save", headers=headers, json={"results": {"memory_accuracy": 80}})
+    response = client.get("/api/assessments/history", headers=headers, params={"limit": 30})
+    assert response.headers["content-encoding"] == "gzip"
+    revalidated = client.get(
+        "/api/assessments/history", params={"limit": 30},
+        headers={**headers, "If-None-Match": response.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == response.headers["etag"]
@@ -0,0 +1,130 @@
+"""
+Tests for per-patient assessment summaries and the ETags built from them
+"""
+
+from datetime import datetime
+
+import pytest
+
+from assessment_service import (
+    ARCHIVE_COLLECTION, SUMMARIES_COLLECTION, get_summary, invalidate_summaries, record_new_assessments,
+)
+
+
+def _assessment(assessment_id, user_id, day):
+    return {"id": assessment_id, "user_id": user_id, "test_date": datetime(2024, 1, day)}
+
+
+async def _insert(db, *assessments):
+    await db.assessments.insert_many([dict(assessment) for assessment in assessments])
+    await record_new_assessments(db, assessments)
+
+
+@pytest.mark.anyio
+async def test_summaries_count_and_track_the_newest_assessment(db):
+    await _insert(db, _assessment("a1", "u1", 5), _assessment("a2", "u1", 9), _assessment("b1", "u2", 1))
+    first = await get_summary(db, "u1")
+    assert (first["count"], first["latest_id"]) == (2, "a2")
+    assert (await get_summary(db, "u2"))["count"] == 1
+
+    # An older assessment (e.g. imported) counts but does not become the latest
+    await _insert(db, _assessment("a0", "u1", 1))
+    summary = await get_summary(db, "u1")
+    assert (summary["count"], summary["latest_id"]) == (3, "a2")
+    assert summary["version"] > first["version"]
+
+
+@pytest.mark.anyio
+async def test_missing_summary_is_rebuilt_from_hot_and_archived_assessments(db):
+    # Saved before summaries existed
+    await db.assessments.insert_one(_assessment("a1", "u1", 5))
+    await db[ARCHIVE_COLLECTION].insert_one(_assessment("old", "u1", 1))
+
+    await _insert(db, _assessment("a2", "u1", 3))
+    summary = await db[SUMMARIES_COLLECTION].find_one({"user_id": "u1"})
+    assert (summary["count"], summary["latest_id"]) == (3, "a1")
+
+
+@pytest.mark.anyio
+async def test_get_summary_builds_on_first_use(db):
+    await db.assessments.insert_one(_assessment("a1", "u1", 5))
+    assert (await get_summary(db, "u1"))["count"] == 1
+    assert (await get_summary(db, "nobody"))["count"] == 0
+
+
+def _save(client, headers, score=80):
+    return client.post("/api/assessments/save", headers=headers, json={"results": {"memory_accuracy": score}}).json()
+
+
+def test_latest_revalidates_with_304(client, login):
+    headers = login()
+    assert client.get("/api/assessments/latest", headers=headers).status_code == 404
+    _save(client, headers)
+
+    response = client.get("/api/assessments/latest", headers=headers)
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    for validator in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        revalidated = client.get("/api/assessments/latest", headers={**headers, "If-None-Match": validator})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+        assert revalidated.content == b""
+
+    newest = _save(client, headers, score=40)
+    changed = client.get("/api/assessments/latest", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["id"] == newest["id"]
+    assert changed.headers["etag"] != etag
+
+
+def test_history_etag_covers_the_page(client, login):
+    headers = login()
+    for _ in range(3):
+        _save(client, headers)
+    first_page = client.get("/api/assessments/history", headers=headers, params={"limit": 2})
+    second_page = client.get("/api/assessments/history", headers=headers, params={"limit": 2, "skip": 2})
+    assert first_page.headers["etag"] != second_page.headers["etag"]
+    assert len(second_page.json()["assessments"]) == 1
+
+    revalidated = client.get(
+        "/api/assessments/history", params={"limit": 2},
+        headers={**headers, "If-None-Match": first_page.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_backfills_invalidate_cached_responses(client, app_db, login):
+    headers = login()
+    assessment = _save(client, headers)
+    share = client.post(f"/api/assessments/{assessment['id']}/share", headers=headers).json()
+    shared_url = f"/api/reports/shared/{share['share_token']}"
+
+    latest_etag = client.get("/api/assessments/latest", headers=headers).headers["etag"]
+    shared = client.get(shared_url)
+    assert shared.json()["patient_name"] == "Test Patient"
+    assert client.get(shared_url, headers={"If-None-Match": shared.headers["etag"]}).status_code == 304
+
+    client.portal.call(invalidate_summaries, app_db)
+    assert client.get("/api/assessments/latest", headers={**headers, "If-None-Match": latest_etag}).status_code == 200
+    assert client.get(shared_url, headers={"If-None-Match": shared.headers["etag"]}).status_code == 200
+
+
+def test_shared_report_revalidation_is_not_an_access(client, app_db, login):
+    headers = login()
+    assessment = _save(client, headers)
+    token = client.post(f"/api/assessments/{assessment['id']}/share", headers=headers).json()["share_token"]
+    shared_url = f"/api/reports/shared/{token}"
+
+    etag = client.get(shared_url).headers["etag"]
+    for _ in range(3):
+        assert client.get(shared_url, headers={"If-None-Match": etag}).status_code == 304
+    link = client.portal.call(app_db.share_links.find_one, {"token": token})
+    assert link["accessed_count"] == 1
+
+    assert client.get("/api/reports/shared/no-such-token").status_code == 404
+    client.portal.call(
+        app_db.share_links.update_one, {"token": token}, {"$set": {"expires_at": datetime(2000, 1, 1)}}
+    )
+    assert client.get(shared_url, headers={"If-None-Match": etag}).status_code == 410
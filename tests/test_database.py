@@ -0,0 +1,84 @@
+"""
+Tests for the lifespan-managed database and the get_db dependency
+"""
+
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "25")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "500")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd, zlib")
+    options = database.DatabaseSettings.from_env().client_options()
+    assert options["maxPoolSize"] == 25
+    assert options["waitQueueTimeoutMS"] == 500
+    assert options["compressors"] == "zstd,zlib"
+    assert "socketTimeoutMS" not in options
+
+
+@pytest.mark.anyio
+async def test_close_waits_for_in_flight_requests(monkeypatch):
+    """Shutdown drains requests still holding the database before closing"""
+    monkeypatch.setattr(database, "create_client", lambda settings: AsyncMongoMockClient())
+    state = database.DatabaseState(database.DatabaseSettings("mongodb://unused", "test"))
+    state.acquire()
+    closing = asyncio.create_task(state.close())
+    await asyncio.sleep(0.01)
+    assert not closing.done()
+    state.release()
+    await asyncio.wait_for(closing, 1)
+
+
+@pytest.mark.anyio
+async def test_close_gives_up_after_grace_period(monkeypatch):
+    monkeypatch.setattr(database, "create_client", lambda settings: AsyncMongoMockClient())
+    settings = database.DatabaseSettings("mongodb://unused", "test", shutdown_grace_seconds=0.01)
+    state = database.DatabaseState(settings)
+    state.acquire()
+    await asyncio.wait_for(state.close(), 1)
+    assert state.in_flight == 1
+
+
+def test_requests_use_the_lifespan_database(client, app_db, login):
+    """Handlers read the database opened by the lifespan, and release it"""
+    headers = login()
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "patient@example.com"
+    assert client.app.state.database.in_flight == 0
+    assert client.portal.call(app_db.users.count_documents, {}) == 1
+
+
+def test_indexes_are_created_on_startup(client, app_db):
+    indexes = client.portal.call(app_db.assessments.index_information)
+    assert any(index["key"] == [("id", 1)] and index.get("unique") for index in indexes.values())
+
+
+def test_streamed_responses_count_until_the_body_is_sent(monkeypatch):
+    """The drain covers streaming bodies, which outlive yield dependencies"""
+    monkeypatch.setattr(database, "create_client", lambda settings: AsyncMongoMockClient())
+    app = FastAPI()
+    app.state.database = state = database.DatabaseState(database.DatabaseSettings("mongodb://unused", "test"))
+    seen = []
+
+    @app.get("/stream")
+    async def stream(db=Depends(database.get_db)):
+        async def body():
+            for _ in range(3):
+                seen.append(state.in_flight)
+                yield b"chunk\n"
+        return StreamingResponse(body())
+
+    app.add_middleware(database.InFlightMiddleware)
+    with TestClient(app) as test_client:
+        assert test_client.get("/stream").text == "chunk\n" * 3
+    assert seen == [1, 1, 1]
+    assert state.in_flight == 0
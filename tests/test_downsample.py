@@ -0,0 +1,83 @@
+"""
+Tests for LTTB downsampling and the longitudinal report charts built on it
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import pdf_service
+from downsample import lttb
+
+
+def _reference_lttb(x, y, threshold):
+    """Textbook LTTB, one point at a time, for comparison."""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(np.floor(bucket * every)) + 1
+        end = int(np.floor((bucket + 1) * every)) + 1
+        next_end = min(int(np.floor((bucket + 2) * every)) + 1, n)
+        if bucket == threshold - 3:
+            end, next_start, next_end = n - 1, n - 1, n
+        else:
+            next_start = end
+        mean_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        mean_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs((x[previous] - mean_x) * (y[index] - y[previous])
+                       - (x[previous] - x[index]) * (mean_y - y[previous]))
+            if area > best_area:
+                best, best_area = index, area
+        kept.append(best)
+        previous = best
+    kept.append(n - 1)
+    return kept
+
+
+def test_matches_the_reference_algorithm():
+    generator = np.random.default_rng(3)
+    x = np.cumsum(generator.uniform(0.5, 40, 1000))
+    y = generator.normal(70, 12, 1000)
+    for threshold in (3, 10, 60, 999):
+        kept = _reference_lttb(x.tolist(), y.tolist(), threshold)
+        xs, ys = lttb(x, y, threshold)
+        np.testing.assert_array_equal(xs, x[kept])
+        np.testing.assert_array_equal(ys, y[kept])
+
+
+def test_keeps_endpoints_order_and_peaks():
+    x = np.arange(500, dtype=float)
+    y = np.full(500, 70.0)
+    y[123], y[377] = 5.0, 99.0
+    xs, ys = lttb(x, y, 20)
+    assert len(xs) == 20
+    assert xs[0] == 0 and xs[-1] == 499
+    assert np.all(np.diff(xs) > 0)
+    assert 5.0 in ys and 99.0 in ys
+
+
+def test_short_series_are_unchanged():
+    xs, ys = lttb([1, 2, 3], [4, 5, 6], 60)
+    assert xs.tolist() == [1, 2, 3] and ys.tolist() == [4, 5, 6]
+    xs, _ = lttb(range(10), range(10), 2)
+    assert len(xs) == 10
+
+
+def test_history_report_over_many_assessments():
+    started = datetime(2015, 1, 1)
+    assessments = [
+        {
+            "id": f"a{i}",
+            "test_date": started + timedelta(days=3 * i),
+            "overall_score": 60 + 30 * np.sin(i / 20),
+            "risk_level": "Moderate",
+            "results": {"memory_accuracy": 70.0, "attention_accuracy": 65.0, "reaction_avg_time": 350.0 + i % 50},
+        }
+        for i in range(1500)
+    ]
+    pdf = pdf_service.generate_history_pdf(assessments, {"name": "Test Patient", "email": "p@example.com"})
+    assert pdf.getvalue().startswith(b"%PDF")
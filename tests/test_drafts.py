@@ -0,0 +1,79 @@
+"""
+Tests for per-step assessment autosave into drafts
+"""
+
+import pytest
+
+from assessment_service import draft_step_update, step_fields
+from models import AssessmentResult
+
+
+def test_step_fields_exclude_server_computed_statistics():
+    assert "reaction_trials" in step_fields("reaction")
+    assert "reaction_stats" not in step_fields("reaction")
+    assert "attention_sdt" not in step_fields("attention")
+    assert not step_fields("memory") & step_fields("attention")
+
+
+def test_step_update_writes_only_the_steps_own_fields():
+    update = draft_step_update("memory", AssessmentResult(memory_accuracy=80, memory_correct=8))
+    assert set(update["$set"]) == {"results.memory_accuracy", "results.memory_correct", "updated_at", "expires_at"}
+    assert update["$addToSet"] == {"steps_completed": "memory"}
+
+    with pytest.raises(ValueError, match="attention_accuracy"):
+        draft_step_update("memory", AssessmentResult(memory_accuracy=80, attention_accuracy=50))
+    with pytest.raises(ValueError):
+        draft_step_update("reaction", AssessmentResult(reaction_stats={"median_ms": 1}))
+
+
+def _draft(client, headers):
+    response = client.post("/api/assessments/drafts", headers=headers)
+    assert response.status_code == 201
+    return f"/api/assessments/drafts/{response.json()['id']}"
+
+
+def test_steps_are_saved_independently(client, app_db, login):
+    headers = login()
+    draft = _draft(client, headers)
+
+    assert client.put(f"{draft}/steps/memory", headers=headers, json={"memory_accuracy": 60}).status_code == 200
+    response = client.put(f"{draft}/steps/attention", headers=headers, json={"attention_accuracy": 90})
+    assert sorted(response.json()["steps_completed"]) == ["attention", "memory"]
+    # Retrying a step only rewrites that step
+    client.put(f"{draft}/steps/memory", headers=headers, json={"memory_accuracy": 70})
+
+    draft_id = draft.rsplit("/", 1)[1]
+    stored = client.portal.call(app_db.assessment_drafts.find_one, {"id": draft_id})
+    assert stored["results"] == {"memory_accuracy": 70, "attention_accuracy": 90}
+    assert client.get(draft, headers=headers).json()["steps_completed"].count("memory") == 1
+
+
+def test_step_errors(client, login):
+    headers = login()
+    draft = _draft(client, headers)
+    assert client.put(f"{draft}/steps/typing", headers=headers, json={}).status_code == 404
+    response = client.put(f"{draft}/steps/memory", headers=headers, json={"attention_accuracy": 90})
+    assert response.status_code == 422
+    other = login("other@example.com")
+    assert client.put(f"{draft}/steps/memory", headers=other, json={"memory_accuracy": 1}).status_code == 404
+    assert client.get(draft, headers=other).status_code == 404
+
+
+def test_finalize_is_idempotent(client, app_db, login):
+    headers = login()
+    draft = _draft(client, headers)
+    client.put(f"{draft}/steps/memory", headers=headers, json={"memory_accuracy": 80})
+    client.put(f"{draft}/steps/reaction", headers=headers, json={"reaction_trials": [300, 320, 340]})
+
+    first = client.post(f"{draft}/finalize", headers=headers)
+    assert first.status_code == 200
+    assessment = first.json()
+    assert assessment["id"] == draft.rsplit("/", 1)[1]
+    assert assessment["overall_score"] == 80
+    assert assessment["results"]["reaction_stats"]["median_ms"] == 320
+
+    # A retry after a lost response returns the same assessment
+    assert client.post(f"{draft}/finalize", headers=headers).json()["id"] == assessment["id"]
+    assert client.portal.call(app_db.assessments.count_documents, {}) == 1
+    assert client.get(draft, headers=headers).status_code == 404
+    assert client.post(f"{draft}/finalize", headers=login("other@example.com")).status_code == 404
@@ -0,0 +1,108 @@
+"""
+Tests for the streaming CSV/Parquet research export
+"""
+
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+import export_service
+from assessment_service import ARCHIVE_COLLECTION
+
+
+def _assessment(assessment_id, user_id, day, risk_level="Low"):
+    return {
+        "id": assessment_id,
+        "user_id": user_id,
+        "test_date": datetime(2024, 1, day, 14, 5),
+        "overall_score": 80.0,
+        "risk_level": risk_level,
+        "results": {"memory_accuracy": 80.0, "reaction_stats": {"median_ms": 320.0}},
+        "raw_data": {"reaction_trials": b"\x00\x00\x00\x00"},
+    }
+
+
+async def _collect(batches):
+    return [row async for batch in batches for row in batch]
+
+
+async def _read(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+def test_flatten_pseudonymises_and_flattens():
+    columns = export_service.export_columns()
+    row = export_service.flatten_assessment(_assessment("a1", "u1", 2), columns)
+    assert row["patient_id"] == export_service.pseudonymise("u1")
+    assert "u1" not in row.values() and "a1" not in row.values()
+    assert row["test_date"] == datetime(2024, 1, 2).date()
+    assert row["results.memory_accuracy"] == 80.0
+    assert row["results.reaction_stats"] == '{"median_ms":320.0}'
+    assert "results.speech_data" not in row
+    assert not any(name == "results.reaction_trials" for name, _ in columns)
+
+
+@pytest.mark.anyio
+async def test_batches_cover_archive_then_hot_with_filters(db):
+    await db[ARCHIVE_COLLECTION].insert_one(_assessment("old", "u1", 1))
+    await db.assessments.insert_many([
+        _assessment("a2", "u2", 3),
+        _assessment("a3", "u1", 4, risk_level="High"),
+        _assessment("a4", "u1", 20),
+    ])
+    await db.users.insert_many([
+        {"id": "u1", "preferred_language": "en"},
+        {"id": "u2", "preferred_language": "es"},
+    ])
+
+    query = await export_service.build_export_query(
+        db, start=datetime(2024, 1, 1), end=datetime(2024, 1, 10), language="en"
+    )
+    rows = await _collect(export_service.iter_export_batches(db, query, batch_size=1))
+    assert [row["assessment_id"] for row in rows] == [export_service.pseudonymise(i) for i in ("old", "a3")]
+
+    query = await export_service.build_export_query(db, risk_level="High")
+    rows = await _collect(export_service.iter_export_batches(db, query))
+    assert [row["assessment_id"] for row in rows] == [export_service.pseudonymise("a3")]
+
+
+@pytest.mark.anyio
+async def test_csv_stream(db):
+    await db.assessments.insert_many([_assessment("a1", "u1", 1), _assessment("a2", "u1", 2)])
+    batches = export_service.iter_export_batches(db, {}, batch_size=1)
+    reader = csv.DictReader(io.StringIO((await _read(export_service.stream_csv(batches))).decode()))
+    assert reader.fieldnames == [name for name, _ in export_service.export_columns()]
+    assert [row["test_date"] for row in reader] == ["2024-01-01", "2024-01-02"]
+
+
+@pytest.mark.anyio
+async def test_parquet_stream_writes_one_row_group_per_batch():
+    pq = pytest.importorskip("pyarrow.parquet")
+    columns = export_service.export_columns()
+
+    async def batches():
+        yield [export_service.flatten_assessment(_assessment(f"a{day}", "u1", day), columns) for day in (1, 2)]
+        yield [export_service.flatten_assessment(_assessment("a3", "u1", 3), columns)]
+
+    parquet = pq.ParquetFile(io.BytesIO(await _read(export_service.stream_parquet(batches()))))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.num_rows == 3
+    assert table.schema.field("overall_score").type == "double"
+
+
+def test_export_requires_admin(client, login):
+    response = client.get("/api/admin/export/assessments", headers=login())
+    assert response.status_code == 403
+
+
+def test_admin_export_endpoint(client, app_db, login):
+    headers = login("admin@example.com", role="admin")
+    client.portal.call(app_db.assessments.insert_one, _assessment("a1", "u1", 1))
+    response = client.get("/api/admin/export/assessments", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    assert len(response.text.strip().splitlines()) == 2
@@ -0,0 +1,97 @@
+"""
+Tests for Range parsing and Range-capable file responses
+"""
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from file_responses import RangeFileResponse, parse_byte_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("BYTES = 5-5", (5, 5)),
+    ("bytes=1000-", None),
+    ("bytes=2000-3000", None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["items=0-5", "bytes=0-5,10-20", "bytes=-", "bytes=9-3", "bytes=a-b"])
+def test_malformed_ranges_are_ignored(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, 1000)
+
+
+@pytest.fixture
+def file_client(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(bytes(range(256)) * 1024)
+    app = FastAPI()
+
+    @app.api_route("/file", methods=["GET", "HEAD"])
+    def serve(request: Request):
+        return RangeFileResponse(str(path), request.headers, filename="report.pdf", media_type="application/pdf")
+
+    return TestClient(app), path.read_bytes()
+
+
+def test_whole_file(file_client):
+    client, content = file_client
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(content))
+
+
+def test_partial_content_across_chunks(file_client):
+    client, content = file_client
+    start, end = 1000, 200_000
+    response = client.get("/file", headers={"Range": f"bytes={start}-{end}"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(content)}"
+    assert response.content == content[start:end + 1]
+
+
+def test_unsatisfiable_range(file_client):
+    client, content = file_client
+    response = client.get("/file", headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+    assert response.content == b""
+
+
+def test_if_range_resumes_only_the_same_file(file_client):
+    client, content = file_client
+    etag = client.head("/file").headers["etag"]
+    resumed = client.get("/file", headers={"Range": "bytes=-10", "If-Range": etag})
+    assert resumed.status_code == 206 and resumed.content == content[-10:]
+    changed = client.get("/file", headers={"Range": "bytes=-10", "If-Range": '"another-version"'})
+    assert changed.status_code == 200 and changed.content == content
+
+
+def test_head_sends_no_body(file_client):
+    client, _ = file_client
+    response = client.head("/file", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "10"
+    assert response.content == b""
+
+
+def test_assessment_pdf_supports_ranges(client, login):
+    headers = login()
+    assessment = client.post("/api/assessments/save", headers=headers, json={"results": {"memory_accuracy": 80}}).json()
+    url = f"/api/assessments/{assessment['id']}/pdf"
+    whole = client.get(url, headers=headers)
+    assert whole.status_code == 200 and whole.content.startswith(b"%PDF")
+
+    tail = client.get(url, headers={**headers, "Range": "bytes=-64", "If-Range": whole.headers["etag"]})
+    assert tail.status_code == 206
+    assert tail.content == whole.content[-64:]
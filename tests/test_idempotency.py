@@ -0,0 +1,107 @@
+"""
+Tests for Idempotency-Key handling on assessment saves and share links
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import idempotency
+
+SAVE_URL = "/api/assessments/save"
+BODY = json.dumps({"results": {"memory_accuracy": 80}}).encode()
+
+
+def _save(client, headers, key, body=BODY):
+    return client.post(
+        SAVE_URL, content=body,
+        headers={**headers, "Content-Type": "application/json", "Idempotency-Key": key}
+    )
+
+
+def _claim(client, app_db, headers, key, locked_until):
+    """Store an in-progress claim, as left by a request still running (or dead)."""
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    client.portal.call(app_db[idempotency.COLLECTION].insert_one, {
+        "key": f"{user_id}:POST:{SAVE_URL}:{key}",
+        "route": SAVE_URL,
+        "request_hash": idempotency.request_fingerprint(SAVE_URL, b"", BODY),
+        "status": "in_progress",
+        "locked_until": locked_until,
+        "expires_at": datetime.utcnow() + timedelta(hours=1),
+    })
+
+
+def test_retry_replays_the_stored_response(client, app_db, login):
+    headers = login()
+    first = _save(client, headers, "save-1")
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    retry = _save(client, headers, "save-1")
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert client.portal.call(app_db.assessments.count_documents, {}) == 1
+
+    # Keys are scoped per user
+    assert _save(client, login("other@example.com"), "save-1").json()["id"] != first.json()["id"]
+
+
+def test_key_reused_for_a_different_body(client, login):
+    headers = login()
+    _save(client, headers, "save-1")
+    response = _save(client, headers, "save-1", json.dumps({"results": {"memory_accuracy": 10}}).encode())
+    assert response.status_code == 422
+
+
+def test_concurrent_retry_gets_409(client, app_db, login):
+    headers = login()
+    _claim(client, app_db, headers, "save-1", datetime.utcnow() + timedelta(minutes=1))
+    response = _save(client, headers, "save-1")
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "1"
+    assert client.portal.call(app_db.assessments.count_documents, {}) == 0
+
+
+def test_abandoned_claim_is_taken_over(client, app_db, login):
+    headers = login()
+    _claim(client, app_db, headers, "save-1", datetime.utcnow() - timedelta(seconds=1))
+    response = _save(client, headers, "save-1")
+    assert response.status_code == 200
+    assert _save(client, headers, "save-1").headers["idempotent-replayed"] == "true"
+
+
+def test_failed_attempt_releases_the_key(client, app_db, login):
+    headers = login()
+    bad = json.dumps({"results": {"speech_data": "not base64!"}}).encode()
+    assert _save(client, headers, "save-1", bad).status_code == 422
+    assert client.portal.call(app_db[idempotency.COLLECTION].count_documents, {}) == 0
+    assert _save(client, headers, "save-1").status_code == 200
+
+
+def test_overlong_key(client, login):
+    assert _save(client, login(), "k" * 256).status_code == 400
+
+
+def test_share_link_creation(client, login):
+    headers = login()
+    assessment = _save(client, headers, "save-1").json()
+    url = f"/api/assessments/{assessment['id']}/share"
+    first = client.post(url, headers={**headers, "Idempotency-Key": "share-1"})
+    retry = client.post(url, headers={**headers, "Idempotency-Key": "share-1"})
+    assert first.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json()["share_token"] == first.json()["share_token"]
+
+
+def test_share_key_reused_for_another_assessment_or_query(client, login):
+    headers = {**login(), "Idempotency-Key": "share-1"}
+    first = _save(client, headers, "save-1").json()
+    second = _save(client, headers, "save-2").json()
+    assert client.post(f"/api/assessments/{first['id']}/share", headers=headers).status_code == 200
+
+    # Same route template and empty body, but a different report: never the first link
+    response = client.post(f"/api/assessments/{second['id']}/share", headers=headers)
+    assert response.status_code == 422
+    response = client.post(f"/api/assessments/{first['id']}/share?expires_hours=1", headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,110 @@
+"""
+Tests for bulk import of historical assessments
+"""
+
+import io
+import json
+
+import pytest
+
+import import_service
+from assessment_service import get_summary
+from database import ensure_collections
+
+
+def _ndjson(rows):
+    return io.StringIO("".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows))
+
+
+ROWS = [
+    {"user_id": "u1", "test_date": "2023-05-01T10:00:00Z", "results": {"memory_accuracy": 80, "attention_accuracy": 70}},
+    {"email": "patient@example.com", "test_date": "2023-06-01T10:00:00", "memory_accuracy": 40},
+    {"user_id": "u1", "test_date": "not a date", "results": {}},
+    "{broken json",
+    {"email": "nobody@example.com", "test_date": "2023-06-01T10:00:00", "results": {}},
+]
+
+
+@pytest.fixture
+async def import_db(db):
+    await ensure_collections(db)
+    await db.users.insert_one({"id": "u2", "email": "patient@example.com"})
+    return db
+
+
+@pytest.mark.anyio
+async def test_ndjson_import_scores_rows_and_reports_errors(import_db):
+    db = import_db
+    stats = await import_service.import_assessments(db, _ndjson(ROWS), "ndjson", source="test.ndjson", batch_size=2)
+    assert (stats.read, stats.inserted, stats.invalid) == (5, 2, 3)
+    assert [error["line"] for error in stats.errors] == [3, 4, 5]
+
+    scored = await db.assessments.find_one({"user_id": "u1"})
+    assert scored["overall_score"] == 75
+    assert scored["risk_level"] == "Low"
+    # Timezone-aware dates are stored as naive UTC
+    assert scored["test_date"].tzinfo is None
+    by_email = await db.assessments.find_one({"user_id": "u2"})
+    assert by_email["results"]["memory_accuracy"] == 40
+    assert by_email["risk_level"] == "High"
+    assert (await get_summary(db, "u1"))["count"] == 1
+
+
+@pytest.mark.anyio
+async def test_reimport_counts_duplicates(import_db):
+    db = import_db
+    await import_service.import_assessments(db, _ndjson(ROWS[:2]), "ndjson", source="a")
+    stats = await import_service.import_assessments(db, _ndjson(ROWS[:2]), "ndjson", source="a")
+    assert (stats.inserted, stats.duplicates) == (0, 2)
+    assert await db.assessments.count_documents({}) == 2
+
+
+@pytest.mark.anyio
+async def test_csv_import(import_db):
+    db = import_db
+    text = (
+        "user_id,test_date,results.memory_accuracy,attention_accuracy,memory_items\n"
+        'u1,2023-05-01T10:00:00,90,,"[{""item_id"": ""apple"", ""correct"": true}]"\n'
+    )
+    stats = await import_service.import_assessments(db, io.StringIO(text), "csv", source="a.csv")
+    assert stats.inserted == 1
+    stored = await db.assessments.find_one({})
+    assert stored["results"]["memory_accuracy"] == 90
+    assert stored["results"]["attention_accuracy"] is None
+    assert stored["raw_data"]["memory_items"][0]["item_id"] == "apple"
+
+
+@pytest.mark.anyio
+async def test_resume_from_checkpoint(import_db, tmp_path):
+    db = import_db
+    checkpoint = tmp_path / "import.checkpoint"
+    await import_service.import_assessments(
+        db, _ndjson(ROWS[:1]), "ndjson", source="big.ndjson", checkpoint_path=checkpoint
+    )
+    assert json.loads(checkpoint.read_text())["line"] == 1
+
+    stats = await import_service.import_assessments(
+        db, _ndjson(ROWS[:2]), "ndjson", source="big.ndjson", checkpoint_path=checkpoint, resume=True
+    )
+    assert (stats.skipped, stats.inserted, stats.duplicates) == (1, 1, 0)
+
+    with pytest.raises(ValueError):
+        import_service.Checkpoint(checkpoint, "other.ndjson").load()
+
+
+@pytest.mark.anyio
+async def test_non_object_rows_are_reported_not_fatal(import_db):
+    db = import_db
+    rows = ["[1, 2]", '"x"', "null", {"user_id": "u1", "results": [1]}, ROWS[0]]
+    stats = await import_service.import_assessments(db, _ndjson(rows), "ndjson", source="odd.ndjson")
+    assert (stats.read, stats.inserted, stats.invalid) == (5, 1, 4)
+    assert [error["line"] for error in stats.errors] == [1, 2, 3, 4]
+
+    text = 'user_id,test_date,results\nu1,2023-05-01T10:00:00,"[1, 2]"\n'
+    [(line, error)] = import_service.iter_rows(io.StringIO(text), "csv")
+    assert isinstance(error, ValueError)
+
+
+def test_format_for():
+    assert import_service.format_for("EXPORT.CSV") == "csv"
+    assert import_service.format_for("export.jsonl") == "ndjson"
@@ -0,0 +1,67 @@
+"""
+Tests for the memory item analysis (difficulty, discrimination, distractors)
+"""
+
+import numpy as np
+import pytest
+
+from assessment_service import ARCHIVE_COLLECTION
+from item_analysis import STATS_COLLECTION, run_item_analysis
+
+# One row per assessment: (item_id, correct, response) for three items
+RESPONSES = [
+    [("apple", True, "apple"), ("clock", True, "clock"), ("river", False, "lake")],
+    [("apple", True, "apple"), ("clock", False, "watch"), ("river", False, "lake")],
+    [("apple", True, "apple"), ("clock", True, "clock"), ("river", True, "river")],
+    [("apple", False, "pear"), ("clock", False, "watch"), ("river", False, "stream")],
+    [("apple", True, "apple"), ("clock", True, "clock"), ("river", True, "river")],
+]
+
+
+def _assessment(index, row):
+    items = [{"item_id": item_id, "correct": correct, "response": response} for item_id, correct, response in row]
+    return {"id": f"a{index}", "raw_data": {"memory_items": items}}
+
+
+def _expected_discrimination(item_index):
+    """Correlation of an item with the proportion correct on the other items."""
+    correct = np.array([[c for _, c, _ in row] for row in RESPONSES], dtype=float)
+    rest = (correct.sum(axis=1) - correct[:, item_index]) / (correct.shape[1] - 1)
+    return np.corrcoef(correct[:, item_index], rest)[0, 1]
+
+
+@pytest.mark.anyio
+async def test_item_statistics_across_hot_and_archived_assessments(db):
+    await db.assessments.insert_many([_assessment(i, row) for i, row in enumerate(RESPONSES[:3])])
+    await db[ARCHIVE_COLLECTION].insert_many([_assessment(i, row) for i, row in enumerate(RESPONSES[3:], 3)])
+
+    assert await run_item_analysis(db) == 3
+    stats = {doc["item_id"]: doc async for doc in db[STATS_COLLECTION].find()}
+
+    assert stats["apple"]["responses"] == 5
+    assert stats["apple"]["difficulty"] == pytest.approx(0.8)
+    assert stats["clock"]["discrimination"] == pytest.approx(_expected_discrimination(1))
+    assert stats["river"]["discrimination"] == pytest.approx(_expected_discrimination(2))
+    assert [(d["response"], d["count"]) for d in stats["river"]["distractors"]] == [("lake", 2), ("stream", 1)]
+    assert stats["river"]["distractors"][0]["proportion"] == pytest.approx(0.4)
+
+
+@pytest.mark.anyio
+async def test_flags_and_stale_items(db):
+    await db[STATS_COLLECTION].insert_one({"item_id": "retired", "run_id": "old"})
+    rows = [[("easy", True, "easy"), ("hard", False, "x")] for _ in range(4)]
+    await db.assessments.insert_many([_assessment(i, row) for i, row in enumerate(rows)])
+
+    await run_item_analysis(db)
+    stats = {doc["item_id"]: doc async for doc in db[STATS_COLLECTION].find()}
+    assert set(stats) == {"easy", "hard"}
+    assert stats["easy"]["flags"] == ["too_easy"]
+    assert stats["hard"]["flags"] == ["too_hard"]
+    # No variance in the item, so no correlation
+    assert stats["easy"]["discrimination"] is None
+
+
+@pytest.mark.anyio
+async def test_single_item_assessments_are_skipped(db):
+    await db.assessments.insert_one(_assessment(0, [("apple", True, "apple")]))
+    assert await run_item_analysis(db) == 0
@@ -0,0 +1,107 @@
+"""
+Tests for the in-process GCRA token buckets and their enforcement
+"""
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import rate_limit
+from rate_limit import TokenBucket
+
+
+def test_burst_then_steady_rate():
+    bucket = TokenBucket(5, 60)  # 5 at once, then one every 12 s
+    assert all(bucket.acquire("ip", now=100.0)[0] for _ in range(5))
+    allowed, wait = bucket.acquire("ip", now=100.0)
+    assert not allowed
+    assert wait == pytest.approx(12.0)
+
+    assert not bucket.acquire("ip", now=111.0)[0]
+    assert bucket.acquire("ip", now=112.0) == (True, 0.0)
+    assert not bucket.acquire("ip", now=112.0)[0]
+
+
+def test_rejected_requests_do_not_consume_tokens():
+    bucket = TokenBucket(2, 10)
+    bucket.acquire("ip", now=0.0)
+    bucket.acquire("ip", now=0.0)
+    for _ in range(100):
+        bucket.acquire("ip", now=1.0)
+    assert bucket.acquire("ip", now=5.0)[0]
+
+
+def test_idle_bucket_refills_completely():
+    bucket = TokenBucket(3, 30)
+    for _ in range(3):
+        bucket.acquire("ip", now=0.0)
+    # Long idle: a full burst again, but no more than the capacity
+    assert all(bucket.acquire("ip", now=1000.0)[0] for _ in range(3))
+    assert not bucket.acquire("ip", now=1000.0)[0]
+
+
+def test_keys_are_independent():
+    bucket = TokenBucket(1, 60)
+    assert bucket.acquire("a", now=0.0)[0]
+    assert not bucket.acquire("a", now=0.0)[0]
+    assert bucket.acquire("b", now=0.0)[0]
+
+
+def test_sweep_forgets_full_buckets_and_caps_keys():
+    bucket = TokenBucket(10, 10, max_keys=100)
+    bucket.acquire("old", now=0.0)
+    bucket.acquire("recent", now=50.0)
+    bucket.sweep(now=50.5)
+    assert len(bucket) == 1
+
+    for index in range(150):
+        bucket.acquire(f"flood-{index}", now=51.0)
+    assert len(bucket) <= 100
+
+
+def test_parse_policy(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_LOGIN_IP", "off")
+    monkeypatch.setenv("RATE_LIMIT_LOGIN_ACCOUNT", "10/300")
+    assert rate_limit._parse_policy("login_ip", "20/60") is None
+    bucket = rate_limit._parse_policy("login_account", "5/60")
+    assert (bucket.capacity, bucket.interval) == (10, 30.0)
+
+
+def _request(peer="10.0.0.9", forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_ip_trusts_only_configured_proxies(monkeypatch):
+    spoofed = "1.1.1.1, 203.0.113.7"
+    assert rate_limit.client_ip(_request(forwarded=spoofed)) == "10.0.0.9"
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", 1)
+    assert rate_limit.client_ip(_request(forwarded=spoofed)) == "203.0.113.7"
+    assert rate_limit.client_ip(_request()) == "10.0.0.9"
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "policies", rate_limit.load_policies())
+
+
+def test_enforce_raises_429_with_retry_after(limits, monkeypatch):
+    monkeypatch.setitem(rate_limit.policies, "login_account", TokenBucket(1, 60))
+    rate_limit.enforce("login_account", "a@example.com")
+    with pytest.raises(HTTPException) as error:
+        rate_limit.enforce("login_account", "a@example.com")
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "60"
+
+
+def test_login_is_limited_per_account(client, login, limits):
+    login()
+    attempts = [
+        client.post("/api/auth/login", json={"email": "patient@example.com", "password": "wrong"}).status_code
+        for _ in range(6)
+    ]
+    assert attempts == [401] * 5 + [429]
+    # Another account from the same address is still served
+    other = client.post("/api/auth/login", json={"email": "other@example.com", "password": "wrong"})
+    assert other.status_code == 401
@@ -0,0 +1,80 @@
+"""
+Tests for packed reaction trials and their vectorized statistics
+"""
+
+import numpy as np
+import pytest
+
+from assessment_service import ARCHIVE_COLLECTION, build_assessment
+from models import AssessmentResult
+from packing import pack_float32, unpack_float32
+from reaction_stats import compute_reaction_stats, compute_reaction_stats_batch, pack_trials, reanalyse_reactions
+
+
+def test_pack_round_trip():
+    trials = [312.5, 280.0, 455.25]
+    packed = pack_float32(trials)
+    assert len(packed) == 4 * len(trials)
+    np.testing.assert_array_equal(unpack_float32(packed), trials)
+
+
+def test_quartiles_match_numpy_for_ragged_batches():
+    """The sorted-row interpolation agrees with np.percentile row by row"""
+    generator = np.random.default_rng(7)
+    batch = [generator.uniform(150, 900, size) for size in (1, 2, 5, 17, 40)]
+    for trials, stats in zip(batch, compute_reaction_stats_batch(batch)):
+        q1, median, q3 = np.percentile(trials, [25, 50, 75])
+        assert stats["q1_ms"] == pytest.approx(q1)
+        assert stats["median_ms"] == pytest.approx(median)
+        assert stats["q3_ms"] == pytest.approx(q3)
+        assert stats["iqr_ms"] == pytest.approx(q3 - q1)
+        assert stats["mean_ms"] == pytest.approx(trials.mean())
+        assert stats["min_ms"] == pytest.approx(trials.min())
+
+
+def test_anticipations_lapses_and_outliers():
+    stats = compute_reaction_stats([50, 300, 310, 320, 330, 340, 2000])
+    assert stats["trials"] == 7
+    assert stats["anticipations"] == 1
+    assert stats["lapses"] == 1
+    assert stats["valid_trials"] == 6
+    assert stats["median_ms"] == pytest.approx(325)
+    # The 2000 ms trial is outside the Tukey fences
+    assert stats["trimmed_mean_ms"] == pytest.approx(320)
+    assert stats["cv"] == pytest.approx(np.std([300, 310, 320, 330, 340, 2000], ddof=1) / stats["mean_ms"])
+
+
+def test_rows_without_valid_trials_are_missing():
+    only_anticipations, single = compute_reaction_stats_batch([np.array([20.0, 40.0]), np.array([400.0])])
+    assert only_anticipations["valid_trials"] == 0
+    assert only_anticipations["median_ms"] is None
+    assert only_anticipations["mean_ms"] is None
+    assert single["median_ms"] == 400
+    assert single["cv"] is None
+    assert compute_reaction_stats_batch([]) == []
+
+
+def test_build_assessment_packs_trials_and_ignores_client_stats():
+    results = AssessmentResult(reaction_trials=[300, 320, 340], reaction_stats={"median_ms": 1})
+    assessment = build_assessment("u1", results)
+    assert assessment.results.reaction_trials is None
+    assert assessment.results.reaction_stats["median_ms"] == 320
+    assert assessment.results.reaction_avg_time == pytest.approx(320)
+    np.testing.assert_array_equal(unpack_float32(assessment.raw_data["reaction_trials"]), [300, 320, 340])
+
+    forged = build_assessment("u1", AssessmentResult(reaction_stats={"median_ms": 1}))
+    assert forged.results.reaction_stats is None
+
+
+@pytest.mark.anyio
+async def test_reanalyse_covers_hot_and_archived_assessments(db):
+    await db.assessments.insert_one({"id": "hot", "raw_data": {"reaction_trials": pack_trials([300, 400])}})
+    await db[ARCHIVE_COLLECTION].insert_one({"id": "cold", "raw_data": {"reaction_trials": pack_trials([500])}})
+    await db.assessments.insert_one({"id": "no-trials", "results": {}})
+
+    assert await reanalyse_reactions(db, batch_size=1) == 2
+    hot = await db.assessments.find_one({"id": "hot"})
+    cold = await db[ARCHIVE_COLLECTION].find_one({"id": "cold"})
+    assert hot["results"]["reaction_stats"]["median_ms"] == 350
+    assert cold["results"]["reaction_stats"]["median_ms"] == 500
+    assert "reaction_stats" not in (await db.assessments.find_one({"id": "no-trials"}))["results"]
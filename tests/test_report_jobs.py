@@ -0,0 +1,171 @@
+"""
+Tests for the MongoDB-backed report job queue: claims, leases, retries
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+
+import pytest
+
+import report_jobs
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """A `test` report kind whose behaviour each test sets."""
+    outcomes = []
+
+    async def render(db, job):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, "report.txt", "text/plain"
+
+    monkeypatch.setitem(report_jobs.REPORT_HANDLERS, "test", render)
+    return outcomes
+
+
+async def _job(db, job_id):
+    return await db[report_jobs.JOBS_COLLECTION].find_one({"id": job_id})
+
+
+@pytest.mark.anyio
+async def test_submit_limits_active_jobs(db, handler, monkeypatch):
+    monkeypatch.setattr(report_jobs, "MAX_ACTIVE_PER_USER", 2)
+    with pytest.raises(ValueError):
+        await report_jobs.submit_job(db, "u1", "no-such-kind", {})
+    await report_jobs.submit_job(db, "u1", "test", {})
+    await report_jobs.submit_job(db, "u1", "test", {})
+    with pytest.raises(report_jobs.JobLimitExceeded):
+        await report_jobs.submit_job(db, "u1", "test", {})
+    await report_jobs.submit_job(db, "u2", "test", {})
+
+
+@pytest.mark.anyio
+async def test_claim_takes_a_lease_and_limits_running_jobs_per_user(db, handler):
+    first = await report_jobs.submit_job(db, "u1", "test", {})
+    await report_jobs.submit_job(db, "u1", "test", {})
+    other = await report_jobs.submit_job(db, "u2", "test", {})
+
+    claimed = await report_jobs.claim_job(db, "worker-a")
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == "running"
+    assert claimed["attempts"] == 1
+    assert claimed["lease_expires_at"] > datetime.utcnow()
+    # u1 is at its running limit, so u2's job is next
+    assert (await report_jobs.claim_job(db, "worker-b"))["id"] == other["id"]
+    assert await report_jobs.claim_job(db, "worker-c") is None
+
+
+@pytest.mark.anyio
+async def test_expired_lease_is_reclaimed_and_the_stale_worker_cannot_finish(db, handler):
+    job = await report_jobs.submit_job(db, "u1", "test", {})
+    stale = await report_jobs.claim_job(db, "worker-a")
+    await db[report_jobs.JOBS_COLLECTION].update_one(
+        {"id": job["id"]}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+    reclaimed = await report_jobs.claim_job(db, "worker-b")
+    assert reclaimed["id"] == job["id"]
+    assert reclaimed["attempts"] == 2
+    assert reclaimed["lease_id"] != stale["lease_id"]
+
+    handler.append(b"late")
+    await report_jobs.run_job(db, stale)
+    assert (await _job(db, job["id"]))["status"] == "running"
+    handler.append(b"done")
+    await report_jobs.run_job(db, reclaimed)
+    assert (await _job(db, job["id"]))["status"] == "succeeded"
+
+
+@pytest.mark.anyio
+async def test_success_stores_the_file(db, handler):
+    job = await report_jobs.submit_job(db, "u1", "test", {})
+    handler.append(b"report body")
+    await report_jobs.run_job(db, await report_jobs.claim_job(db, "worker"))
+
+    stored = await _job(db, job["id"])
+    assert stored["result"] == {"filename": "report.txt", "content_type": "text/plain", "size": 11}
+    assert stored["expires_at"] > datetime.utcnow()
+    assert (await report_jobs.get_job_file(db, job["id"]))["content"] == b"report body"
+
+
+@pytest.mark.anyio
+async def test_transient_errors_retry_with_backoff_then_fail(db, handler, monkeypatch):
+    monkeypatch.setattr(report_jobs, "RETRY_BACKOFF_SECONDS", 10)
+    job = await report_jobs.submit_job(db, "u1", "test", {})
+    handler.extend([RuntimeError("disk full")] * 3)
+
+    await report_jobs.run_job(db, await report_jobs.claim_job(db, "worker"))
+    retried = await _job(db, job["id"])
+    assert retried["status"] == "queued"
+    assert retried["error"] == "RuntimeError: disk full"
+    assert retried["available_at"] > datetime.utcnow() + timedelta(seconds=9)
+    # Not claimable until the backoff has passed
+    assert await report_jobs.claim_job(db, "worker") is None
+
+    for attempt in (2, 3):
+        await db[report_jobs.JOBS_COLLECTION].update_one(
+            {"id": job["id"]}, {"$set": {"available_at": datetime.utcnow()}}
+        )
+        claimed = await report_jobs.claim_job(db, "worker")
+        assert claimed["attempts"] == attempt
+        await report_jobs.run_job(db, claimed)
+    assert (await _job(db, job["id"]))["status"] == "failed"
+
+
+@pytest.mark.anyio
+async def test_permanent_failure_is_not_retried(db, handler):
+    job = await report_jobs.submit_job(db, "u1", "test", {})
+    handler.append(report_jobs.JobFailed("Assessment not found"))
+    await report_jobs.run_job(db, await report_jobs.claim_job(db, "worker"))
+    stored = await _job(db, job["id"])
+    assert (stored["status"], stored["attempts"], stored["error"]) == ("failed", 1, "Assessment not found")
+
+
+@pytest.mark.anyio
+async def test_lease_lost_on_the_last_attempt_fails_the_job(db, handler):
+    job = await report_jobs.submit_job(db, "u1", "test", {})
+    await db[report_jobs.JOBS_COLLECTION].update_one({"id": job["id"]}, {"$set": {"attempts": 3}})
+    await report_jobs.run_job(db, await report_jobs.claim_job(db, "worker"))
+    assert (await _job(db, job["id"]))["error"] == "Worker lease expired"
+
+
+@pytest.mark.anyio
+async def test_long_polls_leave_no_events_behind(db, handler, monkeypatch):
+    monkeypatch.setattr(report_jobs, "POLL_SECONDS", 0.01)
+    job = await report_jobs.submit_job(db, "u1", "test", {})
+
+    assert await report_jobs.wait_for_job(db, "no-such-job", "u1", timeout=1) is None
+    assert (await report_jobs.wait_for_job(db, job["id"], "u1", timeout=0.03))["status"] == "queued"
+    assert report_jobs._finished_events == {}
+
+    # Two waiters share one event; a local finish wakes both and removes it
+    waiters = [asyncio.create_task(report_jobs.wait_for_job(db, job["id"], "u1", timeout=5)) for _ in range(2)]
+    await asyncio.sleep(0.005)
+    assert report_jobs._finished_events[job["id"]].waiters == 2
+    handler.append(b"done")
+    await report_jobs.run_job(db, await report_jobs.claim_job(db, "worker-a"))
+    assert [finished["status"] for finished in await asyncio.gather(*waiters)] == ["succeeded", "succeeded"]
+    assert report_jobs._finished_events == {}
+
+
+def test_report_job_endpoints(client, login):
+    headers = login()
+    assessment = client.post(
+        "/api/assessments/save", headers=headers, json={"results": {"memory_accuracy": 80}}
+    ).json()
+
+    response = client.post("/api/reports/jobs", headers=headers, json={"assessment_id": assessment["id"]})
+    assert response.status_code == 202
+    job_url = response.headers["location"]
+
+    job = client.get(job_url, headers=headers, params={"wait": 10}).json()
+    assert job["status"] == "succeeded"
+    download = client.get(job["download_url"], headers=headers)
+    assert download.headers["content-type"] == "application/pdf"
+    assert download.content.startswith(b"%PDF")
+
+    assert client.get(job_url, headers=login("other@example.com")).status_code == 404
+    missing = client.post("/api/reports/jobs", headers=headers, json={"assessment_id": "missing"})
+    assert missing.status_code == 404
@@ -0,0 +1,119 @@
+"""
+Tests for moving old assessments out of the hot collection
+"""
+
+from datetime import datetime, timedelta
+import gzip
+import json
+
+import pytest
+
+from assessment_service import (
+    ARCHIVE_COLLECTION, SUMMARIES_COLLECTION, fetch_history, find_assessment, get_summary, record_new_assessments,
+)
+from database import ensure_collections
+from retention import archive_assessments
+
+
+def _assessment(assessment_id, user_id, days_ago, audio=False):
+    assessment = {
+        "id": assessment_id,
+        "user_id": user_id,
+        "test_date": datetime.utcnow() - timedelta(days=days_ago),
+        "overall_score": 70.0,
+        "risk_level": "Moderate",
+        "results": {"memory_accuracy": 70.0, "speech_duration": 4.2},
+        "raw_data": {},
+    }
+    if audio:
+        assessment["raw_data"]["speech_audio"] = {"codec": "original", "data": b"\x1aE\xdf\xa3"}
+    return assessment
+
+
+async def _seed(db):
+    assessments = [
+        _assessment("old1", "u1", 1000, audio=True),
+        _assessment("old2", "u1", 900),
+        _assessment("new1", "u1", 10),
+        _assessment("old3", "u2", 800),
+    ]
+    await db.assessments.insert_many([dict(assessment) for assessment in assessments])
+    await record_new_assessments(db, assessments)
+
+
+@pytest.mark.anyio
+async def test_old_assessments_move_to_the_archive_collection(db):
+    await _seed(db)
+    before = await get_summary(db, "u1")
+
+    stats = await archive_assessments(db, older_than_days=365, target="collection", batch_size=2, pause_seconds=0)
+    assert (stats.archived, stats.batches, stats.audio_stripped) == (3, 2, 1)
+    assert [a["id"] async for a in db.assessments.find()] == ["new1"]
+
+    archived = await db[ARCHIVE_COLLECTION].find_one({"id": "old1"})
+    assert "speech_audio" not in archived["raw_data"]
+    assert archived["results"]["speech_duration"] == 4.2
+    assert archived["archived_at"] is not None
+
+    # Still counted and still served, but validators moved
+    summary = await get_summary(db, "u1")
+    assert (summary["count"], summary["latest_id"]) == (3, "new1")
+    assert summary["version"] > before["version"]
+    assert [a["id"] for a in await fetch_history(db, "u1")] == ["old1", "old2", "new1"]
+    assert (await find_assessment(db, {"id": "old3"}))["user_id"] == "u2"
+
+
+@pytest.mark.anyio
+async def test_rerun_after_an_interrupted_batch_skips_existing_copies(db):
+    await _seed(db)
+    # A previous run archived old1 but stopped before deleting it
+    copy = _assessment("old1", "u1", 1000)
+    await db[ARCHIVE_COLLECTION].insert_one(copy)
+    await ensure_collections(db)
+
+    stats = await archive_assessments(db, older_than_days=365, target="collection", pause_seconds=0)
+    assert stats.archived == 3
+    assert await db[ARCHIVE_COLLECTION].count_documents({"id": "old1"}) == 1
+    assert await db.assessments.count_documents({}) == 1
+
+
+@pytest.mark.anyio
+async def test_limit_caps_one_run(db):
+    await _seed(db)
+    stats = await archive_assessments(db, older_than_days=365, target="collection", pause_seconds=0, limit=1)
+    assert stats.archived == 1
+    assert (await db[ARCHIVE_COLLECTION].find_one({}))["id"] == "old1"
+
+
+@pytest.mark.anyio
+async def test_ndjson_archive_drops_assessments_from_the_summaries(db, tmp_path):
+    await _seed(db)
+    stats = await archive_assessments(db, older_than_days=365, target="ndjson", archive_dir=tmp_path, pause_seconds=0)
+    assert stats.archived == 3
+
+    [path] = tmp_path.iterdir()
+    with gzip.open(path, "rt") as archive:
+        rows = [json.loads(line) for line in archive]
+    assert sorted(row["id"] for row in rows) == ["old1", "old2", "old3"]
+    assert all("speech_audio" not in row["raw_data"] for row in rows)
+    assert await db[ARCHIVE_COLLECTION].count_documents({}) == 0
+
+    u1 = await db[SUMMARIES_COLLECTION].find_one({"user_id": "u1"})
+    assert (u1["count"], u1["latest_id"]) == (1, "new1")
+    # The patient's only assessment was archived: no latest remains
+    u2 = await db[SUMMARIES_COLLECTION].find_one({"user_id": "u2"})
+    assert (u2["count"], u2["latest_id"], u2["latest_test_date"]) == (0, None, None)
+
+
+@pytest.mark.anyio
+async def test_nothing_to_archive_leaves_no_file(db, tmp_path):
+    await db.assessments.insert_one(_assessment("new1", "u1", 10))
+    stats = await archive_assessments(db, older_than_days=365, target="ndjson", archive_dir=tmp_path, pause_seconds=0)
+    assert stats.archived == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_unknown_target_is_rejected(db):
+    with pytest.raises(ValueError):
+        await archive_assessments(db, target="s3")
@@ -0,0 +1,122 @@
+"""
+Tests for short-lived access tokens, refresh rotation and the revocation filter
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import revocation
+from auth import issued_at
+from revocation import BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(5000)
+    for index in range(5000):
+        bloom.add(f"sid:{index}")
+    assert all(f"sid:{index}" in bloom for index in range(5000))
+    false_positives = sum(f"user:{index}" in bloom for index in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_issued_at_keeps_milliseconds():
+    now = datetime(2024, 5, 1, 12, 0, 0, 123456)
+    assert issued_at(now) == pytest.approx(1714564800.123)
+    assert issued_at(now + timedelta(milliseconds=1)) > issued_at(now)
+
+
+@pytest.mark.anyio
+async def test_revocation_applies_up_to_the_millisecond(db):
+    revoked = RevocationList()
+    await revoked.revoke(db, "sid:s1")
+    stored = await db[revocation.COLLECTION].find_one({"key": "sid:s1"})
+    revoked_at = issued_at(stored["revoked_at"])
+
+    assert revoked.is_revoked({"sid": "s1", "sub": "u1", "iat": revoked_at})
+    assert revoked.is_revoked({"sid": "s1", "sub": "u1", "iat": revoked_at - 30})
+    # Issued in the same second, after the logout: a new login must work
+    assert not revoked.is_revoked({"sid": "s1", "sub": "u1", "iat": revoked_at + 0.001})
+    assert not revoked.is_revoked({"sid": "s2", "sub": "u1", "iat": revoked_at - 30})
+
+
+@pytest.mark.anyio
+async def test_other_processes_pick_revocations_up_on_sync(db):
+    writer, reader = RevocationList(), RevocationList()
+    await reader.sync(db)
+    await writer.revoke(db, "user:u1")
+    claims = {"sid": "s9", "sub": "u1", "iat": issued_at(datetime.utcnow() - timedelta(minutes=1))}
+    assert not reader.is_revoked(claims)
+    await reader.sync(db)
+    assert reader.is_revoked(claims)
+
+
+@pytest.mark.anyio
+async def test_full_reload_drops_expired_entries(db):
+    now = datetime.utcnow()
+    await db[revocation.COLLECTION].insert_many([
+        {"key": "sid:live", "revoked_at": now, "expires_at": now + timedelta(minutes=5)},
+        {"key": "sid:gone", "revoked_at": now - timedelta(hours=1), "expires_at": now - timedelta(minutes=30)},
+    ])
+    revoked = RevocationList()
+    await revoked.sync(db, full=True)
+    assert revoked.is_revoked({"sid": "live", "iat": issued_at(now)})
+    assert not revoked.is_revoked({"sid": "gone", "iat": 0})
+
+
+def test_filter_grows_with_the_list():
+    revoked = RevocationList()
+    now = datetime.utcnow()
+    for index in range(3000):
+        revoked._add(f"sid:{index}", now)
+    assert revoked._filter_capacity >= 3000
+    assert all(revoked.is_revoked({"sid": str(index), "iat": 0}) for index in range(3000))
+
+
+def _login(client, email="patient@example.com"):
+    return client.post("/api/auth/login", json={"email": email, "password": "secret-password"}).json()
+
+
+def _me(client, tokens):
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {tokens['access_token']}"}).status_code
+
+
+def test_logout_then_immediate_login(client, login):
+    login()
+    tokens = _login(client)
+    assert _me(client, tokens) == 200
+
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/api/auth/logout", headers=headers).status_code == 204
+    assert _me(client, tokens) == 401
+    # Logging straight back in, within the same second, gives a working token
+    assert _me(client, _login(client)) == 200
+
+
+def test_logout_everywhere(client, login):
+    login()
+    first, second = _login(client), _login(client)
+    headers = {"Authorization": f"Bearer {first['access_token']}"}
+    assert client.post("/api/auth/logout-all", headers=headers).status_code == 204
+    assert _me(client, first) == 401
+    assert _me(client, second) == 401
+    assert _me(client, _login(client)) == 200
+
+
+def test_refresh_tokens_rotate_and_reuse_revokes_the_session(client, login):
+    login()
+    tokens = _login(client)
+    assert tokens["expires_in"] == revocation.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+    rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert rotated.status_code == 200
+    rotated = rotated.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert _me(client, rotated) == 200
+
+    # The old refresh token was copied: the whole session is ended
+    replay = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert replay.status_code == 401
+    assert _me(client, rotated) == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": rotated["access_token"]}).status_code == 401
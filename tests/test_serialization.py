@@ -0,0 +1,60 @@
+"""
+Tests for the fast JSON response path (serialization.json_response)
+"""
+
+import json
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+
+import serialization
+from models import AssessmentHistory, AssessmentResponse
+
+ASSESSMENT = {
+    "_id": "mongo-object-id",
+    "id": "a1",
+    "user_id": "u1",
+    "test_date": datetime(2024, 3, 1, 9, 30),
+    "results": {"memory_score": 80.0, "reaction_trials": [310.0, 295.5]},
+    "overall_score": 72.5,
+    "risk_level": "Low",
+    "raw_data": {"reaction_trials": b"packed"},
+}
+
+
+def test_json_response_matches_response_model():
+    """Documents serialize exactly as the response model would dump them"""
+    response = serialization.json_response(AssessmentResponse, ASSESSMENT)
+    expected = AssessmentResponse(**ASSESSMENT).model_dump(mode="json", exclude_unset=True)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == expected
+
+
+def test_json_response_drops_fields_outside_the_model():
+    """Mongo's _id and stored-only fields such as raw_data never reach the client"""
+    body = json.loads(serialization.json_response(AssessmentResponse, ASSESSMENT).body)
+    assert "_id" not in body
+    assert "raw_data" not in body
+
+
+def test_json_response_nested_models():
+    """Lists of models inside a model are serialized through their mirrors"""
+    response = serialization.json_response(AssessmentHistory, {"assessments": [ASSESSMENT, ASSESSMENT]})
+    body = json.loads(response.body)
+    assert [a["id"] for a in body["assessments"]] == ["a1", "a1"]
+    assert "raw_data" not in body["assessments"][0]
+
+
+def test_json_response_status_and_headers():
+    response = serialization.json_response(AssessmentResponse, ASSESSMENT, status_code=201, headers={"ETag": '"x"'})
+    assert response.status_code == 201
+    assert response.headers["etag"] == '"x"'
+
+
+def test_fallback_builds_the_model(monkeypatch):
+    """With FAST_SERIALIZATION off the route's response_model does the work"""
+    monkeypatch.setattr(serialization, "FAST_SERIALIZATION", False)
+    assert isinstance(serialization.json_response(AssessmentResponse, ASSESSMENT), AssessmentResponse)
+    response = serialization.json_response(AssessmentResponse, ASSESSMENT, status_code=201)
+    assert isinstance(response, JSONResponse)
+    assert response.status_code == 201
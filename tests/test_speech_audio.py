@@ -0,0 +1,160 @@
+"""
+Tests for decoding, resampling and packing speech recordings
+"""
+
+import base64
+import struct
+
+import numpy as np
+import pytest
+
+from speech_audio import (
+    CODEC, ORIGINAL_CODEC, TARGET_SAMPLE_RATE, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, decode_pcm16, encode_pcm16,
+    load_speech_samples, normalize_speech, read_wav, resample, speech_audio_bytes, speech_duration,
+)
+
+WEBM_HEADER = b"\x1aE\xdf\xa3" + b"\x00" * 60
+
+
+def _wav(payload: bytes, rate=48000, channels=1, bits=16, encoding=WAVE_FORMAT_PCM, data_size=None):
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", encoding, channels, rate, rate * block_align, block_align, bits)
+    size = len(payload) if data_size is None else data_size
+    return (
+        b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(payload)) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", size) + payload
+    )
+
+
+def _tone(frequency, rate, seconds=0.5, amplitude=0.5):
+    return amplitude * np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate)
+
+
+def _data_url(data: bytes, mime="audio/wav") -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+
+def test_read_wav_integer_and_float_encodings():
+    expected = np.array([-1.0, -0.5, 0.0, 0.5])
+
+    pcm8 = _wav(bytes([0, 64, 128, 192]), bits=8)
+    pcm16 = _wav(np.array([-32768, -16384, 0, 16384], dtype="<i2").tobytes())
+    pcm24 = _wav(b"".join(value.to_bytes(3, "little", signed=True) for value in (-8388608, -4194304, 0, 4194304)), bits=24)
+    pcm32 = _wav(np.array([-2 ** 31, -2 ** 30, 0, 2 ** 30], dtype="<i4").tobytes(), bits=32)
+    float32 = _wav(expected.astype("<f4").tobytes(), bits=32, encoding=WAVE_FORMAT_IEEE_FLOAT)
+
+    for data, bits in ((pcm8, 8), (pcm16, 16), (pcm24, 24), (pcm32, 32), (float32, 32)):
+        frames, rate, info = read_wav(data)
+        assert frames.shape == (4, 1) and rate == 48000
+        assert info["bits_per_sample"] == bits
+        np.testing.assert_allclose(frames[:, 0], expected)
+    assert read_wav(float32)[2]["encoding"] == "float"
+
+
+def test_read_wav_keeps_channels_and_whole_frames_of_a_truncated_file():
+    stereo = np.array([[1000, -1000], [2000, -2000], [3000, -3000]], dtype="<i2").tobytes()
+    # Declared longer than it is and cut mid-frame
+    frames, _, _ = read_wav(_wav(stereo[:-1], channels=2, data_size=1000))
+    assert frames.shape == (2, 2)
+    np.testing.assert_allclose(frames[:, 0], -frames[:, 1])
+
+    streaming = _wav(stereo, channels=2, data_size=0xFFFFFFFF)
+    assert read_wav(streaming)[0].shape == (3, 2)
+
+
+@pytest.mark.parametrize("data", [b"not a wav", b"RIFF\x00\x00\x00\x00WAVEjunk"])
+def test_read_wav_rejects_other_data(data):
+    with pytest.raises(ValueError):
+        read_wav(data)
+
+
+def test_resample_length_passband_and_stopband():
+    passband = resample(_tone(1000, 48000), 48000, 16000)
+    assert len(passband) == 8000
+    middle = passband[1000:-1000]
+    expected = _tone(1000, 16000)[1000:-1000]
+    np.testing.assert_allclose(middle, expected, atol=5e-3)
+
+    # Above the new Nyquist frequency: filtered out instead of aliasing to 4 kHz
+    stopband = resample(_tone(12000, 48000), 48000, 16000)
+    assert np.sqrt(np.mean(stopband[1000:-1000] ** 2)) < 1e-3
+
+    assert len(resample(_tone(1000, 44100), 44100, 16000)) == 8000
+    same = _tone(1000, 16000)
+    assert resample(same, 16000, 16000) is same
+
+
+def test_pcm16_roundtrip_including_wraparound():
+    samples = np.array([0, 32767, -32768, 32767, -1, 5, -32768], dtype="<i2")
+    np.testing.assert_array_equal(decode_pcm16(encode_pcm16(samples)), samples)
+
+    noise = np.random.default_rng(0).integers(-32768, 32768, 10000).astype("<i2")
+    np.testing.assert_array_equal(decode_pcm16(encode_pcm16(noise)), noise)
+
+
+def test_wav_upload_is_stored_as_16k_mono():
+    left = _tone(440, 48000, seconds=1.0)
+    stereo = np.stack([left, left], axis=1)
+    upload = _wav(np.rint(stereo * 32767).astype("<i2").tobytes(), channels=2)
+
+    audio = normalize_speech(_data_url(upload))
+    assert audio["codec"] == CODEC
+    assert (audio["sample_rate"], audio["channels"], audio["samples"]) == (TARGET_SAMPLE_RATE, 1, 16000)
+    assert audio["original"]["mime"] == "audio/wav"
+    assert (audio["original"]["sample_rate"], audio["original"]["channels"]) == (48000, 2)
+    assert len(audio["data"]) < len(upload) / 3
+    assert speech_duration(audio) == 1.0
+
+    samples = load_speech_samples(audio)
+    assert len(samples) == 16000
+    assert np.abs(samples).max() > 15000
+
+    playable, mime = speech_audio_bytes(audio)
+    assert mime == "audio/wav"
+    frames, rate, _ = read_wav(playable)
+    assert rate == TARGET_SAMPLE_RATE
+    np.testing.assert_array_equal(np.rint(frames[:, 0] * 32768).astype("<i2"), samples)
+
+
+def test_undecodable_containers_are_kept_as_sent():
+    audio = normalize_speech(base64.b64encode(WEBM_HEADER).decode())
+    assert audio["codec"] == ORIGINAL_CODEC
+    assert audio["data"] == WEBM_HEADER
+    assert audio["original"]["mime"] == "audio/webm"
+    assert speech_duration(audio) is None
+    assert speech_audio_bytes(audio) == (WEBM_HEADER, "audio/webm")
+    with pytest.raises(ValueError):
+        load_speech_samples(audio)
+
+
+def test_invalid_base64_is_rejected():
+    with pytest.raises(ValueError):
+        normalize_speech("data:audio/wav;base64,@@not base64@@")
+
+
+def test_checksum_mismatch_is_detected():
+    audio = normalize_speech(_data_url(_wav(np.zeros(4800, dtype="<i2").tobytes())))
+    audio["data"] = encode_pcm16(np.ones(audio["samples"], dtype="<i2"))
+    with pytest.raises(ValueError):
+        load_speech_samples(audio)
+
+
+def test_save_endpoint_stores_compacted_audio(client, app_db, login):
+    headers = login()
+    upload = _wav(np.rint(_tone(440, 48000, seconds=2.0) * 32767).astype("<i2").tobytes())
+
+    response = client.post("/api/assessments/save", headers=headers, json={"results": {
+        "memory_accuracy": 80, "speech_data": _data_url(upload),
+    }})
+    assert response.status_code == 200
+    saved = response.json()
+    assert saved["results"]["speech_data"] is None
+    assert saved["results"]["speech_duration"] == 2.0
+
+    stored = client.portal.call(app_db.assessments.find_one, {"id": saved["id"]})
+    assert stored["raw_data"]["speech_audio"]["codec"] == CODEC
+    assert len(load_speech_samples(stored["raw_data"]["speech_audio"])) == 32000
+
+    response = client.post("/api/assessments/save", headers=headers, json={"results": {"speech_data": "@@"}})
+    assert response.status_code == 422
@@ -0,0 +1,50 @@
+"""
+Tests for streaming status checks as NDJSON
+"""
+
+import json
+from datetime import datetime, timedelta
+
+
+def _seed(client, db, count):
+    started = datetime(2024, 1, 1)
+    documents = [
+        {"id": f"s{i}", "client_name": "kiosk" if i % 2 else "web", "timestamp": started + timedelta(minutes=i)}
+        for i in range(count)
+    ]
+    client.portal.call(db.status_checks.insert_many, documents)
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_streams_every_check_oldest_first(client, app_db):
+    _seed(client, app_db, 7)
+    response = client.get("/api/status/stream", params={"batch_size": 3})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = _lines(response)
+    assert [line["id"] for line in lines] == [f"s{i}" for i in range(7)]
+    assert set(lines[0]) == {"id", "client_name", "timestamp"}
+
+
+def test_filters_and_limit(client, app_db):
+    _seed(client, app_db, 10)
+    lines = _lines(client.get("/api/status/stream", params={
+        "client_name": "kiosk",
+        "since": "2024-01-01T00:02:00",
+        "until": "2024-01-01T00:09:00",
+        "limit": 2,
+    }))
+    assert [line["id"] for line in lines] == ["s3", "s5"]
+
+
+def test_empty_stream(client):
+    response = client.get("/api/status/stream")
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_rejects_unbounded_batches(client):
+    assert client.get("/api/status/stream", params={"batch_size": 0}).status_code == 422
@@ -0,0 +1,133 @@
+"""
+Tests for JSON log records, request ids and access-line sampling
+"""
+
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import structured_logging
+from structured_logging import (
+    ContextQueueHandler, JsonFormatter, RequestLoggingMiddleware, access_logger, hash_user_id,
+    parse_sample_rates, request_context, set_log_user,
+)
+
+
+def _record(message="hello %s", args=("world",), **attributes):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, message, args, None)
+    record.__dict__.update(attributes)
+    return record
+
+
+def test_user_ids_are_hashed_with_the_salt(monkeypatch):
+    hashed = hash_user_id("user-1")
+    assert len(hashed) == 16 and "user-1" not in hashed
+    assert hash_user_id("user-1") == hashed
+    monkeypatch.setattr(structured_logging, "LOG_USER_HASH_SALT", "pepper")
+    assert hash_user_id("user-1") != hashed
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("") == {}
+    assert parse_sample_rates("/api/a=0.1, /api/b=0,/api/c=7") == {"/api/a": 0.1, "/api/b": 0.0, "/api/c": 1.0}
+
+
+def test_json_formatter_merges_context_and_fields():
+    record = _record(context={"request_id": "abc"}, fields={"status": 200})
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "hello world"
+    assert (entry["level"], entry["logger"]) == ("INFO", "test")
+    assert (entry["request_id"], entry["status"]) == ("abc", 200)
+    assert entry["time"].endswith("Z")
+
+
+def test_queue_handler_renders_message_and_traceback_up_front():
+    handler = ContextQueueHandler(queue.SimpleQueue())
+    token = request_context.set({"request_id": "abc"})
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = _record(exc_info=sys.exc_info())
+    try:
+        prepared = handler.prepare(record)
+    finally:
+        request_context.reset(token)
+
+    assert (prepared.msg, prepared.args) == ("hello world", None)
+    assert prepared.context == {"request_id": "abc"}
+    assert prepared.exc_info is None and "RuntimeError: boom" in prepared.exc_text
+    # Formatted later on the listener thread, the traceback is still there
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert "RuntimeError: boom" in entry["exc"] and entry["request_id"] == "abc"
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+
+    def emit(self, record):
+        self.entries.append({**record.fields, **(request_context.get() or {})})
+
+
+@pytest.fixture
+def access_lines():
+    capture = _Capture()
+    level = access_logger.level
+    access_logger.setLevel(logging.INFO)
+    access_logger.addHandler(capture)
+    yield capture.entries
+    access_logger.removeHandler(capture)
+    access_logger.setLevel(level)
+
+
+def _app(sample_rates=None):
+    app = FastAPI()
+    seen = {}
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: str):
+        set_log_user("user-1")
+        seen["context"] = dict(request_context.get())
+        return {"id": item_id}
+
+    @app.get("/broken")
+    def broken():
+        raise HTTPException(status_code=503)
+
+    app.add_middleware(RequestLoggingMiddleware, sample_rates=sample_rates or {})
+    return TestClient(app), seen
+
+
+def test_request_id_is_echoed_or_generated(access_lines):
+    client, seen = _app()
+    response = client.get("/items/1", headers={"X-Request-ID": "trace-42"})
+    assert response.headers["x-request-id"] == "trace-42"
+    assert seen["context"] == {"request_id": "trace-42", "user": hash_user_id("user-1")}
+
+    # Malformed ids are replaced rather than logged as sent
+    response = client.get("/items/1", headers={"X-Request-ID": "bad id\n" * 20})
+    generated = response.headers["x-request-id"]
+    assert len(generated) == 32 and generated != "bad id"
+
+    [first, second] = access_lines
+    assert first["request_id"] == "trace-42"
+    assert (first["route"], first["path"], first["status"]) == ("/items/{item_id}", "/items/1", 200)
+    assert first["user"] == hash_user_id("user-1")
+    assert second["request_id"] == generated
+    assert request_context.get() is None
+
+
+def test_sampled_routes_still_log_errors(access_lines):
+    client, _ = _app({"/items/{item_id}": 0.0, "/broken": 0.0})
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/broken").status_code == 503
+    assert client.get("/missing").status_code == 404
+
+    assert [(line["route"], line["status"]) for line in access_lines] == [("/broken", 503), ("unmatched", 404)]
+    assert access_lines[0]["sample_rate"] == 0.0
@@ -0,0 +1,45 @@
+"""
+Tests for worker warm-up and the preforking launcher's shared socket
+"""
+
+import socket
+
+import launcher
+import warmup
+from metrics import registry
+
+
+def test_warm_up_times_every_step():
+    timings = warmup.warm_up()
+    assert set(timings) == {"pdf", "bcrypt", "caches"}
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def test_failed_step_does_not_stop_warm_up(monkeypatch):
+    """A broken warm-up step is logged; the worker still starts"""
+    def broken():
+        raise RuntimeError("no fonts")
+
+    monkeypatch.setattr(warmup, "_render_dummy_pdf", broken)
+    monkeypatch.setattr(warmup, "_touch_bcrypt", lambda: None)
+    timings = warmup.warm_up()
+    assert set(timings) == {"pdf", "bcrypt", "caches"}
+
+
+def test_lifespan_reports_time_to_ready(client):
+    assert registry.gauge("worker_time_to_ready_seconds").value > 0
+
+
+def test_mark_process_start_resets_the_clock():
+    warmup.mark_process_start()
+    assert warmup.seconds_since_start() < 1
+
+
+def test_bound_socket_is_shared_with_forked_workers():
+    sock = launcher._bind_socket("127.0.0.1", 0, 16)
+    try:
+        assert sock.get_inheritable()
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR)
+        assert sock.getsockname()[1] > 0
+    finally:
+        sock.close()